@@ -0,0 +1,79 @@
+# Audio waveforms speed: the default ffmpeg resampling against the streamed point sampling with the chunked peaks
+# usage (from the program folder, ffmpeg.exe must be next to the program): python -m benchmarks.audio_waveforms [track minutes]
+
+import os, sys, time, tempfile, subprocess
+
+import ffmpeg
+import config
+import numpy as np
+
+from thumbs.waveform import create_waveform, draw_waveform, WAVEFORM_SAMPLE_RATE
+
+# the ffmpeg processes CPU time is known only on Unix, on Windows only the program CPU time is measured
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# the whole track is read into memory and resampled with the default (filtered) resampler
+def create_default_waveform(filepath, size):
+    data, _ = (
+        ffmpeg.input(filepath)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=WAVEFORM_SAMPLE_RATE)
+        .global_args("-loglevel", "quiet")
+        .run(cmd=config.get_ffmpeg_path(), capture_stdout=True)
+    )
+    samples = np.frombuffer(data, dtype=np.int16)
+    return draw_waveform(samples, samples, size)
+
+
+def generate_track(filepath, minutes):
+    subprocess.run(
+        [
+            config.get_ffmpeg_path(),
+            "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=220:duration={minutes * 60}:sample_rate=44100",
+            "-ac", "2",
+            filepath,
+        ],
+        check=True,
+    )
+
+
+# the CPU time of the program and the ffmpeg processes
+def get_cpu_time():
+    if resource is None:
+        return time.process_time()
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(function, filepath):
+    start_cpu = get_cpu_time()
+    start = time.perf_counter()
+    function(filepath, 256)
+    return time.perf_counter() - start, get_cpu_time() - start_cpu
+
+
+def main():
+    minutes = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "track.wav")
+        generate_track(filepath, minutes)
+
+        print(f"{minutes} min WAV, {os.path.getsize(filepath) / 2**20:.0f} MB")
+        print(f"{'':>10} {'wall, s':>8} {'CPU, s':>8}")
+        def create_streamed_waveform(filepath, size):
+            return create_waveform(filepath, size, config.get_ffmpeg_timeout())
+
+        for name, function in (("default", create_default_waveform), ("streamed", create_streamed_waveform)):
+            elapsed, cpu_time = measure(function, filepath)
+            print(f"{name:>10} {elapsed:>8.2f} {cpu_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
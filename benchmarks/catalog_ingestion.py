@@ -0,0 +1,99 @@
+# Catalog ingestion: the time to save the created thumbnails of the import to the DB, file by file
+# (one transaction and a query per tag for every file) and by the batches of the thumbnails creation
+# usage (from the program folder): python -m benchmarks.catalog_ingestion [files count]
+
+import os, sys, time, tempfile
+
+from db.database import DatabaseHandler
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+
+class ErrorWindow:
+    def show_error_message(self, message):
+        raise RuntimeError(message)
+
+
+def create_database(folder, name, filepaths):
+    db = DatabaseHandler(ErrorWindow(), os.path.join(folder, name))
+    db.apply_migrations()
+    db.add_thumbnail_jobs(filepaths)
+    return db
+
+
+def get_results(filepaths):
+    return [
+        (
+            os.path.basename(filepath),
+            filepath,
+            f"{filepath}.webp",
+            ["Image"],
+            1000 + i,
+            1700000000.0 + i,
+            f"{i:032x}",
+            "" if i % 100 else "Не удалось открыть файл",
+        )
+        for i, filepath in enumerate(filepaths)
+    ]
+
+
+# the previous per file saving: the file row, the job state and a query for every tag, committed twice
+def save_file_by_file(db, results):
+    for filename, filepath, previewpath, tags, size, mtime, fingerprint, error in results:
+        db.cursor.execute(
+            """
+            INSERT INTO Files (filename, filepath, previewpath, size, mtime, fingerprint)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filepath) DO UPDATE SET
+                previewpath = excluded.previewpath,
+                size = excluded.size,
+                mtime = excluded.mtime,
+                fingerprint = excluded.fingerprint
+            """,
+            (filename, filepath, previewpath, size, mtime, fingerprint),
+        )
+        if error:
+            db.cursor.execute(
+                "UPDATE Thumbnail_jobs SET state = 'failed', size = ?, mtime = ?, error = ? WHERE filepath = ?",
+                (size, mtime, error, filepath),
+            )
+        else:
+            db.cursor.execute(
+                "UPDATE Thumbnail_jobs SET state = 'done', error = NULL WHERE filepath = ?", (filepath,)
+            )
+        db.save_current_item_tags(filepath, tags)
+        db.save_changes()
+
+
+def save_by_batches(db, results):
+    for i in range(0, len(results), THUMB_RESULTS_BATCH_SIZE):
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    filepaths = [os.path.join("C:\\", "files", f"folder_{i // 1000}", f"image_{i}.jpg") for i in range(count)]
+    results = get_results(filepaths)
+
+    print(f"{count} files, batch size {THUMB_RESULTS_BATCH_SIZE}")
+    print(f"{'saving':>12} {'time, s':>9} {'files/s':>9} {'files':>7} {'tags':>7} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, save in (("file by file", save_file_by_file), ("batches", save_by_batches)):
+            db = create_database(folder, f"{save.__name__}.db", filepaths)
+
+            start = time.perf_counter()
+            save(db, results)
+            elapsed = time.perf_counter() - start
+
+            # both ways must save the same rows
+            files = db.cursor.execute("SELECT COUNT(*) FROM Files").fetchone()[0]
+            tags = db.cursor.execute("SELECT COUNT(*) FROM Files_tags").fetchone()[0]
+            failed = db.cursor.execute(
+                "SELECT COUNT(*) FROM Thumbnail_jobs WHERE state = 'failed'"
+            ).fetchone()[0]
+            db.close_connection()
+
+            print(f"{name:>12} {elapsed:>9.2f} {count / elapsed:>9.0f} {files:>7} {tags:>7} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
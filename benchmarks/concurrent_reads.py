@@ -0,0 +1,102 @@
+# Concurrent reads: the files search time in a background thread while the import saves the thumbnails batches,
+# with the WAL journal and the read-only pool connection and with the previous rollback journal connections
+# (the longest batch saving shows how much the writer waits for the readers)
+# usage (from the program folder): python -m benchmarks.concurrent_reads [files count]
+
+import os, sys, time, sqlite3, tempfile, threading
+
+from benchmarks.catalog_ingestion import create_database, get_results
+from db.database import DatabaseReader
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+
+# returns the longest batch saving time
+def ingest(db, results, is_done):
+    longest = 0
+    for i in range(0, len(results), THUMB_RESULTS_BATCH_SIZE):
+        start = time.perf_counter()
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+        longest = max(longest, time.perf_counter() - start)
+    is_done.set()
+    return longest
+
+
+# searches until the import is done, returns the search times and the number of the failed searches
+def search(read, is_done):
+    times = []
+    failed = 0
+    while not is_done.is_set():
+        start = time.perf_counter()
+        try:
+            with read() as db:
+                db.get_ids_by_text("image_1")
+        except sqlite3.OperationalError:
+            failed += 1
+            continue
+        times.append(time.perf_counter() - start)
+    return times, failed
+
+
+# the first half of the files is saved before the searches, so they have the rows to find
+def run(db, read, results):
+    ingest(db, results[:len(results) // 2], threading.Event())
+    results = results[len(results) // 2:]
+
+    is_done = threading.Event()
+    searches = []
+    reader = threading.Thread(target=lambda: searches.append(search(read, is_done)))
+
+    start = time.perf_counter()
+    reader.start()
+    longest_batch = ingest(db, results, is_done)
+    reader.join()
+    elapsed = time.perf_counter() - start
+
+    times, failed = searches[0]
+    times.sort()
+    return elapsed, longest_batch, len(times), times[len(times) // 2], times[-1], failed
+
+
+def print_row(journal, elapsed, longest_batch, searches, median, longest, failed):
+    print(
+        f"{journal:>9} {elapsed:>10.2f} {longest_batch * 1000:>10.1f} {searches:>9} "
+        f"{median * 1000:>11.1f} {longest * 1000:>8.1f} {failed:>7}"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    filepaths = [os.path.join("C:\\", "files", f"folder_{i // 1000}", f"image_{i}.jpg") for i in range(count)]
+    results = get_results(filepaths)
+
+    print(f"{count} files, batch size {THUMB_RESULTS_BATCH_SIZE}")
+    print(
+        f"{'journal':>9} {'import, s':>10} {'batch, ms':>10} {'searches':>9} "
+        f"{'median, ms':>11} {'max, ms':>8} {'failed':>7}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_database(folder, "wal.db", filepaths)
+        print_row("wal", *run(db, db.read, results))
+        db.close_connection()
+
+        # the previous connections: the rollback journal and a separate usual connection of the reader thread
+        db = create_database(folder, "delete.db", filepaths)
+        db.close_connection()
+        connection = sqlite3.connect(os.path.join(folder, "delete.db"), check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = DELETE")
+        reader_connection = sqlite3.connect(os.path.join(folder, "delete.db"), check_same_thread=False)
+
+        class read:
+            def __enter__(self):
+                return DatabaseReader(reader_connection)
+
+            def __exit__(self, *exc_info):
+                pass
+
+        print_row("delete", *run(DatabaseReader(connection), read, results))
+        connection.close()
+        reader_connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Files list: the time of reading the files list rows (id, filename, previewpath) for all the files and for a search
+# result (an id list in the relevance order) with the rows queries and with the previous two queries per id
+# usage (from the program folder): python -m benchmarks.files_list [files count]
+
+import os, sys, time, random, tempfile
+
+from benchmarks.catalog_ingestion import create_database, get_results
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+REPEATS = 3
+
+
+def create_catalog(folder, count):
+    filepaths = [os.path.join("C:\\", "files", f"folder_{i // 1000}", f"image_{i}.jpg") for i in range(count)]
+    db = create_database(folder, "files_list.db", filepaths)
+
+    results = get_results(filepaths)
+    for i in range(0, count, THUMB_RESULTS_BATCH_SIZE):
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+    return db
+
+
+# the previous files list reading
+def read_by_id(db, ids):
+    return [(id, db.get_filename_by_id(id), db.get_previewpath_by_id(id)) for id in ids]
+
+
+# the median time of the repeats
+def measure(read):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        rows = list(read())
+        times.append(time.perf_counter() - start)
+    return sorted(times)[REPEATS // 2], rows
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_catalog(folder, count)
+        all_ids = db.get_all_files_ids()
+        random.seed(0)
+        search_ids = random.sample(all_ids, len(all_ids) // 10)
+
+        print(f"{count} files")
+        print(f"{'list':>14} {'files':>7} {'by id, ms':>10} {'rows, ms':>9}")
+        for name, ids, read_rows in (
+            ("all files", all_ids, db.get_all_files_rows),
+            ("search result", search_ids, lambda: db.get_files_rows(search_ids)),
+        ):
+            by_id_time, by_id_rows = measure(lambda: read_by_id(db, ids))
+            rows_time, rows = measure(read_rows)
+            assert rows == by_id_rows
+            print(f"{name:>14} {len(rows):>7} {by_id_time * 1000:>10.0f} {rows_time * 1000:>9.1f}")
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Folder view: the time of the folder files list by the folders table (the folder_id index), with and without
+# the subfolders files, and with the previous filepath LIKE scan filtered by the files folders
+# usage (from the program folder): python -m benchmarks.folder_view [files count]
+
+import os, sys, time, tempfile
+
+from benchmarks.catalog_ingestion import create_database, get_results
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+ROOT = os.path.join("C:\\", "files")
+# the files are in the folders of FOLDER_FILES files, every SUBFOLDERS folders are in one parent folder
+FOLDER_FILES = 1000
+SUBFOLDERS = 10
+
+REPEATS = 5
+
+
+def get_folderpath(i):
+    return os.path.join(ROOT, f"group_{i // (FOLDER_FILES * SUBFOLDERS)}", f"folder_{i // FOLDER_FILES}")
+
+
+def create_catalog(folder, count):
+    filepaths = [os.path.join(get_folderpath(i), f"image_{i}.jpg") for i in range(count)]
+    db = create_database(folder, "folders.db", filepaths)
+
+    results = get_results(filepaths)
+    for i in range(0, count, THUMB_RESULTS_BATCH_SIZE):
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+    return db
+
+
+# the previous view (only the folder files)
+def view_like(db, filepath):
+    db.cursor.execute("SELECT id, filepath FROM Files WHERE filepath LIKE ?", (filepath + "%",))
+    rows = db.cursor.fetchall()
+    return [id for id, fullpath in rows if os.path.dirname(fullpath) == filepath.rstrip(os.sep)]
+
+
+# the median time of the repeats
+def measure(view):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        ids = view()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[REPEATS // 2], len(ids)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_catalog(folder, count)
+        print(f"{count} files, {FOLDER_FILES} files in a folder, {SUBFOLDERS} folders in a group")
+
+        print(f"{'folder':>28} {'LIKE, ms':>9} {'files':>7} {'index, ms':>10} {'files':>7} {'recursive, ms':>14} {'files':>7}")
+        for filepath in (ROOT, os.path.dirname(get_folderpath(0)), get_folderpath(0), get_folderpath(count - 1)):
+            like_time, like_count = measure(lambda: view_like(db, filepath))
+            index_time, index_count = measure(lambda: db.get_ids_by_filepath(filepath))
+            recursive_time, recursive_count = measure(lambda: db.get_ids_by_filepath(filepath, recursive=True))
+            print(
+                f"{filepath:>28} {like_time * 1000:>9.1f} {like_count:>7} {index_time * 1000:>10.2f} {index_count:>7} "
+                f"{recursive_time * 1000:>14.1f} {recursive_count:>7}"
+            )
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
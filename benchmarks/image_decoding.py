@@ -0,0 +1,89 @@
+# Image thumbnails speed: the plain Image.thumbnail() against the reduced-resolution decoding
+# usage (from the program folder): python -m benchmarks.image_decoding [files per format]
+
+import os, sys, time, tempfile
+
+from PIL import Image
+
+from thumbs.render import create_image_thumbnail, ThumbFormat
+
+IMG_THUMB_SIZE = 128, 128
+
+# (format, extension, image size, frames count)
+IMAGE_SET = [
+    ("JPEG", ".jpg", (7680, 5120), 1),
+    ("JPEG CMYK", ".jpg", (6000, 4000), 1),
+    ("PNG", ".png", (6000, 4000), 1),
+    ("TIFF", ".tiff", (6000, 4000), 3),
+    ("GIF", ".gif", (2000, 1500), 10),
+    ("WEBP", ".webp", (6000, 4000), 1),
+]
+
+
+def create_plain_thumbnail(filepath, thumb_filepath):
+    with Image.open(filepath) as img:
+        img.thumbnail(IMG_THUMB_SIZE)
+        if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGB")
+        img.save(thumb_filepath)
+
+
+def generate_image(filepath, name, size, frames):
+    # gradient with noise is used to make the decoding and compression close to the real photos
+    base = Image.merge(
+        "RGB",
+        (
+            Image.linear_gradient("L").resize(size),
+            Image.effect_noise(size, 40),
+            Image.radial_gradient("L").resize(size),
+        ),
+    )
+    if name == "JPEG CMYK":
+        base = base.convert("CMYK")
+    if frames > 1:
+        images = [base] + [base.rotate(i * 10) for i in range(1, frames)]
+        if name == "GIF":
+            images = [image.convert("P") for image in images]
+        images[0].save(filepath, save_all=True, append_images=images[1:])
+    else:
+        base.save(filepath, quality=90)
+
+
+def measure(function, filepaths, thumb_filepath):
+    start = time.perf_counter()
+    for filepath in filepaths:
+        function(filepath, thumb_filepath)
+    return (time.perf_counter() - start) / len(filepaths)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    with tempfile.TemporaryDirectory() as folder:
+        thumb_filepath = os.path.join(folder, "thumb.png")
+
+        print(f"{'format':>10} {'size':>10} {'plain, ms':>10} {'reduced, ms':>12} {'speedup':>8}")
+        for name, extension, size, frames in IMAGE_SET:
+            filepaths = []
+            for i in range(count):
+                filepath = os.path.join(folder, f"{name.replace(' ', '_')}_{i}{extension}")
+                generate_image(filepath, name, size, frames)
+                filepaths.append(filepath)
+
+            plain_time = measure(create_plain_thumbnail, filepaths, thumb_filepath)
+            reduced_time = measure(
+                lambda filepath, thumb_filepath: create_image_thumbnail(
+                    filepath, {IMG_THUMB_SIZE[0]: thumb_filepath}, ThumbFormat.from_config()
+                ),
+                filepaths,
+                thumb_filepath,
+            )
+
+            print(
+                f"{name:>10} {size[0]}x{size[1]:<5} {plain_time * 1000:>10.1f} "
+                f"{reduced_time * 1000:>12.1f} {plain_time / reduced_time:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
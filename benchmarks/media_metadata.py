@@ -0,0 +1,87 @@
+# Media metadata speed (without the thumbnails): the files probed per second by the number of the probing threads
+# usage (from the program folder, ffmpeg.exe must be next to the program): python -m benchmarks.media_metadata [files per type]
+
+import os, sys, time, tempfile, subprocess
+
+import config
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from thumbs.metadata import probe_file
+from thumbs.render import IMAGE_FILE, VIDEO_FILE, AUDIO_FILE
+
+
+def generate_clip(filepath):
+    subprocess.run(
+        [
+            config.get_ffmpeg_path(),
+            "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", "testsrc2=duration=2:size=1280x720:rate=25",
+            "-f", "lavfi", "-i", "sine=duration=2",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+            filepath,
+        ],
+        check=True,
+    )
+
+
+def generate_track(filepath):
+    subprocess.run(
+        [
+            config.get_ffmpeg_path(),
+            "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", "sine=duration=10",
+            filepath,
+        ],
+        check=True,
+    )
+
+
+def generate_image(filepath):
+    Image.linear_gradient("L").resize((3000, 2000)).convert("RGB").save(filepath, quality=90)
+
+
+def measure(files, workers):
+    timeout = config.get_ffmpeg_timeout()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(lambda file: probe_file(file[0], file[1], timeout), files)
+        )
+    elapsed = time.perf_counter() - start
+
+    # the probed files without the codec are the failed ones
+    failed = sum(result[4] is None for result in results)
+    return len(files) / elapsed, failed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workers_set = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    with tempfile.TemporaryDirectory() as folder:
+        files_set = {VIDEO_FILE: [], AUDIO_FILE: [], IMAGE_FILE: []}
+        for i in range(count):
+            for file_type, extension, generate in (
+                (VIDEO_FILE, ".mp4", generate_clip),
+                (AUDIO_FILE, ".mp3", generate_track),
+                (IMAGE_FILE, ".jpg", generate_image),
+            ):
+                filepath = os.path.join(folder, f"{file_type}_{i}{extension}")
+                generate(filepath)
+                files_set[file_type].append((filepath, file_type))
+
+        print(f"files/s (failed files), {os.cpu_count()} CPU cores")
+        print(f"{'type':>6}" + "".join(f" {str(workers) + ' threads':>16}" for workers in workers_set))
+        for file_type, files in files_set.items():
+            row = f"{file_type:>6}"
+            for workers in workers_set:
+                speed, failed = measure(files, workers)
+                row += f" {speed:>11.1f} ({failed:>2})"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Tags search: the search time by the selected tags (all of them, any of them, without them) with the tags bitsets
+# index and with the previous JOIN query, and the text search results filtering by the tags
+# usage (from the program folder): python -m benchmarks.tag_search [files count]
+
+import os, sys, time, random, tempfile
+
+from benchmarks.catalog_ingestion import create_database, get_results
+from db.tag_index import ALL_TAGS, ANY_TAGS, NO_TAGS
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+TAGS = [f"Тег {i}" for i in range(20)]
+# every file gets up to this many custom tags
+MAX_FILE_TAGS = 3
+
+# the text search results which are filtered by the tags
+TEXT_RESULTS_COUNT = 5000
+
+REPEATS = 5
+
+
+def create_catalog(folder, count):
+    filepaths = [os.path.join("C:\\", "files", f"folder_{i // 1000}", f"image_{i}.jpg") for i in range(count)]
+    db = create_database(folder, "tags.db", filepaths)
+
+    results = get_results(filepaths)
+    for i in range(0, count, THUMB_RESULTS_BATCH_SIZE):
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+
+    for tag in TAGS:
+        db.save_tag_to_database(tag)
+    tags_ids = db.get_tags_ids(TAGS)
+    random.seed(0)
+    db.cursor.executemany(
+        "INSERT OR IGNORE INTO Files_tags (file_id, tag_id) VALUES (?, ?)",
+        [
+            (file_id, tags_ids[tag])
+            for file_id in range(1, count + 1)
+            for tag in random.sample(TAGS, random.randint(0, MAX_FILE_TAGS))
+        ],
+    )
+    db.save_changes()
+    return db
+
+
+# the previous search (only the files with all the tags)
+def search_join(db, tags_list):
+    placeholders = ", ".join(["?"] * len(tags_list))
+    db.cursor.execute(
+        f"""
+        SELECT f.id
+        FROM Files f
+        JOIN Files_tags ft on ft.file_id = f.id
+        JOIN Tags t ON ft.tag_id = t.id
+        WHERE t.tagname IN ({placeholders})
+        GROUP BY f.id
+        HAVING COUNT(DISTINCT t.tagname) = ?
+        """,
+        tags_list + [len(tags_list)],
+    )
+    return [r[0] for r in db.cursor.fetchall()]
+
+
+# the median time of the repeats
+def measure(search):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        ids = search()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[REPEATS // 2], len(ids)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_catalog(folder, count)
+
+        start = time.perf_counter()
+        db.get_tag_index()
+        print(f"{count} files, {len(TAGS)} tags, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"{'tags':>19} {'mode':>5} {'JOIN, ms':>9} {'files':>7} {'index, ms':>10} {'files':>7}")
+        for tags_list in (TAGS[:1], TAGS[:2], TAGS[:3], ["Image", TAGS[0]]):
+            join_time, join_count = measure(lambda: search_join(db, tags_list))
+            for mode in (ALL_TAGS, ANY_TAGS, NO_TAGS):
+                index_time, index_count = measure(lambda: db.get_ids_by_tags(tags_list, mode))
+                join_row = f"{join_time * 1000:>9.1f} {join_count:>7}" if mode == ALL_TAGS else f"{'':>17}"
+                print(
+                    f"{', '.join(tags_list):>19} {mode:>5} {join_row} "
+                    f"{index_time * 1000:>10.1f} {index_count:>7}"
+                )
+
+        # the text search results are in the relevance order, not the id one
+        text_ids = random.sample(range(1, count + 1), TEXT_RESULTS_COUNT)
+        tags_list = TAGS[:1]
+        start = time.perf_counter()
+        ids_by_tags = search_join(db, tags_list)
+        list_ids = [file for file in ids_by_tags if file in text_ids]
+        list_time = time.perf_counter() - start
+        index_time, index_count = measure(lambda: db.filter_ids_by_tags(text_ids, tags_list))
+        print(
+            f"{TEXT_RESULTS_COUNT} text results by {tags_list[0]}: lists intersection {list_time * 1000:.0f} ms "
+            f"({len(list_ids)} files), index {index_time * 1000:.1f} ms ({index_count} files)"
+        )
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Text search: the search time by the filename, description and tags with the FTS5 trigram index (Files_search)
+# and with the previous LIKE scan of the Files table
+# usage (from the program folder): python -m benchmarks.text_search [files count]
+
+import os, sys, time, tempfile
+
+from benchmarks.catalog_ingestion import create_database, get_results
+from fhandler import THUMB_RESULTS_BATCH_SIZE
+
+# every 10th file has a description
+DESCRIPTIONS = [
+    "Закат над морем, снято с пирса",
+    "Интервью с режиссером, второй дубль",
+    "Рыжий кот спит на диване",
+    "Concert recording, main stage, night",
+]
+
+QUERIES = ["image_12345", "кот", "main stage", "image_1999", "не найдено", "ca", "e_"]
+
+REPEATS = 5
+
+
+def create_catalog(folder, count):
+    filepaths = [os.path.join("C:\\", "files", f"folder_{i // 1000}", f"image_{i}.jpg") for i in range(count)]
+    db = create_database(folder, "search.db", filepaths)
+
+    results = get_results(filepaths)
+    for i in range(0, count, THUMB_RESULTS_BATCH_SIZE):
+        db.save_thumbnails(results[i:i + THUMB_RESULTS_BATCH_SIZE])
+
+    db.cursor.executemany(
+        "UPDATE Files SET description = ? WHERE id = ?",
+        [(DESCRIPTIONS[i // 10 % len(DESCRIPTIONS)], i) for i in range(1, count + 1, 10)],
+    )
+    db.save_changes()
+    return db
+
+
+# the previous search
+def search_like(db, text):
+    db.cursor.execute(
+        "SELECT id FROM Files WHERE description LIKE ? OR filename LIKE ?", (f"%{text}%", f"%{text}%")
+    )
+    return [r[0] for r in db.cursor.fetchall()]
+
+
+# the median time of the repeats
+def measure(search, db, text):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        ids = search(db, text)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[REPEATS // 2], len(ids)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        db = create_catalog(folder, count)
+        print(f"{count} files, catalog created in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query':>14} {'LIKE, ms':>9} {'files':>7} {'FTS5, ms':>9} {'files':>7}")
+        for text in QUERIES:
+            like_time, like_count = measure(search_like, db, text)
+            fts_time, fts_count = measure(lambda db, text: db.get_ids_by_text(text), db, text)
+            print(f"{text:>14} {like_time * 1000:>9.1f} {like_count:>7} {fts_time * 1000:>9.1f} {fts_count:>7}")
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Thumbnails formats: the bytes on disk and the files list (grid) load time of the PNG, WebP and JPEG thumbnails
+# usage (from the program folder): python -m benchmarks.thumbnail_formats [images count]
+
+import os, sys, time, tempfile
+
+import config
+
+from PIL import Image
+from PySide6.QtGui import QGuiApplication, QImage
+
+from thumbs.render import create_image_thumbnail, ThumbFormat
+
+# the grid thumbnail and the preview rendition
+LEVELS = [128, 256]
+
+IMAGE_SIZE = (3000, 2000)
+
+# (thumbnails format, quality)
+FORMATS_SET = [
+    (config.PNG_FORMAT, 0),
+    (config.WEBP_FORMAT, 80),
+    (config.WEBP_FORMAT, 60),
+    (config.JPEG_FORMAT, 80),
+    (config.JPEG_FORMAT, 60),
+]
+
+
+def generate_image(filepath, seed):
+    # gradient with noise is used to make the compression close to the real photos
+    base = Image.merge(
+        "RGB",
+        (
+            Image.linear_gradient("L").rotate(seed * 37).resize(IMAGE_SIZE),
+            Image.effect_noise(IMAGE_SIZE, 40),
+            Image.radial_gradient("L").resize(IMAGE_SIZE),
+        ),
+    )
+    base.save(filepath, quality=90)
+
+
+# the files list loads only the smallest rendition of every file
+def load_grid(thumb_filepaths):
+    start = time.perf_counter()
+    for thumb_filepath in thumb_filepaths:
+        if QImage(thumb_filepath).isNull():
+            raise RuntimeError(f"{thumb_filepath} is not loaded")
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    app = QGuiApplication(sys.argv[:1])
+
+    with tempfile.TemporaryDirectory() as folder:
+        filepaths = []
+        for i in range(count):
+            filepath = os.path.join(folder, f"image_{i}.jpg")
+            generate_image(filepath, i)
+            filepaths.append(filepath)
+
+        print(f"{count} images {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}, thumbnails {LEVELS}")
+        print(
+            f"{'format':>10} {'grid, KB':>9} {'all, KB':>9} {'per file, B':>12} "
+            f"{'create, ms':>11} {'grid load, ms':>14}"
+        )
+        for name, quality in FORMATS_SET:
+            thumb_format = ThumbFormat(name, quality)
+            thumb_folder = os.path.join(folder, thumb_format.get_param())
+            os.makedirs(thumb_folder)
+
+            grid_filepaths = []
+            start = time.perf_counter()
+            for i, filepath in enumerate(filepaths):
+                renditions_paths = {
+                    size: os.path.join(thumb_folder, f"{i}@{size}{thumb_format.extension}")
+                    for size in LEVELS
+                }
+                create_image_thumbnail(filepath, renditions_paths, thumb_format)
+                grid_filepaths.append(renditions_paths[LEVELS[0]])
+            create_time = (time.perf_counter() - start) / count
+
+            grid_size = sum(os.path.getsize(path) for path in grid_filepaths)
+            total_size = sum(
+                os.path.getsize(os.path.join(thumb_folder, file_name)) for file_name in os.listdir(thumb_folder)
+            )
+            # the first load reads the files from disk, the second one shows the decoding time only
+            load_grid(grid_filepaths)
+            load_time = load_grid(grid_filepaths)
+
+            print(
+                f"{thumb_format.get_param():>10} {grid_size / 1024:>9.1f} {total_size / 1024:>9.1f} "
+                f"{grid_size // count:>12} {create_time * 1000:>11.1f} {load_time * 1000:>14.1f}"
+            )
+
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Thumbnail engine throughput depending on the number of the worker processes
+# usage (from the program folder): python -m benchmarks.thumbnail_workers [files count]
+
+import os, sys, time, tempfile
+
+from PIL import Image
+
+from thumbs.engine import ThumbnailEngine
+from thumbs.render import IMAGE_FILE
+
+
+def generate_images(folder, count):
+    filepaths = []
+    for i in range(count):
+        filepath = os.path.join(folder, f"image_{i}.jpg")
+        # noise is used to make the decoding cost close to the real photos
+        Image.effect_noise((3000, 2000), 64).convert("RGB").save(filepath, quality=90)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    cpu_count = os.cpu_count() or 1
+
+    workers_counts = sorted({1, 2, 4, 8, 16, cpu_count} & set(range(1, cpu_count + 1)))
+
+    with tempfile.TemporaryDirectory() as folder:
+        save_path = os.path.join(folder, "thumbnails")
+        os.makedirs(save_path)
+
+        print(f"generating {count} images...")
+        jobs = [(filepath, IMAGE_FILE, save_path) for filepath in generate_images(folder, count)]
+
+        print(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'speedup':>8}")
+        base_time = None
+        for workers in workers_counts:
+            start = time.perf_counter()
+            for _ in ThumbnailEngine(workers).create_thumbnails(jobs):
+                pass
+            elapsed = time.perf_counter() - start
+
+            base_time = base_time or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {count / elapsed:>9.1f} {base_time / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Video thumbnails speed: the accurate seek with the full decoding against the keyframe seek with the batched ffmpeg runs
+# usage (from the program folder, ffmpeg.exe must be next to the program): python -m benchmarks.video_thumbnails [clips count]
+
+import os, sys, time, tempfile, subprocess
+
+import ffmpeg
+import config
+
+from thumbs.render import create_video_thumbnails
+
+# (clip duration in seconds, keyframe interval in frames)
+CLIPS_SET = [(0.5, 250), (3, 250), (30, 250)]
+
+
+def create_accurate_thumbnail(filepath, thumb_filepath):
+    (
+        ffmpeg.input(filepath, ss=1)
+        .filter("scale", 512, -1)
+        .output(thumb_filepath, vframes=1, loglevel="quiet")
+        .overwrite_output()
+        .run(cmd=config.get_ffmpeg_path())
+    )
+
+
+def generate_clip(filepath, duration, gop):
+    subprocess.run(
+        [
+            config.get_ffmpeg_path(),
+            "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=duration={duration}:size=1920x1080:rate=25",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", str(gop),
+            filepath,
+        ],
+        check=True,
+    )
+
+
+def measure(function, videos):
+    start = time.perf_counter()
+    function(videos)
+    elapsed = time.perf_counter() - start
+    missing = sum(not os.path.exists(thumb_filepath) for _, thumb_filepath in videos)
+    for _, thumb_filepath in videos:
+        if os.path.exists(thumb_filepath):
+            os.remove(thumb_filepath)
+    return len(videos) / elapsed, missing
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    batch_sizes = [1, 4, 8, 16]
+
+    with tempfile.TemporaryDirectory() as folder:
+        header = f"{'clip':>6} {'accurate':>14}" + "".join(f" {'batch ' + str(size):>14}" for size in batch_sizes)
+        print("clips/s (clips without thumbnail)")
+        print(header)
+
+        for duration, gop in CLIPS_SET:
+            videos = []
+            for i in range(count):
+                filepath = os.path.join(folder, f"clip_{duration}_{i}.mp4")
+                generate_clip(filepath, duration, gop)
+                videos.append((filepath, os.path.join(folder, f"thumb_{i}.png")))
+
+            def accurate(videos):
+                for filepath, thumb_filepath in videos:
+                    create_accurate_thumbnail(filepath, thumb_filepath)
+
+            row = f"{str(duration) + ' s':>6}"
+            speed, missing = measure(accurate, videos)
+            row += f" {speed:>9.1f} ({missing:>2})"
+
+            for size in batch_sizes:
+                def keyframe(videos, size=size):
+                    for i in range(0, len(videos), size):
+                        create_video_thumbnails(videos[i : i + size], 512, config.get_ffmpeg_timeout())
+
+                speed, missing = measure(keyframe, videos)
+                row += f" {speed:>9.1f} ({missing:>2})"
+
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
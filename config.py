@@ -1,4 +1,4 @@
-import sys, os, json
+import sys, os, json, warnings
 
 from dotenv import load_dotenv
 
@@ -44,3 +44,170 @@ def get_files_folder_path():
 def get_thumb_folder_path():
     load_dotenv()
     return os.getenv("THUMB_FOLDER_PATH")
+
+
+# the settings are read by the background threads and the thumbnails workers too, where an error would stop the work,
+# so the wrong values are replaced by the defaults (with a warning) and the numbers are kept in their bounds
+def get_int_setting(name, default, minimum, maximum=None) -> int:
+    load_dotenv()
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    try:
+        number = int(value)
+    except ValueError:
+        warnings.warn(f"Неверное значение {name}={value!r} в .env, используется {default}")
+        return default
+
+    bounded = max(number, minimum) if maximum is None else min(max(number, minimum), maximum)
+    if bounded != number:
+        warnings.warn(f"Значение {name}={number} в .env вне допустимых пределов, используется {bounded}")
+    return bounded
+
+
+# the value is compared without the case and the spaces, aliases are the other names of the choices
+def get_choice_setting(name, default, choices, aliases=None) -> str:
+    load_dotenv()
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    choice = value.strip().lower()
+    choice = (aliases or {}).get(choice, choice)
+    if choice not in choices:
+        warnings.warn(f"Неверное значение {name}={value!r} в .env, используется {default}")
+        return default
+    return choice
+
+
+# the directory listing is IO-bound (especially on the network shares), so the number of threads doesn't depend on the CPU cores
+def get_scan_workers() -> int:
+    return get_int_setting("SCAN_WORKERS", 16, 1)
+
+
+# the file system events are collected for this delay (ms) before the rescan, so a copy of many files causes only one scan
+def get_watch_debounce() -> int:
+    return get_int_setting("WATCH_DEBOUNCE", 500, 0)
+
+
+# the network shares don't send the file system events, so the folder is also rescanned every N seconds (0 - disabled)
+def get_watch_poll_interval() -> int:
+    return get_int_setting("WATCH_POLL_INTERVAL", 60, 0)
+
+
+# the files rewritten in place don't change their folder mtime, so all the folders are listed again (the full scan)
+# on the program launch and then every N minutes, 0 - only the changed folders are listed (like for a big network archive)
+def get_scan_verify_interval() -> int:
+    return get_int_setting("SCAN_VERIFY_INTERVAL", 60, 0)
+
+
+# the thumbnails are created in the separate processes, one per CPU core by default
+# (Windows doesn't allow more than 61 worker processes)
+def get_thumb_workers() -> int:
+    return get_int_setting("THUMB_WORKERS", min(os.cpu_count() or 1, 61), 1, 61)
+
+
+# the media metadata (duration, resolution, codecs) is read by the ffmpeg processes, the threads only wait for them,
+# so the number of threads is the number of the ffmpeg processes running at once
+def get_metadata_workers() -> int:
+    return get_int_setting("METADATA_WORKERS", os.cpu_count() or 1, 1)
+
+
+# the SQLite settings of the catalog DB connections (see db/connection.py)
+# "NORMAL" is safe with the WAL journal (a power loss can lose only the last commits, the DB isn't corrupted),
+# "FULL" syncs every commit to disk
+def get_db_synchronous() -> str:
+    load_dotenv()
+    return os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+
+
+# the page cache of every connection (KB)
+def get_db_cache_size() -> int:
+    return get_int_setting("DB_CACHE_SIZE", 32768, 0)
+
+
+# the DB file is read through the memory mapping up to this size (MB), 0 - disabled
+def get_db_mmap_size() -> int:
+    return get_int_setting("DB_MMAP_SIZE", 256, 0)
+
+
+# "MEMORY" - the temporary tables and indexes (like of the sorting) are kept in memory, "FILE" - on disk
+def get_db_temp_store() -> str:
+    load_dotenv()
+    return os.getenv("DB_TEMP_STORE", "MEMORY").upper()
+
+
+# the number of the read-only DB connections of the background threads
+def get_db_readers() -> int:
+    return get_int_setting("DB_READERS", 4, 1)
+
+
+# the number of the videos handled by one ffmpeg run (the process start is slower than the thumbnail for the short clips)
+def get_video_batch_size() -> int:
+    return get_int_setting("VIDEO_BATCH_SIZE", 8, 1)
+
+
+# "files" - every thumbnail is a separate PNG file, "pack" - all the thumbnails are appended to one pack file
+FILES_STORAGE = "files"
+PACK_STORAGE = "pack"
+
+
+def get_thumb_storage() -> str:
+    return get_choice_setting("THUMB_STORAGE", FILES_STORAGE, [FILES_STORAGE, PACK_STORAGE])
+
+
+# the thumbnails image format: "png" (lossless, the biggest files), "webp" or "jpeg" (lossy, with the THUMB_QUALITY 1-100)
+PNG_FORMAT = "png"
+WEBP_FORMAT = "webp"
+JPEG_FORMAT = "jpeg"
+THUMB_FORMATS = [PNG_FORMAT, WEBP_FORMAT, JPEG_FORMAT]
+# the other names of the formats (like the file extension)
+THUMB_FORMATS_ALIASES = {"jpg": JPEG_FORMAT}
+
+
+def get_thumb_format() -> str:
+    return get_choice_setting("THUMB_FORMAT", WEBP_FORMAT, THUMB_FORMATS, THUMB_FORMATS_ALIASES)
+
+
+def get_thumb_quality() -> int:
+    return get_int_setting("THUMB_QUALITY", 80, 1, 100)
+
+
+# the thumbnail sizes created from one decoding: the smallest one is shown in the files list,
+# the bigger ones are loaded by the preview window
+def get_thumb_levels() -> list:
+    load_dotenv()
+    levels = set()
+    for size in os.getenv("THUMB_LEVELS", "128,256").split(","):
+        try:
+            levels.add(int(size))
+        except ValueError:
+            continue
+    levels = {size for size in levels if size > 0}
+    if not levels:
+        warnings.warn(f"Неверное значение THUMB_LEVELS={os.getenv('THUMB_LEVELS')!r} в .env, используется 128,256")
+        return [128, 256]
+    return sorted(levels)
+
+
+# the number of the frames in the video storyboard (shown in the preview window when the mouse is over the preview)
+def get_storyboard_frames() -> int:
+    return get_int_setting("STORYBOARD_FRAMES", 10, 1)
+
+
+# "eager" - the GUI waits until the thumbnails of all the new files are created,
+# "on_demand" - the files are shown right away with the placeholder icons and the thumbnails are created
+# in the files list viewport order (the visible files first)
+EAGER_MODE = "eager"
+ON_DEMAND_MODE = "on_demand"
+
+
+def get_thumb_mode() -> str:
+    return get_choice_setting("THUMB_MODE", EAGER_MODE, [EAGER_MODE, ON_DEMAND_MODE])
+
+
+# the time limit (seconds) of one ffmpeg run for a thumbnail, a waveform or a storyboard,
+# the hung ffmpeg is killed and the file gets the error icon
+def get_ffmpeg_timeout() -> int:
+    return get_int_setting("FFMPEG_TIMEOUT", 60, 1)
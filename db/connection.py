@@ -0,0 +1,78 @@
+import os, queue, pathlib, sqlite3, threading, config
+from contextlib import contextmanager
+
+# the catalog DB connections: the writer (the GUI thread) and the read-only connections of the background threads
+# the DB is in the WAL mode, so the readers are not blocked by the writer and see the last committed state
+
+# the writer waits for the other writers (like the thumbnail jobs claims) instead of failing
+WRITE_TIMEOUT = 30
+
+
+# the pragmas of every connection, the journal mode is set by the writer only (it's saved in the DB file)
+def apply_pragmas(connection):
+    connection.execute(f"PRAGMA synchronous = {config.get_db_synchronous()}")
+    # the negative cache_size is in KB instead of the pages
+    connection.execute(f"PRAGMA cache_size = -{config.get_db_cache_size()}")
+    connection.execute(f"PRAGMA mmap_size = {config.get_db_mmap_size() * 1024 * 1024}")
+    connection.execute(f"PRAGMA temp_store = {config.get_db_temp_store()}")
+    # need to activate foreign_keys on every DB connection
+    connection.execute("PRAGMA foreign_keys = ON")
+
+
+def connect_writer(db_path):
+    connection = sqlite3.connect(db_path, timeout=WRITE_TIMEOUT)
+    connection.execute("PRAGMA journal_mode = WAL")
+    apply_pragmas(connection)
+    return connection
+
+
+# the read-only connection can open the WAL DB only while the writer is connected (it creates the shared memory file),
+# so the readers are used only by DatabaseHandler, which keeps the writer open
+def connect_reader(db_path):
+    uri = pathlib.Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+    connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    apply_pragmas(connection)
+    return connection
+
+
+# the read-only connections are created on demand up to the size and reused by the threads,
+# the thread waits for a free connection if all of them are taken
+class ReadConnectionPool:
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self.size = size
+        self.connections = queue.Queue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                return connect_reader(self.db_path)
+        return self.connections.get()
+
+    # the queries of one "with" block are in one read transaction, so they see the same DB state
+    # even if the writer commits meanwhile
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            connection.execute("BEGIN")
+            yield connection
+        finally:
+            connection.rollback()
+            self.connections.put(connection)
+
+    # the connections which are taken by the threads are closed by the garbage collector
+    def close(self):
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                return
@@ -1,42 +1,297 @@
-import os, sqlite3, config
+import os, config
+from contextlib import contextmanager
+from .connection import connect_writer, ReadConnectionPool
 from .migrator import DatabaseMigrator
+from .tag_index import TagIndex, ALL_TAGS
 
+# the thumbnail job is failed after this many interrupted attempts
+MAX_THUMBNAIL_ATTEMPTS = 3
+
+# the IN lists (the tags index updates, the files list rows) are split by this many values (SQLite limits the query parameters number)
+QUERY_CHUNK_SIZE = 500
+
+# the search index (Files_search) is made of the trigrams, so the shorter queries are checked against every file
+SEARCH_MIN_LENGTH = 3
+
+
+# the query is searched as one phrase (as a substring), the FTS5 query syntax characters are not used
+def get_search_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
 
-class DatabaseHandler:
-    def __init__(self, error_window):
 
-        folder_path = os.path.join(config.assign_script_dir(), "fhandler_data")
-        os.makedirs(folder_path, exist_ok=True)
-        self.db_path = os.path.join(folder_path, "files.db")
+class DatabaseHandler:
+    # db_path is given only for a separate DB (like in the benchmarks), the program uses the one in fhandler_data
+    def __init__(self, error_window, db_path=None):
+
+        if db_path is None:
+            folder_path = os.path.join(config.assign_script_dir(), "fhandler_data")
+            os.makedirs(folder_path, exist_ok=True)
+            db_path = os.path.join(folder_path, "files.db")
+        self.db_path = db_path
         self.error_window = error_window
 
         self.connect_to_database()
+        # the read-only connections of the background threads (see read)
+        self.readers = ReadConnectionPool(self.db_path, config.get_db_readers())
+        # the tags bitsets (see get_tag_index)
+        self.tag_index = None
 
         self.migrator = DatabaseMigrator(self.connection, self.error_window)
         
 
     def apply_migrations(self):
         self.migrator.apply_migrations()
+        self.update_files_folders()
 
 
+    # the only writer connection of the catalog, it's used by the GUI thread
     def connect_to_database(self):
 
-        self.connection = sqlite3.connect(self.db_path)
+        self.connection = connect_writer(self.db_path)
         self.cursor = self.connection.cursor()
 
-        # need to activate foreign_keys on every DB connection
-        self.cursor.execute("PRAGMA foreign_keys = ON;")
+    # the DB reading from the other threads: the DatabaseReader queries on a read-only connection of the pool,
+    # the queries of one "with" block see the same DB state
+    @contextmanager
+    def read(self):
+        with self.readers.connection() as connection:
+            yield DatabaseReader(connection)
 
     def save_changes(self):
         self.connection.commit()
 
+    # the cursor is closed first, otherwise the connection is closed only by the garbage collector
+    # (and the WAL file is kept until then)
     def close_connection(self):
+        self.readers.close()
+        self.cursor.close()
         self.connection.close()
 
-    def save_to_database(self, file_name: str, file_path: str, preview_path: str):
+    # a rescanned (modified) file keeps its row, so the id, tags and description are preserved
+    # rows is a list of (filename, filepath, previewpath, tags, size, mtime, fingerprint, error) from the thumbnails
+    # creation, the whole batch is saved in one transaction: the files rows, their tags and their jobs states
+    # the failed job is the negative cache entry: the file isn't decoded again until its size or mtime is changed
+    def save_thumbnails(self, rows):
+        folders_ids = self.get_folders_ids(os.path.dirname(row[1]) for row in rows)
+        self.cursor.executemany(
+            """
+            INSERT INTO Files (filename, filepath, previewpath, size, mtime, fingerprint, folder_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filepath) DO UPDATE SET
+                previewpath = excluded.previewpath,
+                size = excluded.size,
+                mtime = excluded.mtime,
+                fingerprint = excluded.fingerprint,
+                folder_id = excluded.folder_id
+            """,
+            [
+                (filename, filepath, previewpath, size, mtime, fingerprint, folders_ids[os.path.dirname(filepath)])
+                for filename, filepath, previewpath, _, size, mtime, fingerprint, _ in rows
+            ],
+        )
+
+        # the tags ids are read once for the batch, the unknown tags are skipped
+        tags_ids = self.get_tags_ids({tag for row in rows for tag in row[3]})
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO Files_tags (file_id, tag_id) SELECT id, ? FROM Files WHERE filepath = ?",
+            [
+                (tags_ids[tag], filepath)
+                for _, filepath, _, tags, _, _, _, _ in rows
+                for tag in tags
+                if tag in tags_ids
+            ],
+        )
+
+        self.cursor.executemany(
+            "UPDATE Thumbnail_jobs SET state = 'done', error = NULL WHERE filepath = ?",
+            [(filepath,) for _, filepath, _, _, _, _, _, error in rows if not error],
+        )
+        self.cursor.executemany(
+            """
+            UPDATE Thumbnail_jobs SET state = 'failed', size = ?, mtime = ?, error = ?
+            WHERE filepath = ?
+            """,
+            [
+                (size, mtime, error, filepath)
+                for _, filepath, _, _, size, mtime, _, error in rows
+                if error
+            ],
+        )
+        self.save_changes()
+        self.update_tag_index("filepath", [row[1] for row in rows])
+
+    # returns {tagname: id} of the existing tags
+    def get_tags_ids(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        placeholders = ", ".join(["?"] * len(tags))
+        self.cursor.execute(f"SELECT tagname, id FROM Tags WHERE tagname IN ({placeholders})", tags)
+        return dict(self.cursor.fetchall())
+
+    # files is a list of (filename, filepath, size, mtime, tag), the files are saved with the placeholder
+    # previewpath (an empty string) until their thumbnails are created, the already saved files are not changed
+    def save_pending_files(self, files):
+        folders_ids = self.get_folders_ids(os.path.dirname(file[1]) for file in files)
+        self.cursor.executemany(
+            """
+            INSERT INTO Files (filename, filepath, previewpath, size, mtime, folder_id)
+            VALUES (?, ?, '', ?, ?, ?)
+            ON CONFLICT(filepath) DO NOTHING
+            """,
+            [
+                (filename, filepath, size, mtime, folders_ids[os.path.dirname(filepath)])
+                for filename, filepath, size, mtime, _ in files
+            ],
+        )
+        self.cursor.executemany(
+            """
+            INSERT OR IGNORE INTO Files_tags (file_id, tag_id)
+            SELECT f.id, t.id
+            FROM Files f
+            JOIN Tags t ON t.tagname = ?
+            WHERE f.filepath = ?
+            """,
+            [(tag, filepath) for _, filepath, _, _, tag in files],
+        )
+        self.save_changes()
+        self.update_tag_index("filepath", [file[1] for file in files])
+
+    # the thumbnail jobs are recorded before the thumbnails creation, so an interrupted import is resumed after a restart
+    # (the jobs are claimed by the thumbnail creation thread, see db/jobs.py)
+    # the unfinished jobs keep their attempts, the finished ones are started again from scratch
+    def add_thumbnail_jobs(self, filepaths):
+        self.cursor.executemany(
+            """
+            INSERT INTO Thumbnail_jobs (filepath, state, attempts) VALUES (?, 'pending', 0)
+            ON CONFLICT(filepath) DO UPDATE SET
+                attempts = CASE WHEN state IN ('done', 'failed') THEN 0 ELSE attempts END,
+                state = 'pending'
+            """,
+            [(filepath,) for filepath in filepaths],
+        )
+        self.save_changes()
+
+    # the jobs which were running when the program was closed (or crashed) are started again,
+    # the files which were tried too many times (like the ones which crash the decoder) are failed
+    # (their stats are not known, they are saved by the next scan)
+    def reset_interrupted_thumbnail_jobs(self):
+        self.cursor.execute(
+            """
+            UPDATE Thumbnail_jobs
+            SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                error = CASE WHEN attempts >= ? THEN ? ELSE error END
+            WHERE state = 'running'
+            """,
+            (
+                MAX_THUMBNAIL_ATTEMPTS,
+                MAX_THUMBNAIL_ATTEMPTS,
+                "Обработка файла прерывалась несколько раз",
+            ),
+        )
+        self.save_changes()
+
+    def get_pending_thumbnail_jobs(self):
+        self.cursor.execute(
+            "SELECT filepath FROM Thumbnail_jobs WHERE state = 'pending'"
+        )
+        rows = self.cursor.fetchall()
+        return [r[0] for r in rows]
+
+    # returns {filepath: (size, mtime)} of the failed files
+    def get_failed_thumbnail_jobs(self):
+        self.cursor.execute(
+            "SELECT filepath, size, mtime FROM Thumbnail_jobs WHERE state = 'failed'"
+        )
+        rows = self.cursor.fetchall()
+        return {filepath: (size, mtime) for filepath, size, mtime in rows}
+
+    # files_stats is a {filepath: (size, mtime)} dict
+    def update_failed_thumbnail_jobs_stats(self, files_stats):
+        self.cursor.executemany(
+            "UPDATE Thumbnail_jobs SET size = ?, mtime = ? WHERE filepath = ?",
+            [(size, mtime, filepath) for filepath, (size, mtime) in files_stats.items()],
+        )
+        self.save_changes()
+
+    # returns the list of (filepath, error message) of the failed files
+    def get_thumbnail_errors(self):
+        self.cursor.execute(
+            "SELECT filepath, error FROM Thumbnail_jobs WHERE state = 'failed' ORDER BY filepath"
+        )
+        return self.cursor.fetchall()
+
+    def delete_thumbnail_jobs(self, filepaths):
+        self.cursor.executemany(
+            "DELETE FROM Thumbnail_jobs WHERE filepath = ?",
+            [(filepath,) for filepath in filepaths],
+        )
+        self.save_changes()
+
+    # returns {folderpath: mtime} of the folders saved after the last scan
+    # (the folders added with their files but not scanned yet have no mtime, see get_folders_ids)
+    def get_folders_mtimes(self):
+        self.cursor.execute("SELECT folderpath, mtime FROM Folders WHERE mtime IS NOT NULL")
+        rows = self.cursor.fetchall()
+        return {folderpath: mtime for folderpath, mtime in rows}
+
+    # folders is a {folderpath: mtime} dict of all the scanned folders, deleted_folders are the folders which are
+    # surely deleted (the other not scanned ones, like the ones which failed to list, keep their previous mtimes)
+    def save_folders_mtimes(self, folders, deleted_folders=()):
+        self.cursor.executemany(
+            """
+            INSERT INTO Folders (folderpath, mtime) VALUES (?, ?)
+            ON CONFLICT(folderpath) DO UPDATE SET mtime = excluded.mtime
+            """,
+            folders.items(),
+        )
+
+        self.cursor.executemany(
+            "DELETE FROM Folders WHERE folderpath = ?",
+            [(folderpath,) for folderpath in deleted_folders],
+        )
+        # the deleted rows set folder_id of their files to NULL, the files which are still in the DB (like the ones
+        # deleted after the index is saved) get their folder again in the same transaction, so the folder view never
+        # misses them
+        self.update_files_folders()
+        self.save_changes()
+
+    # returns {folderpath: id}, the unknown folders are added without the mtime (they are scanned later)
+    def get_folders_ids(self, folderpaths):
+        folders_ids = {}
+        for folderpath in set(folderpaths):
+            self.cursor.execute(
+                """
+                INSERT INTO Folders (folderpath) VALUES (?)
+                ON CONFLICT(folderpath) DO UPDATE SET folderpath = excluded.folderpath
+                RETURNING id
+                """,
+                (folderpath,),
+            )
+            folders_ids[folderpath] = self.cursor.fetchone()[0]
+        return folders_ids
+
+    # the files saved before the 010 migration (or which folder row was deleted) get their folder_id
+    def update_files_folders(self):
+        self.cursor.execute("SELECT id, filepath FROM Files WHERE folder_id IS NULL")
+        rows = self.cursor.fetchall()
+        if not rows:
+            return
+
+        folders_ids = self.get_folders_ids(os.path.dirname(filepath) for _, filepath in rows)
+        self.cursor.executemany(
+            "UPDATE Files SET folder_id = ? WHERE id = ?",
+            [(folders_ids[os.path.dirname(filepath)], id) for id, filepath in rows],
+        )
+        self.save_changes()
+
+    # the folders which were added with the files (without the mtime) and have no files anymore
+    def delete_unused_folders(self):
         self.cursor.execute(
-            "INSERT INTO Files (filename, filepath, previewpath) VALUES (?, ?, ?)",
-            (file_name, file_path, preview_path),
+            """
+            DELETE FROM Folders
+            WHERE mtime IS NULL AND NOT EXISTS (SELECT 1 FROM Files WHERE folder_id = Folders.id)
+            """
         )
 
     def save_tag_to_database(self, tag_name: str):
@@ -47,8 +302,11 @@ class DatabaseHandler:
         self.save_changes()
 
     def delete_tag_from_database(self, tag_hame: str):
+        tag_id = self.get_tags_ids([tag_hame]).get(tag_hame)
         self.cursor.execute("DELETE FROM Tags WHERE tagname = ?", (tag_hame,))
         self.save_changes()
+        if self.tag_index is not None:
+            self.tag_index.remove_tag(tag_id)
 
     def get_all_tagnames(self):
         self.cursor.execute("SELECT tagname FROM Tags")
@@ -89,6 +347,7 @@ class DatabaseHandler:
                 (tag, filepath),
             )
         self.save_changes()
+        self.update_tag_index("filepath", [filepath])
 
     # check if the tag is already in the table and return True if the DB query returns !=Null, return False otherwise
     def tag_exists(self, tag_name: str) -> bool:
@@ -118,6 +377,22 @@ class DatabaseHandler:
 
         return [row[0] for row in rows]
 
+    # return the preview paths which are not used by any file (the thumbnails are shared by the files with the same content)
+    def get_unused_previewpaths(self, previewpaths):
+        previewpaths = set(previewpaths)
+        if not previewpaths:
+            return []
+
+        placeholders = ", ".join(["?"] * len(previewpaths))
+
+        query = f"SELECT DISTINCT previewpath FROM Files WHERE previewpath IN ({placeholders})"
+
+        self.cursor.execute(query, tuple(previewpaths))
+
+        rows = self.cursor.fetchall()
+
+        return list(previewpaths - {row[0] for row in rows})
+
     def get_all_filenames(self):
         self.cursor.execute("SELECT filename FROM Files")
         rows = self.cursor.fetchall()
@@ -125,16 +400,17 @@ class DatabaseHandler:
 
     def get_files_by_filepath(self, filepath):
         self.cursor.execute(
-            "SELECT filename, filepath FROM Files WHERE filepath LIKE ?",
-            (filepath + "%",),
+            """
+            SELECT f.filename
+            FROM Folders d
+            JOIN Files f ON f.folder_id = d.id
+            WHERE d.folderpath = ?
+            ORDER BY f.id
+            """,
+            (filepath.rstrip(os.sep),),
         )
         rows = self.cursor.fetchall()
-        files_in_folder = [
-            filename
-            for filename, fullpath in rows
-            if os.path.dirname(fullpath) == filepath.rstrip(os.sep)
-        ]
-        return files_in_folder
+        return [r[0] for r in rows]
 
     def get_filepath(self, file):
         self.cursor.execute("SELECT filepath FROM Files WHERE filename = ?", (file,))
@@ -146,6 +422,81 @@ class DatabaseHandler:
         rows = self.cursor.fetchall()
         return [r[0] for r in rows]
 
+    # returns {filepath: (size, mtime)}, the stats are None for the files saved before the 003 migration
+    def get_files_stats(self):
+        self.cursor.execute("SELECT filepath, size, mtime FROM Files")
+        rows = self.cursor.fetchall()
+        return {filepath: (size, mtime) for filepath, size, mtime in rows}
+
+    # returns {filepath: fingerprint} of the files which have the fingerprint saved
+    def get_files_fingerprints(self):
+        self.cursor.execute(
+            "SELECT filepath, fingerprint FROM Files WHERE fingerprint IS NOT NULL"
+        )
+        rows = self.cursor.fetchall()
+        return {filepath: fingerprint for filepath, fingerprint in rows}
+
+    # moved_files is a {old filepath: (new filepath, size, mtime, fingerprint)} dict
+    # the file row is kept, so the moved file keeps its tags, description and thumbnail
+    def update_moved_files(self, moved_files):
+        folders_ids = self.get_folders_ids(os.path.dirname(new_path) for new_path, *_ in moved_files.values())
+        self.cursor.executemany(
+            """
+            UPDATE Files SET filename = ?, filepath = ?, size = ?, mtime = ?, fingerprint = ?, folder_id = ?
+            WHERE filepath = ?
+            """,
+            [
+                (
+                    os.path.basename(new_path), new_path, size, mtime, fingerprint,
+                    folders_ids[os.path.dirname(new_path)], old_path,
+                )
+                for old_path, (new_path, size, mtime, fingerprint) in moved_files.items()
+            ],
+        )
+        self.delete_unused_folders()
+        self.cursor.executemany(
+            "UPDATE OR REPLACE Thumbnail_jobs SET filepath = ? WHERE filepath = ?",
+            [(new_path, old_path) for old_path, (new_path, *_) in moved_files.items()],
+        )
+        self.save_changes()
+
+    # the files which metadata isn't read yet or was read before the file was changed (metadata_mtime is the file mtime
+    # when the metadata was read), returns the list of (filepath, mtime)
+    def get_files_without_metadata(self):
+        self.cursor.execute(
+            """
+            SELECT filepath, mtime FROM Files
+            WHERE mtime IS NOT NULL AND metadata_mtime IS NOT mtime
+            ORDER BY id
+            """
+        )
+        return self.cursor.fetchall()
+
+    # files_metadata is a list of
+    # (filepath, mtime, duration, width, height, fps, codec, audio channels, sample rate)
+    def save_files_metadata(self, files_metadata):
+        self.cursor.executemany(
+            """
+            UPDATE Files SET
+                duration = ?, width = ?, height = ?, fps = ?, codec = ?,
+                audio_channels = ?, sample_rate = ?, metadata_mtime = ?
+            WHERE filepath = ?
+            """,
+            [
+                (*metadata, mtime, filepath)
+                for filepath, mtime, *metadata in files_metadata
+            ],
+        )
+        self.save_changes()
+
+    # files_stats is a {filepath: (size, mtime)} dict
+    def update_files_stats(self, files_stats):
+        self.cursor.executemany(
+            "UPDATE Files SET size = ?, mtime = ? WHERE filepath = ?",
+            [(size, mtime, filepath) for filepath, (size, mtime) in files_stats.items()],
+        )
+        self.save_changes()
+
     def get_files_by_tags(self, tags_list):
         if not tags_list:
             return []
@@ -164,12 +515,32 @@ class DatabaseHandler:
         rows = self.cursor.fetchall()
         return [r[0] for r in rows]
 
-    def get_files_by_text(self, description):
-        query = "SELECT filename FROM Files WHERE description LIKE ? OR filename LIKE ?"
-        self.cursor.execute(query, (f"%{description}%", f"%{description}%"))
+    # the files which filename, description or tags contain the text
+    # the index results are ordered by the relevance (the bm25 rank, the filename matches weigh the most,
+    # see the Files_search migration), the short queries results are ordered by id
+    def get_ids_by_text(self, text):
+        if len(text) >= SEARCH_MIN_LENGTH:
+            self.cursor.execute(
+                "SELECT rowid FROM Files_search WHERE Files_search MATCH ? ORDER BY rank",
+                (get_search_phrase(text),),
+            )
+        else:
+            self.cursor.execute(
+                """
+                SELECT id FROM Files
+                WHERE filename LIKE ? OR description LIKE ? OR id IN (
+                    SELECT file_id FROM Files_tags
+                    WHERE tag_id IN (SELECT id FROM Tags WHERE tagname LIKE ?)
+                )
+                """,
+                (f"%{text}%", f"%{text}%", f"%{text}%"),
+            )
         rows = self.cursor.fetchall()
         return [r[0] for r in rows]
 
+    def get_files_by_text(self, description):
+        return [filename for _, filename, _ in self.get_files_rows(self.get_ids_by_text(description))]
+
     def update_file_description(self, file, description: str):
         self.cursor.execute(
             "UPDATE Files SET description = ? WHERE filename = ?", (description, file)
@@ -194,30 +565,80 @@ class DatabaseHandler:
                 (item, tag),
             )
         self.save_changes()
+        self.update_tag_index("filename", [item])
 
     def delete_file_by_filepath(self, filepath):
+        self.remove_from_tag_index([filepath])
         self.cursor.execute("DELETE FROM Files WHERE filepath = ?", (filepath,))
 
     def delete_files_by_filepaths(self, filepaths):
+        self.remove_from_tag_index(filepaths)
         placeholders = ", ".join(["?"] * len(filepaths))
 
         query = f"DELETE FROM Files WHERE filepath IN ({placeholders})"
 
         self.cursor.execute(query, tuple(filepaths))
 
+        query = f"DELETE FROM Thumbnail_jobs WHERE filepath IN ({placeholders})"
+
+        self.cursor.execute(query, tuple(filepaths))
+        self.delete_unused_folders()
+
         self.save_changes()
 
+    # the ids are ordered explicitly, otherwise SQLite can read them from any covering index (like the fingerprints one)
+    # and the files list order changes when the thumbnails are created
     def get_all_files_ids(self):
-        self.cursor.execute("SELECT id FROM Files")
+        self.cursor.execute("SELECT id FROM Files ORDER BY id")
         rows = self.cursor.fetchall()
         return [row[0] for row in rows]
 
+    # the files list rows (id, filename, previewpath) of all the files in the id order (see get_all_files_ids)
+    def get_all_files_rows(self):
+        self.cursor.execute("SELECT id, filename, previewpath FROM Files ORDER BY id")
+        return self.cursor.fetchall()
+
+    # the files list rows (id, filename, previewpath) in the ids order (like the search relevance), the unknown ids
+    # are skipped; the rows are read and yielded by chunks, so a big list takes a few queries instead of one per id
+    def get_files_rows(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), QUERY_CHUNK_SIZE):
+            chunk = ids[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ", ".join(["?"] * len(chunk))
+            self.cursor.execute(
+                f"SELECT id, filename, previewpath FROM Files WHERE id IN ({placeholders})", chunk
+            )
+            rows = {row[0]: row for row in self.cursor.fetchall()}
+            yield from (rows[id] for id in chunk if id in rows)
+
     def get_filepath_by_id(self, id):
         self.cursor.execute("SELECT filepath FROM Files WHERE id = ?", (id,))
         row = self.cursor.fetchone()
 
         return row[0]
 
+    # returns {id: filepath}
+    def get_filepaths_by_ids(self, ids):
+        placeholders = ", ".join(["?"] * len(ids))
+
+        query = f"SELECT id, filepath FROM Files WHERE id IN ({placeholders})"
+
+        self.cursor.execute(query, tuple(ids))
+
+        rows = self.cursor.fetchall()
+
+        return {id: filepath for id, filepath in rows}
+
+    # returns {filepath: id} of the saved files
+    def get_ids_by_filepaths(self, filepaths):
+        if not filepaths:
+            return {}
+        placeholders = ", ".join(["?"] * len(filepaths))
+        self.cursor.execute(
+            f"SELECT filepath, id FROM Files WHERE filepath IN ({placeholders})", list(filepaths)
+        )
+        return dict(self.cursor.fetchall())
+
     def get_previewpath_by_id(self, id):
         self.cursor.execute("SELECT previewpath FROM Files WHERE id = ?", (id,))
         row = self.cursor.fetchone()
@@ -228,38 +649,106 @@ class DatabaseHandler:
         row = self.cursor.fetchone()
         return row[0]
 
-    def get_ids_by_tags(self, tags_list):
+    # the tags bitsets index is built on the first tags search and then updated by the tags changes
+    # (it's rebuilt when too many files are deleted, see TagIndex.is_fragmented)
+    def get_tag_index(self):
+        if self.tag_index is None or self.tag_index.is_fragmented():
+            self.cursor.execute("SELECT id FROM Files ORDER BY id")
+            files_ids = [row[0] for row in self.cursor.fetchall()]
+            self.cursor.execute("SELECT file_id, tag_id FROM Files_tags")
+            self.tag_index = TagIndex(files_ids, self.cursor.fetchall())
+        return self.tag_index
+
+    # the index is updated only if it's already built, otherwise the changes are read by the next tags search
+    # the files are found by the column values (like the filepaths), their tags in the index are replaced by the DB ones
+    def update_tag_index(self, column, values):
+        if self.tag_index is None:
+            return
+
+        values = list(values)
+        files_tags = []
+        for i in range(0, len(values), QUERY_CHUNK_SIZE):
+            chunk = values[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ", ".join(["?"] * len(chunk))
+            self.cursor.execute(
+                f"""
+                SELECT f.id, ft.tag_id
+                FROM Files f
+                LEFT JOIN Files_tags ft ON ft.file_id = f.id
+                WHERE f.{column} IN ({placeholders})
+                """,
+                chunk,
+            )
+            files_tags += self.cursor.fetchall()
+        self.tag_index.set_files_tags(files_tags)
+
+    # called before the files are deleted from the DB
+    def remove_from_tag_index(self, filepaths):
+        if self.tag_index is None:
+            return
+
+        filepaths = list(filepaths)
+        files_ids = []
+        for i in range(0, len(filepaths), QUERY_CHUNK_SIZE):
+            chunk = filepaths[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ", ".join(["?"] * len(chunk))
+            self.cursor.execute(f"SELECT id FROM Files WHERE filepath IN ({placeholders})", chunk)
+            files_ids += [row[0] for row in self.cursor.fetchall()]
+        self.tag_index.remove_files(files_ids)
+
+    # the tags are selected by the mode (see db/tag_index.py), the ids are in the id order
+    def get_ids_by_tags(self, tags_list, mode=ALL_TAGS):
         if not tags_list:
             return []
-        placeholders = ", ".join(["?"] * len(tags_list))
-        query = f"""
-            SELECT f.id
-            FROM Files f
-            JOIN Files_tags ft on ft.file_id = f.id
-            JOIN Tags t ON ft.tag_id = t.id
-            WHERE t.tagname IN ({placeholders})
-            GROUP BY f.id
-            HAVING COUNT(DISTINCT t.tagname) = ?
-        """
-        params = tags_list + [len(tags_list)]
-        self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
-        return [r[0] for r in rows]
+        tag_index = self.get_tag_index()
+        return tag_index.get_ids(tag_index.select(self.get_tags_ids_list(tags_list), mode))
+
+    # the ids (like the text search results) which have the tags selected by the mode, in the ids order
+    def filter_ids_by_tags(self, ids, tags_list, mode=ALL_TAGS):
+        tag_index = self.get_tag_index()
+        return tag_index.filter_ids(ids, tag_index.select(self.get_tags_ids_list(tags_list), mode))
+
+    # the ids of the tags in the tags order, None for the unknown tags
+    def get_tags_ids_list(self, tags_list):
+        tags_ids = self.get_tags_ids(tags_list)
+        return [tags_ids.get(tag) for tag in tags_list]
+
+    # the files of the folder by the folder_id index, with recursive also the files of all its subfolders:
+    # their paths start with the folder path and the separator, so they are a range of the folderpath index
+    def get_ids_by_filepath(self, filepath, recursive=False):
+        folderpath = filepath.rstrip(os.sep)
+        if recursive:
+            self.cursor.execute(
+                """
+                SELECT f.id
+                FROM Folders d
+                JOIN Files f ON f.folder_id = d.id
+                WHERE d.folderpath = ? OR (d.folderpath >= ? AND d.folderpath < ?)
+                ORDER BY f.id
+                """,
+                (folderpath, folderpath + os.sep, folderpath + chr(ord(os.sep) + 1)),
+            )
+        else:
+            self.cursor.execute(
+                """
+                SELECT f.id
+                FROM Folders d
+                JOIN Files f ON f.folder_id = d.id
+                WHERE d.folderpath = ?
+                ORDER BY f.id
+                """,
+                (folderpath,),
+            )
+        return [r[0] for r in self.cursor.fetchall()]
 
-    def get_ids_by_text(self, description):
-        query = "SELECT id FROM Files WHERE description LIKE ? OR filename LIKE ?"
-        self.cursor.execute(query, (f"%{description}%", f"%{description}%"))
-        rows = self.cursor.fetchall()
-        return [r[0] for r in rows]
 
-    def get_ids_by_filepath(self, filepath):
-        self.cursor.execute(
-            "SELECT id, filepath FROM Files WHERE filepath LIKE ?", (filepath + "%",)
-        )
-        rows = self.cursor.fetchall()
-        files_in_folder = [
-            id
-            for id, fullpath in rows
-            if os.path.dirname(fullpath) == filepath.rstrip(os.sep)
-        ]
-        return files_in_folder
+# the queries on a pool connection (see DatabaseHandler.read): only the listed DatabaseHandler methods, which read
+# the DB with self.cursor only (without the writer connection, the tags index or the error window)
+class DatabaseReader:
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+
+    get_files_stats = DatabaseHandler.get_files_stats
+    get_files_fingerprints = DatabaseHandler.get_files_fingerprints
+    get_folders_mtimes = DatabaseHandler.get_folders_mtimes
+    get_files_without_metadata = DatabaseHandler.get_files_without_metadata
@@ -0,0 +1,41 @@
+import itertools
+from .connection import connect_writer
+
+# the thumbnail jobs are claimed by this many files in one transaction
+CLAIM_BATCH_SIZE = 16
+
+# the connection of the thumbnail creation thread to the jobs table (the DB connection can't be shared between threads)
+# the jobs are added and finished by DatabaseHandler in the GUI thread, the job is done in the same transaction
+# as its file row is saved, so a crash never leaves a done job without the thumbnail
+class ThumbnailJobs:
+    def __init__(self, db_path):
+        # the claims are the only writes besides the GUI thread ones, the writers wait for each other
+        # (see WRITE_TIMEOUT), the readers are not blocked by them
+        self.connection = connect_writer(db_path)
+        self.cursor = self.connection.cursor()
+
+    # marks the pending jobs of the files as running by batches, yields only the claimed files in the filepaths order
+    # (the files without a pending job are already done or handled by another run)
+    def claim(self, filepaths):
+        filepaths = iter(filepaths)
+        while True:
+            batch = list(itertools.islice(filepaths, CLAIM_BATCH_SIZE))
+            if not batch:
+                return
+
+            placeholders = ", ".join(["?"] * len(batch))
+            with self.connection:
+                self.cursor.execute(
+                    f"""
+                    UPDATE Thumbnail_jobs SET state = 'running', attempts = attempts + 1
+                    WHERE state = 'pending' AND filepath IN ({placeholders})
+                    RETURNING filepath
+                    """,
+                    batch,
+                )
+                claimed = {row[0] for row in self.cursor.fetchall()}
+
+            yield from (filepath for filepath in batch if filepath in claimed)
+
+    def close(self):
+        self.connection.close()
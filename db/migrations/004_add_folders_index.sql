@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS Folders (
+    id INTEGER PRIMARY KEY,
+    folderpath TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL
+);
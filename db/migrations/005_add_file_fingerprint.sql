@@ -0,0 +1,3 @@
+ALTER TABLE Files ADD COLUMN fingerprint TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_files_fingerprint ON Files(fingerprint);
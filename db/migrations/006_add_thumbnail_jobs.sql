@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS Thumbnail_jobs (
+    filepath TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'pending' CHECK (state IN ('pending', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_thumbnail_jobs_state ON Thumbnail_jobs(state);
+
+INSERT OR IGNORE INTO Thumbnail_jobs (filepath, state)
+SELECT filepath, CASE WHEN previewpath = '' THEN 'pending' ELSE 'done' END
+FROM Files;
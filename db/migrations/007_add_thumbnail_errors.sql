@@ -0,0 +1,3 @@
+ALTER TABLE Thumbnail_jobs ADD COLUMN size INTEGER;
+ALTER TABLE Thumbnail_jobs ADD COLUMN mtime REAL;
+ALTER TABLE Thumbnail_jobs ADD COLUMN error TEXT;
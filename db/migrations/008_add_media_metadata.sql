@@ -0,0 +1,14 @@
+ALTER TABLE Files ADD COLUMN duration REAL;
+ALTER TABLE Files ADD COLUMN width INTEGER;
+ALTER TABLE Files ADD COLUMN height INTEGER;
+ALTER TABLE Files ADD COLUMN fps REAL;
+ALTER TABLE Files ADD COLUMN codec TEXT;
+ALTER TABLE Files ADD COLUMN audio_channels INTEGER;
+ALTER TABLE Files ADD COLUMN sample_rate INTEGER;
+ALTER TABLE Files ADD COLUMN metadata_mtime REAL;
+
+CREATE INDEX IF NOT EXISTS idx_files_duration ON Files(duration);
+CREATE INDEX IF NOT EXISTS idx_files_resolution ON Files(width, height);
+CREATE INDEX IF NOT EXISTS idx_files_fps ON Files(fps);
+CREATE INDEX IF NOT EXISTS idx_files_codec ON Files(codec);
+CREATE INDEX IF NOT EXISTS idx_files_audio ON Files(audio_channels, sample_rate);
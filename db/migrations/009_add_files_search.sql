@@ -0,0 +1,81 @@
+CREATE VIRTUAL TABLE IF NOT EXISTS Files_search USING fts5(
+    filename,
+    description,
+    tags,
+    tokenize = 'trigram'
+);
+
+INSERT INTO Files_search (Files_search, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)');
+
+INSERT INTO Files_search (rowid, filename, description, tags)
+SELECT
+    f.id,
+    f.filename,
+    coalesce(f.description, ''),
+    coalesce(
+        (
+            SELECT group_concat(t.tagname, char(10))
+            FROM Files_tags ft
+            JOIN Tags t ON t.id = ft.tag_id
+            WHERE ft.file_id = f.id
+        ),
+        ''
+    )
+FROM Files f;
+
+CREATE TRIGGER IF NOT EXISTS files_search_insert AFTER INSERT ON Files BEGIN
+    INSERT INTO Files_search (rowid, filename, description, tags)
+    VALUES (new.id, new.filename, coalesce(new.description, ''), '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_search_update AFTER UPDATE OF filename, description ON Files BEGIN
+    UPDATE Files_search
+    SET filename = new.filename, description = coalesce(new.description, '')
+    WHERE rowid = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_search_delete AFTER DELETE ON Files BEGIN
+    DELETE FROM Files_search WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_search_tag_insert AFTER INSERT ON Files_tags BEGIN
+    UPDATE Files_search
+    SET tags = coalesce(
+        (
+            SELECT group_concat(t.tagname, char(10))
+            FROM Files_tags ft
+            JOIN Tags t ON t.id = ft.tag_id
+            WHERE ft.file_id = new.file_id
+        ),
+        ''
+    )
+    WHERE rowid = new.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_search_tag_delete AFTER DELETE ON Files_tags BEGIN
+    UPDATE Files_search
+    SET tags = coalesce(
+        (
+            SELECT group_concat(t.tagname, char(10))
+            FROM Files_tags ft
+            JOIN Tags t ON t.id = ft.tag_id
+            WHERE ft.file_id = old.file_id
+        ),
+        ''
+    )
+    WHERE rowid = old.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_search_tag_rename AFTER UPDATE OF tagname ON Tags BEGIN
+    UPDATE Files_search
+    SET tags = coalesce(
+        (
+            SELECT group_concat(t.tagname, char(10))
+            FROM Files_tags ft
+            JOIN Tags t ON t.id = ft.tag_id
+            WHERE ft.file_id = Files_search.rowid
+        ),
+        ''
+    )
+    WHERE rowid IN (SELECT file_id FROM Files_tags WHERE tag_id = new.id);
+END;
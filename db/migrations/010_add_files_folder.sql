@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS Folders_new (
+    id INTEGER PRIMARY KEY,
+    folderpath TEXT NOT NULL UNIQUE,
+    mtime REAL
+);
+
+INSERT INTO Folders_new (id, folderpath, mtime)
+SELECT id, folderpath, mtime FROM Folders;
+
+DROP TABLE Folders;
+
+ALTER TABLE Folders_new RENAME TO Folders;
+
+ALTER TABLE Files ADD COLUMN folder_id INTEGER REFERENCES Folders(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_files_folder ON Files(folder_id);
@@ -0,0 +1,5 @@
+CREATE INDEX IF NOT EXISTS idx_files_filename ON Files(filename);
+
+CREATE INDEX IF NOT EXISTS idx_files_previewpath ON Files(previewpath);
+
+CREATE INDEX IF NOT EXISTS idx_files_tags_tag ON Files_tags(tag_id, file_id);
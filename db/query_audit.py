@@ -0,0 +1,298 @@
+# Query plans audit: every DatabaseHandler method is called on a small temporary catalog, every query it runs
+# and every trigger query is explained (EXPLAIN QUERY PLAN), the full table scans fail the audit unless the query
+# is listed in FULL_SCANS (it reads the whole table by design); the foreign keys columns must be indexed too
+# (the ON DELETE actions search them)
+# a new DatabaseHandler method fails the audit until it's added to get_calls (or to NO_QUERIES)
+# the audit is run by the tests (tests/test_query_plans.py) and can be run alone:
+# usage (from the program folder): python -m db.query_audit
+
+import os, re, sys, tempfile
+
+from db.database import DatabaseHandler
+
+# the methods which don't run the catalog queries themselves
+NO_QUERIES = {
+    "__init__",
+    "apply_migrations",
+    "connect_to_database",
+    "read",
+    "save_changes",
+    "close_connection",
+}
+
+FOLDERS_MTIMES_QUERY = "SELECT folderpath, mtime FROM Folders WHERE mtime IS NOT NULL"
+UNUSED_FOLDERS_QUERY = (
+    "DELETE FROM Folders WHERE mtime IS NULL AND NOT EXISTS (SELECT ? FROM Files WHERE folder_id = Folders.id)"
+)
+
+# the queries which read whole tables by design: (method, normalized query) -> the scanned tables,
+# the query is matched exactly (see normalize_statement), so a changed query has to be audited again
+# the tables names are as in the query plans (the joined tables by their aliases)
+FULL_SCANS = {
+    ("get_folders_mtimes", FOLDERS_MTIMES_QUERY): {"Folders"},
+    # there is one row per folder, the unused ones are searched after the files are moved or deleted
+    ("delete_unused_folders", UNUSED_FOLDERS_QUERY): {"Folders"},
+    ("update_moved_files", UNUSED_FOLDERS_QUERY): {"Folders"},
+    ("delete_files_by_filepaths", UNUSED_FOLDERS_QUERY): {"Folders"},
+    ("get_all_tagnames", "SELECT tagname FROM Tags"): {"Tags"},
+    ("get_tag_index", "SELECT id FROM Files ORDER BY id"): {"Files"},
+    ("get_tag_index", "SELECT file_id, tag_id FROM Files_tags"): {"Files_tags"},
+    # the queries shorter than a trigram are checked against every file and every tag
+    (
+        "get_ids_by_text",
+        "SELECT id FROM Files WHERE filename LIKE ? OR description LIKE ? OR id IN ( SELECT file_id FROM Files_tags "
+        "WHERE tag_id IN (SELECT id FROM Tags WHERE tagname LIKE ?) )",
+    ): {"Files", "Tags"},
+    ("get_all_filenames", "SELECT filename FROM Files"): {"Files"},
+    ("get_all_filepaths", "SELECT filepath FROM Files"): {"Files"},
+    ("get_files_stats", "SELECT filepath, size, mtime FROM Files"): {"Files"},
+    ("get_files_fingerprints", "SELECT filepath, fingerprint FROM Files WHERE fingerprint IS NOT NULL"): {"Files"},
+    (
+        "get_files_without_metadata",
+        "SELECT filepath, mtime FROM Files WHERE mtime IS NOT NULL AND metadata_mtime IS NOT mtime ORDER BY id",
+    ): {"Files"},
+    ("get_all_files_ids", "SELECT id FROM Files ORDER BY id"): {"Files"},
+    ("get_all_files_rows", "SELECT id, filename, previewpath FROM Files ORDER BY id"): {"Files"},
+}
+
+# the statements which have no query plan
+SKIPPED_STATEMENTS = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "--")
+# the FTS5 queries of its own tables (they are traced too) name them with the schema
+FTS_TABLES_PREFIX = "'main'."
+
+SAMPLE_FILES = 12
+SAMPLE_TAG = "Аудит"
+
+
+class AuditErrorWindow:
+    def show_error_message(self, message):
+        raise RuntimeError(message)
+
+
+# the calls of every querying method with the sample values, in the order they can be made on one catalog
+# (the files are saved first, deleted last)
+def get_calls(db, folder):
+    filepaths = [
+        os.path.join(folder, "files", f"folder_{i % 3}", f"image_{i}.jpg") for i in range(SAMPLE_FILES)
+    ]
+    filenames = [os.path.basename(filepath) for filepath in filepaths]
+    folderpaths = {os.path.dirname(filepath) for filepath in filepaths}
+    previewpath = os.path.join(folder, "thumbnails", "image.webp")
+    moved_filepath = os.path.join(folder, "files", "moved", filenames[1])
+
+    return [
+        ("save_tag_to_database", lambda: db.save_tag_to_database(SAMPLE_TAG)),
+        (
+            "save_pending_files",
+            lambda: db.save_pending_files(
+                [(filename, filepath, 1, 1.0, "Image") for filename, filepath in zip(filenames, filepaths)]
+            ),
+        ),
+        ("add_thumbnail_jobs", lambda: db.add_thumbnail_jobs(filepaths)),
+        ("reset_interrupted_thumbnail_jobs", db.reset_interrupted_thumbnail_jobs),
+        ("get_pending_thumbnail_jobs", db.get_pending_thumbnail_jobs),
+        (
+            "save_thumbnails",
+            lambda: db.save_thumbnails(
+                [
+                    (filename, filepath, previewpath, ["Image"], 1, 1.0, "fingerprint", None if i else "error")
+                    for i, (filename, filepath) in enumerate(zip(filenames, filepaths))
+                ]
+            ),
+        ),
+        ("get_failed_thumbnail_jobs", db.get_failed_thumbnail_jobs),
+        ("update_failed_thumbnail_jobs_stats", lambda: db.update_failed_thumbnail_jobs_stats({filepaths[0]: (2, 2.0)})),
+        ("get_thumbnail_errors", db.get_thumbnail_errors),
+        (
+            "save_folders_mtimes",
+            lambda: db.save_folders_mtimes(
+                {folderpath: 1.0 for folderpath in folderpaths}, [os.path.join(folder, "files", "deleted")]
+            ),
+        ),
+        ("get_folders_mtimes", db.get_folders_mtimes),
+        ("get_folders_ids", lambda: db.get_folders_ids(folderpaths)),
+        ("update_files_folders", db.update_files_folders),
+        ("get_tags_ids", lambda: db.get_tags_ids(["Image", SAMPLE_TAG])),
+        ("get_all_tagnames", db.get_all_tagnames),
+        ("tag_exists", lambda: db.tag_exists(SAMPLE_TAG)),
+        ("save_current_item_tags", lambda: db.save_current_item_tags(filepaths[0], [SAMPLE_TAG])),
+        ("get_current_item_tags", lambda: db.get_current_item_tags(1)),
+        ("get_tag_index", db.get_tag_index),
+        ("get_ids_by_tags", lambda: db.get_ids_by_tags(["Image", SAMPLE_TAG])),
+        ("filter_ids_by_tags", lambda: db.filter_ids_by_tags([2, 1], ["Image"])),
+        ("get_tags_ids_list", lambda: db.get_tags_ids_list(["Image", SAMPLE_TAG])),
+        ("update_tag_index", lambda: db.update_tag_index("filepath", filepaths[:2])),
+        ("get_files_by_tags", lambda: db.get_files_by_tags(["Image", SAMPLE_TAG])),
+        ("update_file_description", lambda: db.update_file_description(filenames[0], "описание файла")),
+        ("get_file_description", lambda: db.get_file_description(filenames[0])),
+        ("get_ids_by_text", lambda: db.get_ids_by_text("описание")),
+        ("get_ids_by_text", lambda: db.get_ids_by_text("оп")),
+        ("get_files_by_text", lambda: db.get_files_by_text("image")),
+        ("get_previewpath_by_filename", lambda: db.get_previewpath_by_filename(filenames[0])),
+        ("get_previewpath_by_filepath", lambda: db.get_previewpath_by_filepath(filepaths[0])),
+        ("get_previewpaths_by_filepaths", lambda: db.get_previewpaths_by_filepaths(filepaths[:2])),
+        ("get_unused_previewpaths", lambda: db.get_unused_previewpaths([previewpath, moved_filepath])),
+        ("get_all_filenames", db.get_all_filenames),
+        ("get_files_by_filepath", lambda: db.get_files_by_filepath(os.path.dirname(filepaths[0]))),
+        ("get_filepath", lambda: db.get_filepath(filenames[0])),
+        ("get_all_filepaths", db.get_all_filepaths),
+        ("get_files_stats", db.get_files_stats),
+        ("get_files_fingerprints", db.get_files_fingerprints),
+        ("update_moved_files", lambda: db.update_moved_files({filepaths[1]: (moved_filepath, 1, 1.0, "fingerprint")})),
+        ("get_files_without_metadata", db.get_files_without_metadata),
+        (
+            "save_files_metadata",
+            lambda: db.save_files_metadata([(filepaths[0], 1.0, 1.0, 640, 480, 25.0, "h264", 2, 48000)]),
+        ),
+        ("update_files_stats", lambda: db.update_files_stats({filepaths[0]: (1, 1.0)})),
+        ("get_all_files_ids", db.get_all_files_ids),
+        ("get_all_files_rows", db.get_all_files_rows),
+        ("get_files_rows", lambda: list(db.get_files_rows([2, 1]))),
+        ("get_filepath_by_id", lambda: db.get_filepath_by_id(1)),
+        ("get_filepaths_by_ids", lambda: db.get_filepaths_by_ids([1, 2])),
+        ("get_ids_by_filepaths", lambda: db.get_ids_by_filepaths(filepaths[:2])),
+        ("get_previewpath_by_id", lambda: db.get_previewpath_by_id(1)),
+        ("get_filename_by_id", lambda: db.get_filename_by_id(1)),
+        ("get_ids_by_filepath", lambda: db.get_ids_by_filepath(os.path.dirname(filepaths[0]))),
+        ("get_ids_by_filepath", lambda: db.get_ids_by_filepath(os.path.join(folder, "files"), recursive=True)),
+        ("delete_current_item_tags", lambda: db.delete_current_item_tags(filenames[0], [SAMPLE_TAG])),
+        ("remove_from_tag_index", lambda: db.remove_from_tag_index(filepaths[2:3])),
+        ("delete_file_by_filepath", lambda: db.delete_file_by_filepath(filepaths[2])),
+        ("delete_files_by_filepaths", lambda: db.delete_files_by_filepaths(filepaths[3:5])),
+        ("delete_thumbnail_jobs", lambda: db.delete_thumbnail_jobs(filepaths[3:5])),
+        ("delete_unused_folders", db.delete_unused_folders),
+        ("delete_tag_from_database", lambda: db.delete_tag_from_database(SAMPLE_TAG)),
+    ]
+
+
+def get_plan(connection, statement, parameters=()):
+    rows = connection.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return [detail for _, _, _, detail in rows]
+
+
+# the tables (or aliases) which the plan reads whole, the FTS index and the constant rows aren't the table scans
+def get_scanned_tables(plan):
+    return {
+        detail.split()[1]
+        for detail in plan
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail and detail != "SCAN CONSTANT ROW"
+    }
+
+
+# the traced statements have the parameters values in place: the values are replaced by "?" back, the IN lists
+# are shortened to one "?" and the whitespace is collapsed, so the same query always looks the same
+def normalize_statement(statement):
+    statement = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    statement = re.sub(r"(?<![\w.])-?\d+(?:\.\d+)?\b", "?", statement)
+    statement = re.sub(r"\?(?:\s*,\s*\?)+", "?", statement)
+    return " ".join(statement.split())
+
+
+# the statements the method ran (the trace has the parameters values in place, the repeated ones are explained once)
+def trace_statements(connection, call):
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        connection.set_trace_callback(None)
+    return [
+        statement
+        for statement in dict.fromkeys(statement.strip() for statement in statements)
+        if not statement.upper().startswith(SKIPPED_STATEMENTS) and FTS_TABLES_PREFIX not in statement
+    ]
+
+
+def audit_methods(db, folder):
+    problems = []
+    calls = get_calls(db, folder)
+
+    methods = {name for name, value in vars(DatabaseHandler).items() if callable(value)}
+    for name in sorted(methods - NO_QUERIES - {name for name, _ in calls}):
+        problems.append(f"{name}: the method isn't audited")
+
+    explained_count = 0
+    used_full_scans = set()
+    for name, call in calls:
+        for statement in trace_statements(db.connection, call):
+            plan = get_plan(db.connection, statement)
+            explained_count += 1
+            query = (name, normalize_statement(statement))
+            if query in FULL_SCANS:
+                used_full_scans.add(query)
+            scanned_tables = get_scanned_tables(plan) - FULL_SCANS.get(query, set())
+            if scanned_tables:
+                problems.append(
+                    f"{name}: {', '.join(sorted(scanned_tables))} full scan\n    {query[1]}\n"
+                    + "\n".join(f"    {detail}" for detail in plan)
+                )
+
+    # the queries which aren't run anymore are removed from FULL_SCANS
+    for name, query in FULL_SCANS.keys() - used_full_scans:
+        problems.append(f"{name}: the full scan query isn't run\n    {query}")
+    return explained_count, problems
+
+
+# the triggers bodies are explained with the new and old values as the parameters
+def audit_triggers(connection):
+    problems = []
+    explained_count = 0
+    triggers = connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for name, sql in triggers:
+        body = sql[sql.upper().index("BEGIN") + len("BEGIN"):sql.upper().rindex("END")]
+        for statement in body.split(";"):
+            statement = re.sub(r"\b(new|old)\.\w+", "?", statement.strip())
+            if not statement:
+                continue
+            plan = get_plan(connection, statement, [None] * statement.count("?"))
+            explained_count += 1
+            scanned_tables = get_scanned_tables(plan)
+            if scanned_tables:
+                problems.append(
+                    f"trigger {name}: {', '.join(sorted(scanned_tables))} full scan\n    {' '.join(statement.split())}"
+                )
+    return explained_count, problems
+
+
+# the child columns of the foreign keys are searched by the parent rows deletes (ON DELETE CASCADE / SET NULL),
+# so every one must be the first column of an index
+def audit_foreign_keys(connection):
+    problems = []
+    tables = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    for (table,) in tables:
+        indexed_columns = set()
+        for _, index, *_ in connection.execute(f"PRAGMA index_list('{table}')").fetchall():
+            columns = connection.execute(f"PRAGMA index_info('{index}')").fetchall()
+            indexed_columns |= {column for seqno, _, column in columns if seqno == 0}
+
+        for _, seq, parent, column, *_ in connection.execute(f"PRAGMA foreign_key_list('{table}')").fetchall():
+            if seq == 0 and column not in indexed_columns:
+                problems.append(f"{table}.{column}: the foreign key of {parent} isn't indexed")
+    return problems
+
+
+# the empty catalog of all the migrations
+def create_catalog(folder):
+    db = DatabaseHandler(AuditErrorWindow(), os.path.join(folder, "audit.db"))
+    db.apply_migrations()
+    return db
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_catalog(folder)
+
+        methods_count, problems = audit_methods(db, folder)
+        triggers_count, triggers_problems = audit_triggers(db.connection)
+        problems += triggers_problems + audit_foreign_keys(db.connection)
+
+        db.close_connection()
+
+    for problem in problems:
+        print(problem)
+    print(f"{methods_count} queries and {triggers_count} trigger queries explained, {len(problems)} problems")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
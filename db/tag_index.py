@@ -0,0 +1,168 @@
+import numpy as np
+
+# the files tags as the bitsets: one bitset per tag with one bit per file, the files are numbered by the ordinals
+# in the id order, so the tags search is a few bitwise operations over the arrays instead of the tags tables JOIN
+# the index is built from the DB on the first tags search and updated with the tags changes (see DatabaseHandler)
+
+# the selected tags modes: the files with all the tags, with any of them or without any of them
+ALL_TAGS = "all"
+ANY_TAGS = "any"
+NO_TAGS = "none"
+
+WORD_BITS = 64
+ONE = np.uint64(1)
+
+# the deleted files keep their ordinals until the index is rebuilt, it's rebuilt when they are more than a half
+MIN_FRAGMENTED_COUNT = 1024
+
+
+def get_words_count(bits_count):
+    return (bits_count + WORD_BITS - 1) // WORD_BITS
+
+
+def get_masks(ordinals):
+    return np.left_shift(ONE, (ordinals % WORD_BITS).astype(np.uint64))
+
+
+class TagIndex:
+    # files_tags is a list of (file id, tag id), the tag id is None for the files without tags
+    def __init__(self, files_ids, files_tags):
+        # ordinal -> file id, file id -> ordinal (-1 for the unknown ids, the ids are dense, so it's an array too)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.ordinals = np.empty(0, dtype=np.int64)
+        self.count = 0
+        self.deleted_count = 0
+
+        # the bitsets of the existing files and of every tag id
+        self.files = np.zeros(0, dtype=np.uint64)
+        self.tags = {}
+
+        self.add_files(files_ids)
+        self.set_files_tags(files_tags)
+
+    # all the bitsets are grown together (twice, so the files are added in the amortized constant time)
+    def reserve(self, count):
+        if count <= len(self.ids):
+            return
+
+        capacity = max(count, len(self.ids) * 2)
+        self.ids = np.resize(self.ids, capacity)
+
+        words_count = get_words_count(capacity)
+        self.files = self.grow_bitset(self.files, words_count)
+        for tag_id, bitset in self.tags.items():
+            self.tags[tag_id] = self.grow_bitset(bitset, words_count)
+
+    def grow_bitset(self, bitset, words_count):
+        grown = np.zeros(words_count, dtype=np.uint64)
+        grown[: len(bitset)] = bitset
+        return grown
+
+    def get_empty_bitset(self):
+        return np.zeros(len(self.files), dtype=np.uint64)
+
+    # the unknown files get -1
+    def get_ordinals(self, files_ids):
+        files_ids = np.asarray(files_ids, dtype=np.int64)
+        ordinals = np.full(len(files_ids), -1, dtype=np.int64)
+        is_known = (files_ids >= 0) & (files_ids < len(self.ordinals))
+        ordinals[is_known] = self.ordinals[files_ids[is_known]]
+        return ordinals
+
+    # the new files get the next ordinals in the id order (their ids are bigger than the ids of the existing files)
+    def add_files(self, files_ids):
+        files_ids = np.unique(np.asarray(files_ids, dtype=np.int64))
+        new_ids = files_ids[self.get_ordinals(files_ids) < 0]
+        if not len(new_ids):
+            return
+
+        self.reserve(self.count + len(new_ids))
+        if new_ids[-1] >= len(self.ordinals):
+            ordinals = np.full(max(new_ids[-1] + 1, len(self.ordinals) * 2), -1, dtype=np.int64)
+            ordinals[: len(self.ordinals)] = self.ordinals
+            self.ordinals = ordinals
+
+        ordinals = np.arange(self.count, self.count + len(new_ids))
+        self.ids[ordinals] = new_ids
+        self.ordinals[new_ids] = ordinals
+        self.count += len(new_ids)
+
+        np.bitwise_or.at(self.files, ordinals // WORD_BITS, get_masks(ordinals))
+
+    def remove_files(self, files_ids):
+        ordinals = self.get_ordinals(files_ids)
+        ordinals = ordinals[ordinals >= 0]
+        if not len(ordinals):
+            return
+
+        words, masks = ordinals // WORD_BITS, ~get_masks(ordinals)
+        np.bitwise_and.at(self.files, words, masks)
+        for bitset in self.tags.values():
+            np.bitwise_and.at(bitset, words, masks)
+
+        self.ordinals[self.ids[ordinals]] = -1
+        self.deleted_count += len(ordinals)
+
+    # the tags of the listed files are replaced by the given ones (the new files are added)
+    def set_files_tags(self, files_tags):
+        if not files_tags:
+            return
+
+        files_ids = np.fromiter((file_id for file_id, _ in files_tags), dtype=np.int64, count=len(files_tags))
+        tags_ids = np.fromiter(
+            (-1 if tag_id is None else tag_id for _, tag_id in files_tags), dtype=np.int64, count=len(files_tags)
+        )
+        self.add_files(files_ids)
+        ordinals = self.get_ordinals(files_ids)
+
+        # the files tags are cleared first
+        words, masks = ordinals // WORD_BITS, ~get_masks(ordinals)
+        for bitset in self.tags.values():
+            np.bitwise_and.at(bitset, words, masks)
+
+        for tag_id in np.unique(tags_ids[tags_ids >= 0]).tolist():
+            if tag_id not in self.tags:
+                self.tags[tag_id] = self.get_empty_bitset()
+            tag_ordinals = ordinals[tags_ids == tag_id]
+            np.bitwise_or.at(self.tags[tag_id], tag_ordinals // WORD_BITS, get_masks(tag_ordinals))
+
+    def remove_tag(self, tag_id):
+        self.tags.pop(tag_id, None)
+
+    # tags_ids has None for the unknown tags (no files have them)
+    def select(self, tags_ids, mode):
+        bitsets = [
+            self.tags[tag_id] if tag_id in self.tags else self.get_empty_bitset()
+            for tag_id in tags_ids
+        ]
+
+        if mode == ALL_TAGS:
+            result = self.files.copy()
+            for bitset in bitsets:
+                result &= bitset
+            return result
+
+        result = self.get_empty_bitset()
+        for bitset in bitsets:
+            result |= bitset
+        if mode == NO_TAGS:
+            result = self.files & ~result
+        return result
+
+    # the files ids of the bitset in the id order
+    def get_ids(self, bitset):
+        bits = np.unpackbits(bitset.astype("<u8").view(np.uint8), bitorder="little")
+        return self.ids[np.flatnonzero(bits[: self.count])].tolist()
+
+    # the files of the bitset from the files_ids, in the files_ids order (like the text search relevance)
+    def filter_ids(self, files_ids, bitset):
+        ordinals = self.get_ordinals(list(files_ids))
+        is_known = ordinals >= 0
+        is_selected = np.zeros(len(ordinals), dtype=bool)
+        is_selected[is_known] = (
+            bitset[ordinals[is_known] // WORD_BITS] & get_masks(ordinals[is_known])
+        ) != 0
+        return [file_id for file_id, selected in zip(files_ids, is_selected.tolist()) if selected]
+
+    def is_fragmented(self):
+        return self.deleted_count >= MIN_FRAGMENTED_COUNT and self.deleted_count * 2 > self.count
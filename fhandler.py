@@ -1,11 +1,20 @@
-import os
-from PIL import Image
-
+import os, time
 import ffmpeg
 import config
-import hashlib
 
-from PySide6.QtCore import QObject, Signal
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from db.jobs import ThumbnailJobs
+from thumbs.engine import ThumbnailEngine
+from thumbs.fingerprint import get_file_fingerprint
+from thumbs.metadata import probe_file
+from thumbs.pack import ThumbnailPack, is_pack_path, get_pack_key
+from thumbs.priority_queue import ThumbnailQueue
+from thumbs.render import IMAGE_FILE, VIDEO_FILE, AUDIO_FILE, get_renditions_paths
+from thumbs.storyboard import create_storyboard, get_thumbnails_storyboards
+from thumbs.timeout import FfmpegTimeoutError
+
+from PySide6.QtCore import QObject, Signal, Slot
 from PySide6.QtCore import QThread
 
 from functools import singledispatchmethod
@@ -49,12 +58,188 @@ ALLOWED_AUDIO_FORMATS = [
     ".alac",
 ]
 
-ALLOWED_TYPES = ALLOWED_IMAGE_FORMATS + ALLOWED_VIDEO_FORMATS + ALLOWED_AUDIO_FORMATS
+# the probed files metadata is emitted (and saved to the DB) by the chunks of this many files
+METADATA_CHUNK_SIZE = 100
+
+# the created thumbnails are emitted (and saved to the DB) by the batches of this many files
+# or after this many seconds since the previous batch
+THUMB_RESULTS_BATCH_SIZE = 500
+THUMB_RESULTS_INTERVAL = 0.25
+
+# frozenset is used for the fast lookup of every file extension during the scan
+ALLOWED_TYPES = frozenset(
+    ALLOWED_IMAGE_FORMATS + ALLOWED_VIDEO_FORMATS + ALLOWED_AUDIO_FORMATS
+)
+
+
+FILE_TYPES_TAGS = {
+    IMAGE_FILE: "Image",
+    VIDEO_FILE: "Video",
+    AUDIO_FILE: "Audio",
+}
+
+
+def get_file_type(filepath):
+    file_format = os.path.splitext(filepath)[1].lower()
+
+    if file_format in ALLOWED_IMAGE_FORMATS:
+        return IMAGE_FILE
+    elif file_format in ALLOWED_VIDEO_FORMATS:
+        return VIDEO_FILE
+    elif file_format in ALLOWED_AUDIO_FORMATS:
+        return AUDIO_FILE
+
+
+# return [(subfolder, mtime)] of the folder subfolders saved in the DB
+def stat_known_subfolders(folder, known_subfolders):
+    subfolders = []
+    for subfolder in known_subfolders.get(folder, []):
+        try:
+            subfolders.append((subfolder, os.stat(subfolder).st_mtime))
+        except OSError:
+            # the subfolder isn't walked, but it's not treated as deleted, since its parent folder isn't listed
+            # (see is_folder_deleted)
+            continue
+    return subfolders
+
+
+# the folder which isn't found by the scan is deleted only if its parent folder was listed (or is deleted too)
+# or it's out of the scanned folder, the other ones (like the subfolders of a not listed folder) are kept
+# with their files saved in the DB
+def is_folder_deleted(folder, listed_folders, skipped_folders):
+    while folder not in listed_folders and folder not in skipped_folders:
+        parent = os.path.dirname(folder)
+        if parent in listed_folders or parent == folder:
+            return True
+        folder = parent
+    return False
+
+
+# list one folder, return its files of the allowed formats with the stat data and its subfolders with their mtimes
+# DirEntry.stat() on Windows uses the data from the folder listing, so the files are not requested one more time
+# the files are None if the folder is not listed (not changed since the last scan or failed to list),
+# in this case the files saved in the DB are used and the known subfolders are walked
+def list_folder(folder, mtime, known_folders, known_subfolders):
+    # the folder mtime changes only when its files or subfolders are added, deleted or renamed
+    if mtime is not None and known_folders.get(folder) == mtime:
+        return None, stat_known_subfolders(folder, known_subfolders)
+
+    files = {}
+    subfolders = []
+
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    # the same as os.walk - don't go into the symlinked folders
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.lower() != "thumbnails":
+                            subfolders.append((entry.path, entry.stat().st_mtime))
+                    elif (
+                        os.path.splitext(entry.name)[1].lower() in ALLOWED_TYPES
+                        and entry.is_file()
+                    ):
+                        files[entry.path] = entry.stat()
+                except OSError:
+                    # the file was deleted or moved during the scan
+                    continue
+    except OSError:
+        # don't treat the files of a folder which can't be listed right now (like on a network share) as deleted
+        return None, stat_known_subfolders(folder, known_subfolders)
+
+    return files, subfolders
+
+
+# walk the folder tree and return:
+# 1. {filepath: os.stat_result} for all the files of the allowed formats in the listed folders
+# 2. {folderpath: mtime} for all the folders which are listed or not changed since the last scan
+# 3. set of the listed folders
+# 4. set of the folders which are not listed (not changed or failed to list, their files should be taken from the DB)
+# known_folders is a {folderpath: mtime} dict saved after the last scan, the folders with the same mtime are not listed
+# the subfolders are listed concurrently, so the network round-trips of the different folders overlap
+def walk_files(root_folder, known_folders=None):
+    # the paths built by scandir from the normalized root are already normalized
+    root_folder = os.path.abspath(os.path.normpath(root_folder))
+    known_folders = known_folders or {}
+
+    known_subfolders = {}
+    for folderpath in known_folders:
+        known_subfolders.setdefault(os.path.dirname(folderpath), []).append(folderpath)
+
+    files = {}
+    folders = {}
+    listed_folders = set()
+    skipped_folders = set()
+
+    try:
+        root_mtime = os.stat(root_folder).st_mtime
+    except OSError:
+        root_mtime = None
+
+    with ThreadPoolExecutor(max_workers=config.get_scan_workers()) as executor:
+        pending = {
+            executor.submit(
+                list_folder, root_folder, root_mtime, known_folders, known_subfolders
+            ): (root_folder, root_mtime)
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                folder, mtime = pending.pop(future)
+                folder_files, subfolders = future.result()
+
+                if folder_files is None:
+                    skipped_folders.add(folder)
+                    # the folder which failed to list keeps its previous mtime, so it will be listed on the next scan
+                    if known_folders.get(folder) == mtime:
+                        folders[folder] = mtime
+                else:
+                    listed_folders.add(folder)
+                    files.update(folder_files)
+                    if mtime is not None:
+                        folders[folder] = mtime
+
+                for subfolder, subfolder_mtime in subfolders:
+                    pending[
+                        executor.submit(
+                            list_folder,
+                            subfolder,
+                            subfolder_mtime,
+                            known_folders,
+                            known_subfolders,
+                        )
+                    ] = (subfolder, subfolder_mtime)
+
+    return files, folders, listed_folders, skipped_folders
+
+
+# the difference between the files on disk and the files saved in the DB
+class ScanResult:
+    def __init__(self):
+        self.new_files = set()
+        self.modified_files = set()
+        self.deleted_files = set()
+        # {old filepath: (new filepath, size, mtime, fingerprint)}
+        self.moved_files = {}
+        # {filepath: (size, mtime)} for the files saved before the stats were stored
+        self.missing_stats = {}
+        # {folderpath: mtime} of all the scanned folders
+        self.folders = {}
+        # the listed and the not listed folders (see walk_files)
+        self.listed_folders = set()
+        self.skipped_folders = set()
+        # the files of the thumbnail jobs which weren't finished in the previous session
+        self.pending_files = set()
 
 
 class FileScanner(QObject):
     # need to use signal in order for thumbnail creation work in a separate thread like in the main flow (first program launch)
     files_scanned = Signal(set)
+    files_deleted = Signal()
+    # emitted with the list of all the scanned folders when the scan result is saved to the DB
+    scan_finished = Signal(list)
 
     def __init__(self, db, fhandler):
         super().__init__()
@@ -62,48 +247,248 @@ class FileScanner(QObject):
         self.db = db
         self.fhandler = fhandler
 
+        # the folders mtimes from the last scan, saved after the new files are added to the DB
+        self.scanned_folders = {}
+        # the saved folders which are deleted since the last scan (see is_folder_deleted)
+        self.deleted_folders = []
+        # the previous thumbnails of the modified files, deleted after the new ones are saved to the DB
+        self.stale_thumbnails = []
+
+        self.scan_thread = None
+        # the time.monotonic() of the last full scan (see is_full_scan_due)
+        self.full_scan_time = None
+
+    # the full scan doesn't use the folders index, so the files rewritten in place are found too
+    # (the launch scan is the full one, then the next scan after every SCAN_VERIFY_INTERVAL minutes)
+    def is_full_scan_due(self):
+        interval = config.get_scan_verify_interval()
+        if interval <= 0:
+            return False
+        if self.full_scan_time is not None and time.monotonic() - self.full_scan_time < interval * 60:
+            return False
+
+        self.full_scan_time = time.monotonic()
+        return True
+
+    # scan the files difference in the current thread (on program launch)
     def scan_files(self):
-        root_folder = os.getenv("FOLDER_PATH")
-
-        # get the all the files from the DB and get all folders via the files
-        db_files = set(self.db.get_all_filepaths())
-
-        current_files = set()
-
-        for folder, subfolders, files in os.walk(root_folder):
-            # create the new subfolders list for the os.walk without the thumbnails folder
-            subfolders[:] = [
-                subfolder
-                for subfolder in subfolders
-                if subfolder.lower() != "thumbnails"
-            ]
-
-            # check if the new files are of the allowed formats
-            for filename in files:
-                file_format = os.path.splitext(filename)[1].lower()
-                if file_format in ALLOWED_TYPES:
-                    full_path = os.path.join(folder, filename)
-                    current_files.add(
-                        self.fhandler.normalize_filepath(full_path)
-                    )
-
-        new_files_paths = current_files - db_files
-        deleted_files_paths = db_files - current_files
-
-
-        if new_files_paths:
-            self.update_files_list(new_files_paths)
-
-
-        if deleted_files_paths:
-            thumbnail_paths = self.db.get_previewpaths_by_filepaths(deleted_files_paths)
-            self.fhandler.create_thumbnail_deletion_thread(thumbnail_paths)
+        db_files = self.db.get_files_stats()
+        result = self.compare_files(
+            os.getenv("FOLDER_PATH"),
+            db_files,
+            self.db.get_files_fingerprints(),
+            None if self.is_full_scan_due() else self.db.get_folders_mtimes(),
+        )
 
-            self.db.delete_files_by_filepaths(deleted_files_paths)
+        # the thumbnail jobs which weren't finished in the previous session are resumed with the new files
+        # (the files of the interrupted import have no DB row yet, so they are found as new)
+        self.db.reset_interrupted_thumbnail_jobs()
+        gone_jobs = []
+        for filepath in self.db.get_pending_thumbnail_jobs():
+            if filepath in result.moved_files:
+                result.pending_files.add(result.moved_files[filepath][0])
+            elif filepath in result.new_files or (
+                filepath in db_files and filepath not in result.deleted_files
+            ):
+                result.pending_files.add(filepath)
+            else:
+                gone_jobs.append(filepath)
+
+        # the files deleted while the program was closed
+        if gone_jobs:
+            self.db.delete_thumbnail_jobs(gone_jobs)
+
+        # the failed files without the DB row (like the ones which were interrupting the program) would be found as new
+        # on every launch, so they are skipped until their size or mtime is changed
+        # (the failed files with the DB row have the error icon and are rescanned like the other files)
+        failed_jobs = self.db.get_failed_thumbnail_jobs()
+        unknown_stats = {}
+        for filepath in result.new_files & failed_jobs.keys():
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+
+            stats = (stat.st_size, stat.st_mtime)
+            if failed_jobs[filepath] == (None, None):
+                unknown_stats[filepath] = stats
+            elif failed_jobs[filepath] != stats:
+                continue
+            result.new_files.discard(filepath)
+
+        if unknown_stats:
+            self.db.update_failed_thumbnail_jobs_stats(unknown_stats)
+
+        self.apply_scan_result(result)
+
+    # scan the files difference in a separate thread (on the file system changes), the result is saved in the current thread
+    # (the thread reads the DB by a read-only connection, the writer connection is used only by the current thread)
+    def create_scan_thread(self):
+        self.scan_thread = ScanThread(self, self.db, os.getenv("FOLDER_PATH"), self.is_full_scan_due())
+        self.scan_thread.scanned.connect(self.apply_scan_result)
+        self.scan_thread.start()
+
+    def is_scanning(self):
+        return self.scan_thread is not None and self.scan_thread.isRunning()
+
+    # db_files is a {filepath: (size, mtime)} dict, db_fingerprints is a {filepath: fingerprint} dict
+    # and known_folders is a {folderpath: mtime} dict saved in the DB (None for the full scan)
+    # doesn't use the DB, so it can be called from any thread
+    def compare_files(self, root_folder, db_files, db_fingerprints, known_folders):
+        result = ScanResult()
+
+        # the folders with the same mtime as on the last scan are not listed
+        # (the folder mtime is not changed when a file inside is rewritten in place, such files are found by the full
+        # scans, see is_full_scan_due)
+        scanned_files, result.folders, result.listed_folders, result.skipped_folders = walk_files(
+            root_folder, known_folders
+        )
 
+        current_files = {
+            filepath: (stat.st_size, stat.st_mtime)
+            for filepath, stat in scanned_files.items()
+        }
+
+        # the files of the not listed folders (and of their subfolders which aren't walked) are the same as saved
+        # in the DB, {folderpath: deleted or not}
+        folders_deleted = {}
+        for filepath, stats in db_files.items():
+            folder = os.path.dirname(filepath)
+            if folder in result.listed_folders:
+                continue
+
+            if folder not in folders_deleted:
+                folders_deleted[folder] = is_folder_deleted(
+                    folder, result.listed_folders, result.skipped_folders
+                )
+            if not folders_deleted[folder]:
+                current_files[filepath] = stats
+
+        result.new_files = current_files.keys() - db_files.keys()
+        result.deleted_files = db_files.keys() - current_files.keys()
+
+        # the file is modified if its size or mtime differs from the saved ones
+        # the files without saved stats (added before the stats were stored) get the stats without rescanning
+        for filepath in current_files.keys() & db_files.keys():
+            if db_files[filepath] == (None, None):
+                if current_files[filepath] != (None, None):
+                    result.missing_stats[filepath] = current_files[filepath]
+            elif db_files[filepath] != current_files[filepath]:
+                result.modified_files.add(filepath)
+
+        if result.new_files and result.deleted_files:
+            self.find_moved_files(result, current_files, db_files, db_fingerprints)
+
+        return result
+
+    # pair the deleted and the new files with the same content, they are moved or renamed files
+    def find_moved_files(self, result, current_files, db_files, db_fingerprints):
+        deleted_by_fingerprint = {}
+        # the files saved before the fingerprints were stored are paired by the name and the size
+        deleted_by_name = {}
+        deleted_sizes = set()
+
+        for filepath in result.deleted_files:
+            size = db_files[filepath][0]
+            deleted_sizes.add(size)
+
+            if filepath in db_fingerprints:
+                deleted_by_fingerprint.setdefault(db_fingerprints[filepath], []).append(
+                    filepath
+                )
+            else:
+                deleted_by_name.setdefault(
+                    (os.path.basename(filepath), size), []
+                ).append(filepath)
 
+        for new_path in list(result.new_files):
+            size, mtime = current_files[new_path]
+            # don't read the files which can't be paired anyway
+            if size not in deleted_sizes:
+                continue
 
-    # if the actual files counter > than the one saved in the .env, generate previews for the new files and update files list in the UI
+            try:
+                fingerprint = get_file_fingerprint(new_path, size)
+            except OSError:
+                continue
+
+            old_paths = deleted_by_fingerprint.get(fingerprint) or deleted_by_name.get(
+                (os.path.basename(new_path), size)
+            )
+            if not old_paths:
+                continue
+
+            old_path = old_paths.pop()
+            result.moved_files[old_path] = (new_path, size, mtime, fingerprint)
+            result.new_files.discard(new_path)
+            result.deleted_files.discard(old_path)
+
+    @Slot(object)
+    def apply_scan_result(self, result):
+        # the result is emitted at the very end of the scan thread, make sure it's finished to allow the next scan
+        if self.scan_thread is not None:
+            self.scan_thread.wait()
+
+        self.scanned_folders = result.folders
+        self.deleted_folders = [
+            folderpath
+            for folderpath in self.db.get_folders_mtimes()
+            if folderpath not in result.folders
+            and is_folder_deleted(folderpath, result.listed_folders, result.skipped_folders)
+        ]
+
+        if result.missing_stats:
+            self.db.update_files_stats(result.missing_stats)
+
+        if result.moved_files:
+            self.db.update_moved_files(result.moved_files)
+            self.fhandler.thumb_queue.rename(
+                {old_path: moved[0] for old_path, moved in result.moved_files.items()}
+            )
+
+        if result.modified_files:
+            self.stale_thumbnails += self.db.get_previewpaths_by_filepaths(
+                result.modified_files
+            )
+
+        if result.new_files or result.modified_files or result.pending_files:
+            self.update_files_list(
+                result.new_files | result.modified_files | result.pending_files
+            )
+        else:
+            self.save_folders_index()
+
+        if result.deleted_files:
+            self.fhandler.thumb_queue.discard(result.deleted_files)
+            thumbnail_paths = self.db.get_previewpaths_by_filepaths(result.deleted_files)
+            self.db.delete_files_by_filepaths(result.deleted_files)
+
+            # the thumbnail can be used by another file with the same content
+            thumbnail_paths = self.db.get_unused_previewpaths(thumbnail_paths)
+            if thumbnail_paths:
+                self.fhandler.create_thumbnail_deletion_thread(thumbnail_paths)
+
+            self.files_deleted.emit()
+
+        self.scan_finished.emit(list(result.folders))
+
+    # save the folders mtimes only when all the scanned files are in the DB,
+    # otherwise the new files of the not changed folders would be skipped on the next scan
+    def save_folders_index(self):
+        if self.scanned_folders:
+            self.db.save_folders_mtimes(self.scanned_folders, self.deleted_folders)
+            self.scanned_folders = {}
+            self.deleted_folders = []
+
+    # delete the previous thumbnails of the modified files if no other file uses them
+    def delete_stale_thumbnails(self):
+        if self.stale_thumbnails:
+            thumbnail_paths = self.db.get_unused_previewpaths(self.stale_thumbnails)
+            self.stale_thumbnails = []
+            if thumbnail_paths:
+                self.fhandler.create_thumbnail_deletion_thread(thumbnail_paths)
+
+    # generate previews for the new and modified files and update files list in the UI
     def update_files_list(self, new_files_paths):
         files_list = self.fhandler.clear_files_list(new_files_paths)
         if files_list:
@@ -117,12 +502,35 @@ class FileScanner(QObject):
 class FileHandler(QObject):
     progress = Signal(int, int)
     finished = Signal(str)
-    thumb_created = Signal(str, str, str, list)
+    # the list of (filename, filepath, thumbnail path, tags, file size, file mtime, file fingerprint, error message)
+    # the failed files have FAILED_PREVIEWPATH and the error message (an empty string for the created thumbnails),
+    # the stats of the files which can't be read are None
+    thumbs_created = Signal(list)
+    # video filepath, storyboard path
+    storyboard_created = Signal(str, str)
+    # the list of (filepath, mtime, duration, width, height, fps, codec, audio channels, sample rate)
+    metadata_probed = Signal(list)
 
     def __init__(self, db):
         super().__init__()
         self.db = db
 
+        self.thumb_thread = None
+        self.thumb_deletion_thread = None
+        # the thumbnails to delete after the current deletion thread
+        self.pending_thumb_deletions = []
+        self.thumb_pack = None
+
+        # the files waiting for the thumbnails in the on-demand mode, ordered by the files list viewport
+        self.thumb_queue = ThumbnailQueue()
+
+        self.storyboard_thread = None
+        self.pending_storyboard = None
+
+        self.metadata_thread = None
+        # True if the metadata is requested while the previous files are still probed
+        self.is_metadata_pending = False
+
     def normalize_filepath(self, path):
         return os.path.abspath(os.path.normpath(path))
 
@@ -134,25 +542,8 @@ class FileHandler(QObject):
     # separate cases - №1 for folder (first program launch)
     @clear_files_list.register(str)
     def _(self, folder: str):
-        filtered_filepaths = []
-
-        for current_folder, subfolders, files in os.walk(folder):
-            # create the new subfolders list for the os.walk without the thumbnails folder
-            subfolders[:] = [
-                subfolder
-                for subfolder in subfolders
-                if subfolder.lower() != "thumbnails"
-            ]
-
-            # create the filtered by allowed formats file list
-            for file in files:
-                file_format = os.path.splitext(file)[1].lower()
-                if file_format in ALLOWED_TYPES:
-                    filtered_filepaths.append(
-                        self.normalize_filepath(os.path.join(current_folder, file))
-                    )
-
-        return filtered_filepaths
+        files, _, _, _ = walk_files(folder)
+        return list(files)
 
     # separate cases - №2 for specific files lists (on new program launches, when new files are detected)
     @clear_files_list.register(set)
@@ -165,85 +556,247 @@ class FileHandler(QObject):
 
         return filtered_filepaths
 
+    # the on-demand mode: the files are saved to the DB right away with the placeholder thumbnail and the type tag
+    # the files are saved sorted, so the files list (ordered by id) has the same order as the idle thumbnails queue
+    def save_pending_files(self, filepaths):
+        files = []
+        for filepath in sorted(filepaths):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            files.append(
+                (
+                    os.path.basename(filepath),
+                    filepath,
+                    stat.st_size,
+                    stat.st_mtime,
+                    FILE_TYPES_TAGS[get_file_type(filepath)],
+                )
+            )
+        self.db.save_pending_files(files)
+
+    # the on-demand mode: the queued files are handled by priority (see ThumbnailQueue.prioritize)
+    def queue_thumbnails(self, filepaths):
+        # the scanned files come in a set, so the idle ones are sorted to be created in the files list order
+        self.thumb_queue.put(sorted(filepaths))
+        if not self.is_creating_thumbnails():
+            self.create_thumbnail_creation_thread(self.thumb_queue)
+
+    # the files can be queued while the thread has already taken the last one, they are handled by the next thread
+    @Slot()
+    def on_thumb_thread_finished(self):
+        if not self.thumb_queue.is_empty() and not self.is_creating_thumbnails():
+            self.create_thumbnail_creation_thread(self.thumb_queue)
+
+    # the thumbnails are created by the worker processes, the results are emitted in batches (saved to the DB
+    # in one transaction each), a batch is emitted when it's full, after the interval or when the workers don't
+    # return the results for the interval (like while a slow video is handled), so the on-demand icons are still
+    # shown without a delay
+    # filepaths is a list or a ThumbnailQueue (taken while the thumbnails are created)
     def create_thumbnails(self, filepaths):
 
         folder = config.get_files_folder_path()
         thumb_folder = config.get_thumb_folder_path()
-        
 
         progress_counter = 0
-        tags = []
+        results = []
+        emit_time = time.monotonic()
 
         save_path = os.path.join(thumb_folder, "thumbnails")
         os.makedirs(save_path, exist_ok=True)
 
-        img_thumb_size = 128, 128
-        audio_thumb_file = os.path.join(
-            config.assign_script_dir(), "icons", "audio.png"
-        )
+        # the pack index is created before the workers start, they check it for the already packed thumbnails
+        if config.get_thumb_storage() == config.PACK_STORAGE:
+            self.get_thumb_pack()
 
-        for filepath in filepaths:
-            tags = []
-            # encode the filepath to utf-8, then get the hash object and then transfer it to a string representation
-            # need to use unique name 
-            hash_name = hashlib.md5(filepath.encode('utf-8')).hexdigest()
-            thumb_name = hash_name + ".png"
-
-            filename = os.path.basename(filepath)
-            file_format = os.path.splitext(filename)[1].lower()
-
-            # this branch is needed for handling type definition (like if the file format is in image formats, then use Image, if in video formats, then use ffmpeg and so on)
-            if file_format in ALLOWED_IMAGE_FORMATS:
-                with Image.open(filepath) as img:
-                    img.thumbnail(img_thumb_size)
-                    thumb_filepath = os.path.join(
-                        save_path, thumb_name
-                    )
-                    img.save(thumb_filepath)
-                tags = ["Image"]
+        # the files are taken only when their jobs are claimed (the jobs are recorded by the caller)
+        thumbnail_jobs = ThumbnailJobs(self.db.db_path)
+        jobs = (
+            (filepath, get_file_type(filepath), save_path)
+            for filepath in thumbnail_jobs.claim(filepaths)
+        )
 
-            elif file_format in ALLOWED_VIDEO_FORMATS:
-                (
-                    ffmpeg.input(
-                        filepath,
-                        ss=1,
-                    )
-                    .filter("scale", 512, -1)
-                    .output(
-                        os.path.join(save_path, thumb_name),
-                        vframes=1,
-                        n=None,
-                        loglevel="quiet",
+        # finished is emitted even if the creation fails, otherwise the GUI would stay disabled
+        try:
+            # the videos in or around the viewport are not kept waiting for the idle ones to fill their batch
+            engine = ThumbnailEngine(
+                idle_interval=THUMB_RESULTS_INTERVAL,
+                is_prioritized=filepaths.is_prioritized if isinstance(filepaths, ThumbnailQueue) else None,
+            )
+            # the result is None when the workers are busy for the interval
+            for result in engine.create_thumbnails(jobs):
+                if result is not None:
+                    filepath, file_type, thumb_filepath, size, mtime, fingerprint, thumbs_data, error = result
+
+                    # the packed thumbnails are written here, since the pack has only one writer
+                    if thumbs_data is not None:
+                        for rendition_path, thumb_data in thumbs_data.items():
+                            self.get_thumb_pack().append(get_pack_key(rendition_path), thumb_data)
+
+                    filename = os.path.basename(filepath)
+                    tags = [FILE_TYPES_TAGS[file_type]]
+
+                    # the job is set done when the file row is saved
+                    results.append(
+                        (filename, filepath, thumb_filepath, tags, size, mtime, fingerprint, error or "")
                     )
-                    .run(cmd=config.get_ffmpeg_path())
-                )
-                thumb_filepath = os.path.join(
-                    save_path, thumb_name
-                )
-
-                tags = ["Video"]
-
-            elif file_format in ALLOWED_AUDIO_FORMATS:
-                thumb_filepath = audio_thumb_file
-                tags = ["Audio"]
-
-            progress_counter += 1
-            self.progress.emit(progress_counter, len(filepaths))
-            self.thumb_created.emit(filename, filepath, thumb_filepath, tags)
-
-        self.finished.emit(folder)
+                    progress_counter += 1
+
+                if results and (
+                    result is None
+                    or len(results) >= THUMB_RESULTS_BATCH_SIZE
+                    or time.monotonic() - emit_time >= THUMB_RESULTS_INTERVAL
+                ):
+                    self.progress.emit(progress_counter, len(filepaths))
+                    self.thumbs_created.emit(results)
+                    results = []
+                    emit_time = time.monotonic()
+        finally:
+            if results:
+                self.progress.emit(progress_counter, len(filepaths))
+                self.thumbs_created.emit(results)
+            thumbnail_jobs.close()
+            self.finished.emit(folder)
 
     def create_thumbnail_creation_thread(self, files_list):
         self.thumb_thread = ThumbCreationThread(self, files_list)
+        self.thumb_thread.finished.connect(self.on_thumb_thread_finished)
         self.thumb_thread.start()
 
+    def is_creating_thumbnails(self):
+        return self.thumb_thread is not None and self.thumb_thread.isRunning()
+
+    # the running thread object can't be replaced, so the thumbnails are queued and deleted after the previous deletion
+    # (the GUI thread doesn't wait for it)
     def create_thumbnail_deletion_thread(self, thumbnail_paths):
+        if self.thumb_deletion_thread is not None and self.thumb_deletion_thread.isRunning():
+            self.pending_thumb_deletions += thumbnail_paths
+            return
 
         self.thumb_deletion_thread = ThumbDeletionThread(self, thumbnail_paths)
+        self.thumb_deletion_thread.finished.connect(self.on_thumb_deletion_thread_finished)
         self.thumb_deletion_thread.start()
 
+    # the queued thumbnails could be used again meanwhile (by a new file with the same content), they are checked again
+    @Slot()
+    def on_thumb_deletion_thread_finished(self):
+        if self.pending_thumb_deletions:
+            thumbnail_paths = self.db.get_unused_previewpaths(self.pending_thumb_deletions)
+            self.pending_thumb_deletions = []
+            if thumbnail_paths:
+                self.create_thumbnail_deletion_thread(thumbnail_paths)
+
+    # the storyboard is created only for the selected video, if other videos are selected meanwhile,
+    # only the last selected one is created after the current one
+    def create_storyboard_thread(self, filepath, storyboard_path, frames):
+        if self.storyboard_thread is not None and self.storyboard_thread.isRunning():
+            if self.storyboard_thread.storyboard_path != storyboard_path:
+                self.pending_storyboard = (filepath, storyboard_path, frames)
+            return
+
+        self.storyboard_thread = StoryboardThread(self, filepath, storyboard_path, frames)
+        self.storyboard_thread.finished.connect(self.on_storyboard_thread_finished)
+        self.storyboard_thread.start()
+
+    @Slot()
+    def on_storyboard_thread_finished(self):
+        if self.pending_storyboard is not None:
+            pending_storyboard = self.pending_storyboard
+            self.pending_storyboard = None
+            self.create_storyboard_thread(*pending_storyboard)
+
+    def create_video_storyboard(self, filepath, storyboard_path, frames):
+        try:
+            is_created = create_storyboard(filepath, storyboard_path, frames)
+        except (ffmpeg.Error, FfmpegTimeoutError, OSError):
+            # the preview just stays without the storyboard
+            return
+
+        if is_created:
+            self.storyboard_created.emit(filepath, storyboard_path)
+
+    # the metadata stage: the files which are new or changed since their metadata was read are probed in a separate thread
+    # (after their thumbnails, so the probing doesn't slow down the import)
+    def create_metadata_thread(self):
+        if self.metadata_thread is not None and self.metadata_thread.isRunning():
+            self.is_metadata_pending = True
+            return
+
+        self.metadata_thread = MetadataThread(self)
+        self.metadata_thread.finished.connect(self.on_metadata_thread_finished)
+        self.metadata_thread.start()
+
+    @Slot()
+    def on_metadata_thread_finished(self):
+        if self.is_metadata_pending:
+            self.is_metadata_pending = False
+            self.create_metadata_thread()
+
+    # the files are listed with their mtime, the metadata is saved with the mtime the file had when it was listed,
+    # so the file changed meanwhile is probed again
+    def probe_files_metadata(self):
+        with self.db.read() as db:
+            files = db.get_files_without_metadata()
+        if not files:
+            return
+
+        timeout = config.get_ffmpeg_timeout()
+
+        def probe(file):
+            filepath, mtime = file
+            return (filepath, mtime, *probe_file(filepath, get_file_type(filepath), timeout))
+
+        chunk = []
+        with ThreadPoolExecutor(max_workers=config.get_metadata_workers()) as executor:
+            for file_metadata in executor.map(probe, files):
+                chunk.append(file_metadata)
+                if len(chunk) >= METADATA_CHUNK_SIZE:
+                    self.metadata_probed.emit(chunk)
+                    chunk = []
+
+        if chunk:
+            self.metadata_probed.emit(chunk)
+
+    # the pack is shared by the thumbnail creation and deletion threads
+    def get_thumb_pack(self):
+        if self.thumb_pack is None:
+            self.thumb_pack = ThumbnailPack(
+                os.path.join(config.get_thumb_folder_path(), "thumbnails")
+            )
+        return self.thumb_pack
+
     def delete_files_thumbnails(self, thumb_paths):
+        save_path = os.path.join(config.get_thumb_folder_path(), "thumbnails")
+
+        # the video storyboards are named after the thumbnails and are deleted with them
+        for storyboard_path in get_thumbnails_storyboards(thumb_paths):
+            try:
+                os.remove(storyboard_path)
+            except FileNotFoundError:
+                pass
+
+        # the bigger renditions are deleted with the thumbnail
+        levels = config.get_thumb_levels()
+        thumb_paths = [
+            rendition_path
+            for thumb_path in thumb_paths
+            for rendition_path in get_renditions_paths(thumb_path, levels).values()
+        ]
+
+        pack_keys = [
+            get_pack_key(thumb_path) for thumb_path in thumb_paths if is_pack_path(thumb_path)
+        ]
+        if pack_keys:
+            thumb_pack = self.get_thumb_pack()
+            thumb_pack.delete(pack_keys)
+            if thumb_pack.needs_compaction():
+                thumb_pack.compact()
+
         for thumb_path in thumb_paths:
+            # the shared icons (like for the audio files) are not deleted
+            if os.path.dirname(thumb_path) != save_path:
+                continue
             try:
                 os.remove(thumb_path)
             except FileNotFoundError:
@@ -273,3 +826,51 @@ class ThumbDeletionThread(QThread):
 
     def run(self):
         self.fhandler.delete_files_thumbnails(self.filepaths)
+
+
+class StoryboardThread(QThread):
+    def __init__(self, fhandler, filepath, storyboard_path, frames):
+        super().__init__()
+
+        self.fhandler = fhandler
+        self.filepath = filepath
+        self.storyboard_path = storyboard_path
+        self.frames = frames
+
+    def run(self):
+        self.fhandler.create_video_storyboard(
+            self.filepath, self.storyboard_path, self.frames
+        )
+
+
+class MetadataThread(QThread):
+    def __init__(self, fhandler):
+        super().__init__()
+
+        self.fhandler = fhandler
+
+    def run(self):
+        self.fhandler.probe_files_metadata()
+
+
+class ScanThread(QThread):
+    scanned = Signal(object)
+
+    def __init__(self, fscanner, db, root_folder, is_full_scan):
+        super().__init__()
+
+        self.fscanner = fscanner
+        self.db = db
+        self.root_folder = root_folder
+        self.is_full_scan = is_full_scan
+
+    def run(self):
+        with self.db.read() as db:
+            db_files = db.get_files_stats()
+            db_fingerprints = db.get_files_fingerprints()
+            known_folders = None if self.is_full_scan else db.get_folders_mtimes()
+
+        result = self.fscanner.compare_files(
+            self.root_folder, db_files, db_fingerprints, known_folders
+        )
+        self.scanned.emit(result)
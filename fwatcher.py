@@ -0,0 +1,68 @@
+import config
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Signal, Slot
+
+# the rescan is started after this delay (ms) even if the events keep coming (like during a long copy)
+MAX_EVENTS_DELAY = 5000
+
+
+class FileWatcher(QObject):
+    # emitted once for a burst of the file system events or on the polling timer
+    changes_detected = Signal()
+
+    def __init__(self):
+        super().__init__()
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+
+        # restarted on every event, so the events burst is coalesced into one rescan
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(config.get_watch_debounce())
+        self.debounce_timer.timeout.connect(self.on_timeout)
+
+        # not restarted on the events, so the rescan is not postponed forever
+        self.max_delay_timer = QTimer(self)
+        self.max_delay_timer.setSingleShot(True)
+        self.max_delay_timer.setInterval(MAX_EVENTS_DELAY)
+        self.max_delay_timer.timeout.connect(self.on_timeout)
+
+        # fallback for the network shares where the file system events don't work
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(config.get_watch_poll_interval() * 1000)
+        self.poll_timer.timeout.connect(self.on_timeout)
+
+    def start(self):
+        if self.poll_timer.interval() > 0:
+            self.poll_timer.start()
+
+        # the folders are not known yet (like after the first files import), so scan them to start watching
+        if not self.watcher.directories():
+            self.changes_detected.emit()
+
+    # update the watched folders after every scan (to watch the new subfolders and drop the deleted ones)
+    @Slot(list)
+    def watch_folders(self, folders):
+        watched_folders = set(self.watcher.directories())
+        folders = set(folders)
+
+        removed_folders = watched_folders - folders
+        added_folders = folders - watched_folders
+
+        if removed_folders:
+            self.watcher.removePaths(list(removed_folders))
+        if added_folders:
+            self.watcher.addPaths(list(added_folders))
+
+    @Slot(str)
+    def on_directory_changed(self, path):
+        self.debounce_timer.start()
+        if not self.max_delay_timer.isActive():
+            self.max_delay_timer.start()
+
+    @Slot()
+    def on_timeout(self):
+        self.debounce_timer.stop()
+        self.max_delay_timer.stop()
+        self.changes_detected.emit()
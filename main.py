@@ -1,5 +1,6 @@
 import sys
 import config
+import multiprocessing
 
 from PySide6 import QtWidgets, QtGui
 
@@ -7,6 +8,8 @@ from ui import MainWindow
 
 
 if __name__ == "__main__":
+    # the thumbnails are created in the worker processes, which need this in the frozen .exe
+    multiprocessing.freeze_support()
 
     app = QtWidgets.QApplication([])
 
@@ -0,0 +1,34 @@
+# the background threads read the DB with the DatabaseReader queries (see DatabaseHandler.read)
+
+import os
+
+import pytest
+
+from db.database import DatabaseReader
+from db.query_audit import create_catalog
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = create_catalog(str(tmp_path))
+    yield db
+    db.close_connection()
+
+
+def test_reader_queries_see_the_saved_files(db, tmp_path):
+    filepath = os.path.join(str(tmp_path), "files", "image.jpg")
+    db.save_thumbnails([("image.jpg", filepath, "", ["image"], 10, 1.0, "fingerprint", "")])
+    db.save_folders_mtimes({os.path.dirname(filepath): 2.0})
+
+    with db.read() as reader:
+        assert reader.get_files_stats() == {filepath: (10, 1.0)}
+        assert reader.get_files_fingerprints() == {filepath: "fingerprint"}
+        assert reader.get_folders_mtimes() == {os.path.dirname(filepath): 2.0}
+        assert reader.get_files_without_metadata() == [(filepath, 1.0)]
+
+
+def test_reader_has_no_writing_methods(db):
+    with db.read() as reader:
+        assert isinstance(reader, DatabaseReader)
+        for name in ("save_thumbnails", "save_changes", "get_ids_by_tags", "apply_migrations"):
+            assert not hasattr(reader, name)
@@ -0,0 +1,142 @@
+# the rescans list only the folders changed since the last scan, the files of the other folders are taken from the DB
+# (see walk_files and FileScanner.compare_files)
+
+import os, shutil
+
+import pytest
+
+import fhandler
+from fhandler import FileScanner, walk_files, is_folder_deleted
+
+
+def create_file(filepath, data=b"data"):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return filepath
+
+
+def get_db_files(filepaths):
+    return {filepath: (os.stat(filepath).st_size, os.stat(filepath).st_mtime) for filepath in filepaths}
+
+
+# the folder mtime is set explicitly, so the change is seen even on the file systems with the coarse mtime
+def touch_folder(folder):
+    mtime = os.stat(folder).st_mtime + 10
+    os.utime(folder, (mtime, mtime))
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = str(tmp_path / "files")
+    create_file(os.path.join(root, "image.jpg"))
+    create_file(os.path.join(root, "notes.txt"))
+    create_file(os.path.join(root, "a", "b", "video.mp4"))
+    create_file(os.path.join(root, "thumbnails", "thumbnail.jpg"))
+    return root
+
+
+@pytest.fixture
+def scanner():
+    return FileScanner(None, None)
+
+
+def test_walk_lists_allowed_files(root):
+    files, folders, listed_folders, skipped_folders = walk_files(root)
+
+    assert set(files) == {os.path.join(root, "image.jpg"), os.path.join(root, "a", "b", "video.mp4")}
+    assert set(folders) == {root, os.path.join(root, "a"), os.path.join(root, "a", "b")}
+    assert listed_folders == set(folders)
+    assert skipped_folders == set()
+
+
+def test_unchanged_folders_are_not_listed(root):
+    _, known_folders, _, _ = walk_files(root)
+    files, folders, listed_folders, skipped_folders = walk_files(root, known_folders)
+
+    assert files == {}
+    assert folders == known_folders
+    assert listed_folders == set()
+    assert skipped_folders == set(known_folders)
+
+
+def test_changed_subfolder_of_unchanged_folder_is_listed(root):
+    _, known_folders, _, _ = walk_files(root)
+    new_filepath = create_file(os.path.join(root, "a", "b", "new.jpg"))
+    touch_folder(os.path.join(root, "a", "b"))
+
+    files, _, listed_folders, skipped_folders = walk_files(root, known_folders)
+
+    assert new_filepath in files
+    assert listed_folders == {os.path.join(root, "a", "b")}
+    assert skipped_folders == {root, os.path.join(root, "a")}
+
+
+def test_files_of_failed_folder_are_kept(root, scanner, monkeypatch):
+    folder = os.path.join(root, "a", "b")
+    _, known_folders, _, _ = walk_files(root)
+    db_files = get_db_files([os.path.join(root, "image.jpg"), os.path.join(folder, "video.mp4")])
+    create_file(os.path.join(folder, "new.jpg"))
+    touch_folder(folder)
+
+    scandir = os.scandir
+
+    def failing_scandir(path):
+        if path == folder:
+            raise PermissionError(path)
+        return scandir(path)
+
+    monkeypatch.setattr(fhandler.os, "scandir", failing_scandir)
+    result = scanner.compare_files(root, db_files, {}, known_folders)
+
+    assert result.deleted_files == set()
+    assert result.new_files == set()
+    # the folder keeps its previous mtime in the DB, so it's listed on the next scan
+    assert folder not in result.folders
+    assert not is_folder_deleted(folder, result.listed_folders, result.skipped_folders)
+
+
+def test_files_of_not_walked_subfolder_are_kept(root, scanner):
+    folder = os.path.join(root, "a", "b")
+    _, known_folders, _, _ = walk_files(root)
+    db_files = get_db_files([os.path.join(folder, "video.mp4")])
+    # the subfolder is unknown (like if its row was lost), its unchanged parent folder isn't listed
+    del known_folders[folder]
+
+    result = scanner.compare_files(root, db_files, {}, known_folders)
+
+    assert result.deleted_files == set()
+    assert not is_folder_deleted(folder, result.listed_folders, result.skipped_folders)
+
+
+def test_files_of_deleted_folder_are_deleted(root, scanner):
+    filepath = os.path.join(root, "a", "b", "video.mp4")
+    _, known_folders, _, _ = walk_files(root)
+    db_files = get_db_files([os.path.join(root, "image.jpg"), filepath])
+    shutil.rmtree(os.path.join(root, "a"))
+    touch_folder(root)
+
+    result = scanner.compare_files(root, db_files, {}, known_folders)
+
+    assert result.deleted_files == {filepath}
+    for folder in (os.path.join(root, "a"), os.path.join(root, "a", "b")):
+        assert is_folder_deleted(folder, result.listed_folders, result.skipped_folders)
+
+
+def test_files_out_of_scanned_folder_are_deleted(root, scanner, tmp_path):
+    filepath = create_file(str(tmp_path / "other" / "image.jpg"))
+    _, known_folders, _, _ = walk_files(root)
+
+    result = scanner.compare_files(root, get_db_files([filepath]), {}, known_folders)
+
+    assert result.deleted_files == {filepath}
+
+
+def test_modified_file_is_found(root, scanner):
+    filepath = os.path.join(root, "image.jpg")
+    db_files = get_db_files([filepath])
+    create_file(filepath, b"changed data")
+
+    result = scanner.compare_files(root, db_files, {}, None)
+
+    assert result.modified_files == {filepath}
@@ -0,0 +1,89 @@
+# the deleted and the new files with the same content are paired as the moved files, so they keep their DB rows
+# (see FileScanner.find_moved_files)
+
+import os
+
+import pytest
+
+from fhandler import FileScanner
+from thumbs.fingerprint import get_file_fingerprint
+
+
+def create_file(filepath, data):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return filepath
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "files")
+
+
+@pytest.fixture
+def scanner():
+    return FileScanner(None, None)
+
+
+# the file is saved to the DB at old_path and then moved to new_path
+def move_file(old_path, new_path, data):
+    create_file(old_path, data)
+    stat = os.stat(old_path)
+    db_files = {old_path: (stat.st_size, stat.st_mtime)}
+    fingerprint = get_file_fingerprint(old_path, stat.st_size)
+
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    os.rename(old_path, new_path)
+    return db_files, fingerprint
+
+
+def test_moved_file_is_paired_by_fingerprint(root, scanner):
+    old_path = os.path.join(root, "a", "image.jpg")
+    new_path = os.path.join(root, "b", "renamed.jpg")
+    db_files, fingerprint = move_file(old_path, new_path, b"image data")
+
+    result = scanner.compare_files(root, db_files, {old_path: fingerprint}, None)
+
+    size, mtime = db_files[old_path]
+    assert result.moved_files == {old_path: (new_path, size, mtime, fingerprint)}
+    assert result.new_files == set()
+    assert result.deleted_files == set()
+
+
+# the files saved before the fingerprints were stored have only the name and the size to compare
+def test_moved_file_without_fingerprint_is_paired_by_name(root, scanner):
+    old_path = os.path.join(root, "a", "image.jpg")
+    new_path = os.path.join(root, "b", "image.jpg")
+    db_files, _ = move_file(old_path, new_path, b"image data")
+
+    result = scanner.compare_files(root, db_files, {}, None)
+
+    assert list(result.moved_files) == [old_path]
+    assert result.moved_files[old_path][0] == new_path
+
+
+def test_different_content_is_not_paired(root, scanner):
+    old_path = os.path.join(root, "a", "image.jpg")
+    new_path = os.path.join(root, "b", "image.jpg")
+    db_files, fingerprint = move_file(old_path, new_path, b"image data")
+    # the same size, but another content
+    create_file(new_path, b"other data")
+
+    result = scanner.compare_files(root, db_files, {old_path: fingerprint}, None)
+
+    assert result.moved_files == {}
+    assert result.new_files == {new_path}
+    assert result.deleted_files == {old_path}
+
+
+def test_copies_are_paired_once(root, scanner):
+    old_path = os.path.join(root, "a", "image.jpg")
+    db_files, fingerprint = move_file(old_path, os.path.join(root, "b", "image.jpg"), b"image data")
+    create_file(os.path.join(root, "c", "image.jpg"), b"image data")
+
+    result = scanner.compare_files(root, db_files, {old_path: fingerprint}, None)
+
+    assert list(result.moved_files) == [old_path]
+    assert len(result.new_files) == 1
+    assert result.deleted_files == set()
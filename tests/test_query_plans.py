@@ -0,0 +1,45 @@
+# the catalog queries must search the indexes instead of reading whole tables (see db/query_audit.py)
+
+import pytest
+
+from db.database import DatabaseHandler
+from db.query_audit import create_catalog, audit_methods, audit_triggers, audit_foreign_keys
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = create_catalog(str(tmp_path))
+    yield db
+    db.close_connection()
+
+
+def test_methods_queries_are_indexed(db, tmp_path):
+    _, problems = audit_methods(db, str(tmp_path))
+    assert problems == []
+
+
+def test_triggers_queries_are_indexed(db):
+    _, problems = audit_triggers(db.connection)
+    assert problems == []
+
+
+def test_foreign_keys_are_indexed(db):
+    assert audit_foreign_keys(db.connection) == []
+
+
+# the audit itself: a dropped index and a changed query of a method with an allowed full scan are reported
+def test_dropped_index_is_reported(db, tmp_path):
+    db.cursor.execute("DROP INDEX idx_files_filename")
+    _, problems = audit_methods(db, str(tmp_path))
+    assert any(problem.startswith("get_filepath: Files full scan") for problem in problems)
+
+
+def test_changed_full_scan_query_is_reported(db, tmp_path, monkeypatch):
+    def get_ids_by_text(self, text):
+        self.cursor.execute("SELECT id FROM Files WHERE filename LIKE ?", (f"%{text}%",))
+        return [r[0] for r in self.cursor.fetchall()]
+
+    monkeypatch.setattr(DatabaseHandler, "get_ids_by_text", get_ids_by_text)
+    _, problems = audit_methods(db, str(tmp_path))
+    assert any(problem.startswith("get_ids_by_text: Files full scan") for problem in problems)
+    assert any(problem.startswith("get_ids_by_text: the full scan query isn't run") for problem in problems)
@@ -0,0 +1,60 @@
+# the tags search modes of the bitsets index (see db/tag_index.py)
+
+import pytest
+
+from db.tag_index import TagIndex, ALL_TAGS, ANY_TAGS, NO_TAGS
+
+RED, GREEN, UNKNOWN = 10, 11, None
+
+
+@pytest.fixture
+def index():
+    # the file 4 has no tags
+    return TagIndex([1, 2, 3, 4], [(1, RED), (1, GREEN), (2, RED), (3, GREEN), (4, None)])
+
+
+def select_ids(index, tags_ids, mode):
+    return index.get_ids(index.select(tags_ids, mode))
+
+
+@pytest.mark.parametrize(
+    "tags_ids, mode, ids",
+    [
+        ([RED, GREEN], ALL_TAGS, [1]),
+        ([RED, GREEN], ANY_TAGS, [1, 2, 3]),
+        ([RED, GREEN], NO_TAGS, [4]),
+        ([RED], NO_TAGS, [3, 4]),
+        # no files have the unknown tag
+        ([RED, UNKNOWN], ALL_TAGS, []),
+        ([RED, UNKNOWN], ANY_TAGS, [1, 2]),
+        ([UNKNOWN], NO_TAGS, [1, 2, 3, 4]),
+    ],
+)
+def test_select_modes(index, tags_ids, mode, ids):
+    assert select_ids(index, tags_ids, mode) == ids
+
+
+def test_files_tags_are_replaced(index):
+    index.set_files_tags([(1, GREEN), (5, RED)])
+
+    assert select_ids(index, [RED], ANY_TAGS) == [2, 5]
+    assert select_ids(index, [GREEN], ANY_TAGS) == [1, 3]
+
+
+def test_removed_files_are_not_selected(index):
+    index.remove_files([1, 4])
+
+    assert select_ids(index, [RED], ANY_TAGS) == [2]
+    assert select_ids(index, [RED], NO_TAGS) == [3]
+
+
+def test_filter_keeps_ids_order(index):
+    assert index.filter_ids([3, 4, 2, 1, 99], index.select([RED, GREEN], ANY_TAGS)) == [3, 2, 1]
+
+
+# the files after the first 64 ones are in the next bitsets words
+def test_many_files(index):
+    index.set_files_tags([(file_id, RED if file_id % 2 else GREEN) for file_id in range(5, 200)])
+
+    assert select_ids(index, [RED], ANY_TAGS) == [1, 2] + list(range(5, 200, 2))
+    assert select_ids(index, [RED, GREEN], NO_TAGS) == [4]
@@ -0,0 +1,116 @@
+import config
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from .render import create_thumbnails_batch, create_failed_results, VIDEO_FILE
+
+# the number of the submitted jobs per worker, so the workers never wait for the new jobs,
+# but the whole files list isn't queued at once
+JOBS_PER_WORKER = 4
+
+
+# spreads the thumbnail jobs (Pillow decoding and ffmpeg runs) across the worker processes
+# with idle_interval (seconds) None is yielded when no batch is done for this time (like while the long videos
+# are handled), so the caller can handle the results it keeps meanwhile
+# is_prioritized is a function of the filepath (like ThumbnailQueue.is_prioritized), the prioritized video
+# doesn't wait for the rest of its batch
+class ThumbnailEngine:
+    def __init__(self, workers=None, video_batch_size=None, idle_interval=None, is_prioritized=None):
+        self.workers = workers or config.get_thumb_workers()
+        self.video_batch_size = video_batch_size or config.get_video_batch_size()
+        self.idle_interval = idle_interval
+        self.is_prioritized = is_prioritized
+
+    # the videos are grouped by video_batch_size to be handled by one ffmpeg run, the other files are handled one by one
+    def split_jobs(self, jobs):
+        videos = []
+        for job in jobs:
+            if job[1] != VIDEO_FILE:
+                yield [job]
+                continue
+
+            videos.append(job)
+            if len(videos) >= self.video_batch_size or (
+                self.is_prioritized is not None and self.is_prioritized(job[0])
+            ):
+                yield videos
+                videos = []
+
+        if videos:
+            yield videos
+
+    # jobs is a list (or any iterable, it's taken only when the workers need the next batch) of
+    # (filepath, file type, thumbnails folder)
+    # yields the create_thumbnails_batch results one by one in the completion order, as soon as every batch is done
+    # (and None for the idle intervals)
+    def create_thumbnails(self, jobs):
+        if not jobs:
+            return
+
+        batches = self.split_jobs(jobs)
+        while True:
+            crashed_batches = yield from self.run_batches(
+                batches, self.workers, self.workers * JOBS_PER_WORKER
+            )
+            if not crashed_batches:
+                return
+
+            # a crashed worker process (like a decoder crash) breaks the pool with all its batches,
+            # they are handled again one file at a time, so only the file which crashes the worker fails
+            yield from self.run_isolated(job for batch in crashed_batches for job in batch)
+
+    def run_isolated(self, jobs):
+        jobs = iter(jobs)
+        while True:
+            crashed_batches = yield from self.run_batches(([job] for job in jobs), 1, 1)
+            if not crashed_batches:
+                return
+
+            yield from create_failed_results(
+                crashed_batches[0], "Процесс обработки файла аварийно завершился"
+            )
+
+    # runs the batches until they are over or a worker process crashes,
+    # returns the batches which were not done because of the crash (the rest of the batches is not taken)
+    def run_batches(self, batches, workers, max_pending):
+        # {future: batch}
+        pending = {}
+        crashed_batches = []
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+
+            def submit(batch):
+                try:
+                    pending[executor.submit(create_thumbnails_batch, batch)] = batch
+                except BrokenProcessPool:
+                    crashed_batches.append(batch)
+
+            for batch in batches:
+                submit(batch)
+                if len(pending) >= max_pending or crashed_batches:
+                    break
+
+            while pending:
+                done, _ = wait(pending, timeout=self.idle_interval, return_when=FIRST_COMPLETED)
+                if not done:
+                    yield None
+                    continue
+
+                for future in done:
+                    batch = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        crashed_batches.append(batch)
+                        continue
+
+                    # submit the next batch before the results are handled, so the worker doesn't wait
+                    if not crashed_batches:
+                        next_batch = next(batches, None)
+                        if next_batch is not None:
+                            submit(next_batch)
+
+                    yield from results
+
+        return crashed_batches
@@ -0,0 +1,32 @@
+import hashlib
+
+# the file content identity: size and the hash of the first and the last 64 KB
+# cheap enough to be calculated for every new file, even on the network shares
+FINGERPRINT_CHUNK_SIZE = 64 * 1024
+
+# the whole file is hashed by the chunks of this size
+CONTENT_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_file_fingerprint(filepath, size):
+    hash_object = hashlib.blake2b(digest_size=16)
+
+    with open(filepath, "rb") as f:
+        hash_object.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        if size > FINGERPRINT_CHUNK_SIZE:
+            f.seek(max(size - FINGERPRINT_CHUNK_SIZE, FINGERPRINT_CHUNK_SIZE))
+            hash_object.update(f.read(FINGERPRINT_CHUNK_SIZE))
+
+    return f"{size}:{hash_object.hexdigest()}"
+
+
+# the fingerprint only detects the changes, the different files of the same size can have the same first and
+# last 64 KB (like the silence padded sounds), so the files which share the thumbnails are compared by the whole content
+def get_content_hash(filepath):
+    hash_object = hashlib.blake2b(digest_size=16)
+
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(CONTENT_HASH_CHUNK_SIZE), b""):
+            hash_object.update(chunk)
+
+    return hash_object.hexdigest()
@@ -0,0 +1,112 @@
+import re
+
+from PIL import Image
+
+from .render import IMAGE_FILE
+from .timeout import FfmpegTimeoutError, run_ffmpeg_command
+
+# the media metadata of the catalog: duration, resolution, frame rate, codec, audio channels and sample rate
+# only ffmpeg.exe is shipped with the program (without ffprobe), so the metadata is parsed from the input info
+# which ffmpeg prints for "ffmpeg -i <file>", the images headers are read by Pillow
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# "Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(tv, bt709), 1920x1080 [SAR 1:1 DAR 16:9], 25 fps"
+# the cover art of the audio files is a video stream too, it's skipped
+VIDEO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Video: (\w+)(?!.*\(attached pic\))(.*)")
+RESOLUTION_PATTERN = re.compile(r", (\d+)x(\d+)")
+FPS_PATTERN = re.compile(r", (\d+(?:\.\d+)?)(k?) (?:fps|tbr)")
+
+# "Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, stereo, fltp, 128 kb/s"
+AUDIO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Audio: (\w+).*?, (\d+) Hz, ([^,]+)")
+
+# the named channel layouts, the other ones are like "5.1(side)" or "3 channels"
+CHANNEL_LAYOUTS = {
+    "mono": 1,
+    "stereo": 2,
+    "quad": 4,
+    "hexagonal": 6,
+    "octagonal": 8,
+}
+CHANNELS_PATTERN = re.compile(r"(\d+) channels")
+LAYOUT_PATTERN = re.compile(r"(\d+)\.(\d+)")
+
+
+# the probe result: (duration, width, height, fps, codec, audio channels, sample rate), None for the unknown values
+EMPTY_METADATA = (None, None, None, None, None, None, None)
+
+
+def get_audio_channels(layout):
+    layout = layout.strip()
+    if layout in CHANNEL_LAYOUTS:
+        return CHANNEL_LAYOUTS[layout]
+
+    match = CHANNELS_PATTERN.match(layout)
+    if match is not None:
+        return int(match.group(1))
+
+    # "5.1" is 5 main channels and 1 LFE channel
+    match = LAYOUT_PATTERN.match(layout)
+    if match is not None:
+        return int(match.group(1)) + int(match.group(2))
+    return None
+
+
+# returns None if the duration is unknown (like for some streams)
+def parse_duration(info):
+    match = DURATION_PATTERN.search(info)
+    if match is None:
+        return None
+
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+# only the first video and the first audio streams are used
+def parse_media_info(info):
+    duration = parse_duration(info)
+    width = height = fps = codec = channels = sample_rate = None
+
+    video = VIDEO_STREAM_PATTERN.search(info)
+    if video is not None:
+        codec = video.group(1)
+
+        resolution = RESOLUTION_PATTERN.search(video.group(2))
+        if resolution is not None:
+            width, height = int(resolution.group(1)), int(resolution.group(2))
+
+        rate = FPS_PATTERN.search(video.group(2))
+        if rate is not None:
+            fps = float(rate.group(1)) * (1000 if rate.group(2) else 1)
+
+    audio = AUDIO_STREAM_PATTERN.search(info)
+    if audio is not None:
+        # the audio codec is the file codec only if there is no video
+        if codec is None:
+            codec = audio.group(1)
+        sample_rate = int(audio.group(2))
+        channels = get_audio_channels(audio.group(3))
+
+    return duration, width, height, fps, codec, channels, sample_rate
+
+
+def probe_media(filepath, timeout):
+    process = run_ffmpeg_command(["-hide_banner", "-i", filepath], timeout)
+    return parse_media_info(process.stderr.decode("utf-8", "replace"))
+
+
+# Image.open reads only the header
+def probe_image(filepath):
+    with Image.open(filepath) as img:
+        return None, img.width, img.height, None, img.format, None, None
+
+
+# returns the metadata tuple (see EMPTY_METADATA), the broken or unreadable files get the empty metadata,
+# so they are not probed again until they are changed
+def probe_file(filepath, file_type, timeout):
+    try:
+        if file_type == IMAGE_FILE:
+            return probe_image(filepath)
+        return probe_media(filepath, timeout)
+    except (OSError, Image.DecompressionBombError, FfmpegTimeoutError):
+        return EMPTY_METADATA
@@ -0,0 +1,269 @@
+import os, mmap, sqlite3, threading
+
+# the thumbnails are appended to one pack file instead of the separate files (100k small files are slow
+# to list, copy and scan by antivirus), the offsets are kept in the SQLite index next to the pack
+# the preview path of a packed thumbnail is "pack:<thumbnail name>"
+PACK_PREFIX = "pack:"
+PACK_INDEX_NAME = "pack.db"
+
+# the pack is rewritten without the deleted thumbnails when they take this part of the pack
+COMPACTION_RATIO = 0.5
+# the small packs are not compacted at all
+MIN_COMPACTION_SIZE = 4 * 1024 * 1024
+
+
+def is_pack_path(previewpath):
+    return previewpath.startswith(PACK_PREFIX)
+
+
+def get_pack_path(thumb_name):
+    return PACK_PREFIX + thumb_name
+
+
+def get_pack_key(previewpath):
+    return previewpath[len(PACK_PREFIX) :]
+
+
+# the pack file name has a generation number, which is increased by the compaction,
+# so the readers which still map the previous file are not broken
+def get_pack_filepath(folder, generation):
+    return os.path.join(folder, f"thumbnails.{generation}.pack")
+
+
+# the readers use the usual connections too, since the read-only connection can't open the WAL database
+# when the writer isn't running
+def connect_to_index(folder):
+    return sqlite3.connect(
+        os.path.join(folder, PACK_INDEX_NAME), check_same_thread=False
+    )
+
+
+# the read-only index connections of the worker processes, one per thumbnails folder
+index_connections = {}
+
+
+# check if the thumbnail is already packed (used by the worker processes before the decoding)
+def pack_contains(folder, key):
+    if folder not in index_connections:
+        if not os.path.exists(os.path.join(folder, PACK_INDEX_NAME)):
+            return False
+        index_connections[folder] = connect_to_index(folder)
+
+    row = (
+        index_connections[folder]
+        .execute("SELECT 1 FROM Pack_entries WHERE key = ?", (key,))
+        .fetchone()
+    )
+    return row is not None
+
+
+# the pack writer, all the changes are made under the lock, since it's used by the thumbnail creation and deletion threads
+class ThumbnailPack:
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+
+        os.makedirs(self.folder, exist_ok=True)
+        self.connection = connect_to_index(self.folder)
+        self.cursor = self.connection.cursor()
+
+        # WAL allows the reads (grid, workers) during the writes
+        self.cursor.execute("PRAGMA journal_mode = WAL;")
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS Pack_entries (
+                key TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+            """
+        )
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS Pack_info (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                generation INTEGER NOT NULL,
+                dead_bytes INTEGER NOT NULL
+            )
+            """
+        )
+        self.cursor.execute(
+            "INSERT OR IGNORE INTO Pack_info (id, generation, dead_bytes) VALUES (1, 0, 0)"
+        )
+        self.connection.commit()
+
+        self.generation = self.get_generation()
+        self.pack_file = open(get_pack_filepath(self.folder, self.generation), "ab")
+
+        self.delete_old_generations()
+
+    def get_generation(self):
+        self.cursor.execute("SELECT generation FROM Pack_info WHERE id = 1")
+        return self.cursor.fetchone()[0]
+
+    # the previous pack files which were mapped by the readers during the compaction
+    def delete_old_generations(self):
+        for generation in range(self.generation):
+            try:
+                os.remove(get_pack_filepath(self.folder, generation))
+            except OSError:
+                pass
+
+    def contains(self, key):
+        with self.lock:
+            self.cursor.execute("SELECT 1 FROM Pack_entries WHERE key = ?", (key,))
+            return self.cursor.fetchone() is not None
+
+    def append(self, key, data):
+        with self.lock:
+            # the same content can be rendered by two workers at the same time
+            self.cursor.execute("SELECT 1 FROM Pack_entries WHERE key = ?", (key,))
+            if self.cursor.fetchone() is not None:
+                return
+
+            self.pack_file.seek(0, os.SEEK_END)
+            offset = self.pack_file.tell()
+            self.pack_file.write(data)
+            # the data must be in the file before the readers can find it in the index
+            self.pack_file.flush()
+
+            self.cursor.execute(
+                "INSERT INTO Pack_entries (key, offset, length) VALUES (?, ?, ?)",
+                (key, offset, len(data)),
+            )
+            self.connection.commit()
+
+    def delete(self, keys):
+        with self.lock:
+            placeholders = ", ".join(["?"] * len(keys))
+            self.cursor.execute(
+                f"SELECT COALESCE(SUM(length), 0) FROM Pack_entries WHERE key IN ({placeholders})",
+                tuple(keys),
+            )
+            deleted_bytes = self.cursor.fetchone()[0]
+
+            self.cursor.execute(
+                f"DELETE FROM Pack_entries WHERE key IN ({placeholders})", tuple(keys)
+            )
+            self.cursor.execute(
+                "UPDATE Pack_info SET dead_bytes = dead_bytes + ? WHERE id = 1",
+                (deleted_bytes,),
+            )
+            self.connection.commit()
+
+    def needs_compaction(self):
+        with self.lock:
+            self.cursor.execute("SELECT dead_bytes FROM Pack_info WHERE id = 1")
+            dead_bytes = self.cursor.fetchone()[0]
+            pack_size = self.pack_file.seek(0, os.SEEK_END)
+
+        return (
+            pack_size >= MIN_COMPACTION_SIZE
+            and dead_bytes >= pack_size * COMPACTION_RATIO
+        )
+
+    # rewrite the live thumbnails to the next generation pack file and switch the index to it
+    def compact(self):
+        with self.lock:
+            self.pack_file.close()
+
+            old_filepath = get_pack_filepath(self.folder, self.generation)
+            new_generation = self.generation + 1
+            new_filepath = get_pack_filepath(self.folder, new_generation)
+
+            self.cursor.execute("SELECT key, offset, length FROM Pack_entries ORDER BY offset")
+            entries = self.cursor.fetchall()
+
+            new_offsets = []
+            with open(old_filepath, "rb") as old_file, open(new_filepath, "wb") as new_file:
+                for key, offset, length in entries:
+                    old_file.seek(offset)
+                    new_offsets.append((new_file.tell(), key))
+                    new_file.write(old_file.read(length))
+
+            with self.connection:
+                self.cursor.executemany(
+                    "UPDATE Pack_entries SET offset = ? WHERE key = ?", new_offsets
+                )
+                self.cursor.execute(
+                    "UPDATE Pack_info SET generation = ?, dead_bytes = 0 WHERE id = 1",
+                    (new_generation,),
+                )
+
+            self.generation = new_generation
+            self.pack_file = open(new_filepath, "ab")
+
+            # the file can't be deleted on Windows while it's mapped by the reader, it's deleted on the next launch then
+            try:
+                os.remove(old_filepath)
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            self.pack_file.close()
+            self.connection.close()
+
+
+# the pack reader for the GUI, the pack file is memory-mapped, so reading a thumbnail doesn't open any file
+class ThumbnailPackReader:
+    def __init__(self, folder):
+        self.folder = folder
+        self.connection = None
+
+        self.generation = None
+        self.pack_map = None
+
+    def read(self, key):
+        if self.connection is None:
+            if not os.path.exists(os.path.join(self.folder, PACK_INDEX_NAME)):
+                return None
+            self.connection = connect_to_index(self.folder)
+
+        row = self.connection.execute(
+            """
+            SELECT e.offset, e.length, i.generation
+            FROM Pack_entries e, Pack_info i
+            WHERE e.key = ? AND i.id = 1
+            """,
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        offset, length, generation = row
+
+        # the pack is mapped again after the compaction or when the thumbnail was appended after the mapping
+        if (
+            self.pack_map is None
+            or generation != self.generation
+            or offset + length > len(self.pack_map)
+        ):
+            if not self.map_pack(generation):
+                return None
+
+        return self.pack_map[offset : offset + length]
+
+    def map_pack(self, generation):
+        self.close_map()
+
+        try:
+            with open(get_pack_filepath(self.folder, generation), "rb") as pack_file:
+                self.pack_map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # the pack is empty (can't be mapped) or replaced by the compaction right now
+            return False
+
+        self.generation = generation
+        return True
+
+    def close_map(self):
+        if self.pack_map is not None:
+            self.pack_map.close()
+            self.pack_map = None
+
+    def close(self):
+        self.close_map()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,113 @@
+import heapq, itertools, threading
+
+# the files waiting for the thumbnails in the on-demand mode: the files visible in the files list go first,
+# then the files around them, the rest is handled when there is nothing else to do
+VISIBLE_PRIORITY = 0
+NEARBY_PRIORITY = 1
+IDLE_PRIORITY = 2
+
+
+# the queue is filled and reordered by the GUI thread and taken by the thumbnail creation thread
+class ThumbnailQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # (priority, order, filepath), the entries with an outdated priority are skipped when taken
+        self.heap = []
+        # {filepath: priority} of the queued files
+        self.priorities = {}
+        # the files with the raised priority, they go back to the idle priority when they leave the viewport
+        self.focused = set()
+        # keeps the queue order for the files with the same priority
+        self.order = itertools.count()
+        # the number of the files taken by the current run (iteration)
+        self.taken = 0
+        # the files taken by the current run with a raised priority (see is_prioritized)
+        self.prioritized = set()
+
+    # the number of the files of the current run (taken and queued), like the length of the files list
+    def __len__(self):
+        with self.lock:
+            return self.taken + len(self.priorities)
+
+    def is_empty(self):
+        with self.lock:
+            return not self.priorities
+
+    # yields the files by priority until the queue is empty
+    def __iter__(self):
+        with self.lock:
+            self.taken = 0
+            self.prioritized.clear()
+
+        while True:
+            filepath = self.take()
+            if filepath is None:
+                return
+            yield filepath
+
+    def push(self, filepath, priority):
+        self.priorities[filepath] = priority
+        heapq.heappush(self.heap, (priority, next(self.order), filepath))
+
+    # the already queued files keep their priority
+    def put(self, filepaths, priority=IDLE_PRIORITY):
+        with self.lock:
+            for filepath in filepaths:
+                if filepath not in self.priorities:
+                    self.push(filepath, priority)
+
+    # returns None if the queue is empty
+    def take(self):
+        with self.lock:
+            while self.heap:
+                priority, _, filepath = heapq.heappop(self.heap)
+                if self.priorities.get(filepath) == priority:
+                    del self.priorities[filepath]
+                    self.focused.discard(filepath)
+                    self.taken += 1
+                    if priority != IDLE_PRIORITY:
+                        self.prioritized.add(filepath)
+                    return filepath
+            return None
+
+    # the file was taken while it was in or around the viewport
+    def is_prioritized(self, filepath):
+        with self.lock:
+            return filepath in self.prioritized
+
+    # raise the priority of the queued files in and around the viewport, the previously focused files go back to idle
+    def prioritize(self, visible_filepaths, nearby_filepaths):
+        with self.lock:
+            focused = set()
+            for filepaths, priority in (
+                (visible_filepaths, VISIBLE_PRIORITY),
+                (nearby_filepaths, NEARBY_PRIORITY),
+            ):
+                for filepath in filepaths:
+                    if filepath in self.priorities and filepath not in focused:
+                        focused.add(filepath)
+                        if self.priorities[filepath] != priority:
+                            self.push(filepath, priority)
+
+            for filepath in self.focused - focused:
+                if self.priorities.get(filepath, IDLE_PRIORITY) != IDLE_PRIORITY:
+                    self.push(filepath, IDLE_PRIORITY)
+
+            self.focused = focused
+
+    # the deleted files are not handled
+    def discard(self, filepaths):
+        with self.lock:
+            for filepath in filepaths:
+                self.priorities.pop(filepath, None)
+                self.focused.discard(filepath)
+
+    # moved_files is a {old filepath: new filepath} dict, the moved files keep their priority
+    def rename(self, moved_files):
+        with self.lock:
+            for old_path, new_path in moved_files.items():
+                priority = self.priorities.pop(old_path, None)
+                if priority is not None:
+                    self.focused.discard(old_path)
+                    self.push(new_path, priority)
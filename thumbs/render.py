@@ -0,0 +1,374 @@
+import os, hashlib
+import ffmpeg
+import config
+
+from PIL import Image
+
+from .fingerprint import get_file_fingerprint, get_content_hash
+from .pack import get_pack_path, pack_contains
+from .timeout import FfmpegTimeoutError, run_ffmpeg
+from .waveform import create_waveform
+
+# this module is imported by the worker processes, so it must not import Qt (it slows down every worker start)
+
+IMAGE_FILE = "image"
+VIDEO_FILE = "video"
+AUDIO_FILE = "audio"
+
+# the images are decoded at about this multiple of the thumbnail size and then resized with the antialiasing filter
+IMG_DECODE_SCALE = 2
+
+# the bigger images are not decoded at all (decompression bombs and huge scans would take gigabytes of memory)
+MAX_IMAGE_PIXELS = 200_000_000
+
+# the video thumbnail is the keyframe at (or right before) this time in seconds
+VIDEO_SEEK_TIME = 1
+
+# the thumbnails parameters are a part of the cache key, so the cached thumbnails aren't reused after they are changed
+THUMB_PARAMS = {
+    IMAGE_FILE: "image:reduced",
+    VIDEO_FILE: f"video:keyframe{VIDEO_SEEK_TIME}",
+    AUDIO_FILE: "audio:waveform",
+}
+
+
+# the previewpath of the files saved to the DB before their thumbnails are created (the on-demand mode)
+PENDING_PREVIEWPATH = ""
+
+# the previewpath of the files which thumbnails failed (broken or unsupported files), they get the error icon
+FAILED_PREVIEWPATH = "failed:"
+
+
+# {thumbnails format: (Pillow format, file extension)}, see config.get_thumb_format()
+THUMB_FORMATS = {
+    config.PNG_FORMAT: ("PNG", ".png"),
+    config.WEBP_FORMAT: ("WEBP", ".webp"),
+    config.JPEG_FORMAT: ("JPEG", ".jpg"),
+}
+
+# JPEG has no transparency, the transparent thumbnails (like the waveforms) are put on the files list background
+JPEG_BACKGROUND = (255, 255, 255)
+
+
+# the encoding settings of the thumbnails, read once per batch
+class ThumbFormat:
+    def __init__(self, thumb_format, quality):
+        self.name = thumb_format
+        self.quality = quality
+        self.pillow_format, self.extension = THUMB_FORMATS[thumb_format]
+
+    @classmethod
+    def from_config(cls):
+        return cls(config.get_thumb_format(), config.get_thumb_quality())
+
+    # a part of the thumbnails cache key (the quality doesn't matter for PNG)
+    def get_param(self):
+        if self.pillow_format == "PNG":
+            return self.name
+        return f"{self.name}{self.quality}"
+
+    # the temporary files have no proper extension, so the format is always passed to Pillow
+    def save(self, img, filepath):
+        if self.pillow_format == "PNG":
+            img.save(filepath, format="PNG")
+            return
+
+        if self.pillow_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = flatten_image(img, JPEG_BACKGROUND)
+        img.save(filepath, format=self.pillow_format, quality=self.quality)
+
+
+def flatten_image(img, background):
+    img = img.convert("RGBA")
+    flat = Image.new("RGB", img.size, background)
+    flat.paste(img, mask=img.getchannel("A"))
+    return flat
+
+
+# the images and the sounds are read whole by their decoders anyway, so they are keyed by the content hash
+# and the same files in the different folders (or in the copies of the repository) share one thumbnail;
+# the videos are only seeked (hashing would read the whole file), so every video file has its own thumbnail
+# (a changed file gets a new one in both cases)
+def get_content_key(filepath, file_type, stat):
+    if file_type == VIDEO_FILE:
+        return f"{filepath}|{stat.st_size}|{stat.st_mtime_ns}"
+    return get_content_hash(filepath)
+
+
+# the thumbnail name depends only on the content key (see get_content_key) and the thumbnail parameters
+# levels are the thumbnail sizes (renditions), see config.get_thumb_levels()
+def get_thumbnail_name(file_type, content_key, levels, thumb_format):
+    levels_param = ",".join(str(size) for size in levels)
+    key = f"{THUMB_PARAMS[file_type]}:{levels_param}:{thumb_format.get_param()}|{content_key}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest() + thumb_format.extension
+
+
+# the smallest rendition is the thumbnail itself (used in the files list), the bigger ones have the size
+# in the name (<name>@<size>.png), so they are found by the thumbnail path without the DB
+def get_rendition_path(thumb_filepath, size):
+    root, extension = os.path.splitext(thumb_filepath)
+    return f"{root}@{size}{extension}"
+
+
+# returns {size: rendition path} for all the levels
+def get_renditions_paths(thumb_filepath, levels):
+    renditions = {levels[0]: thumb_filepath}
+    for size in levels[1:]:
+        renditions[size] = get_rendition_path(thumb_filepath, size)
+    return renditions
+
+
+# save all the renditions from one decoded image, from the biggest to the smallest one
+# renditions_paths is a {size: path} dict
+def save_renditions(img, renditions_paths, thumb_format):
+    for size in sorted(renditions_paths, reverse=True):
+        img.thumbnail((size, size), reducing_gap=None)
+        thumb_format.save(img, renditions_paths[size])
+
+
+# create all the renditions from the video frame extracted by ffmpeg (a lossless PNG, it's deleted then),
+# so the video thumbnails are encoded with the same settings as the images
+def create_video_renditions(frame_filepath, renditions_paths, thumb_format):
+    try:
+        with Image.open(frame_filepath) as img:
+            img.load()
+            save_renditions(img, renditions_paths, thumb_format)
+    finally:
+        os.remove(frame_filepath)
+
+
+def create_image_thumbnail(filepath, renditions_paths, thumb_format):
+    # Image.open reads only the header, the pixels are decoded on the first access
+    with Image.open(filepath) as img:
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise Image.DecompressionBombError(
+                f"{img.width}x{img.height} image is too big for the thumbnail"
+            )
+
+        # the multi-frame images (GIF, TIFF) are opened on the first frame, only this frame is decoded
+        decode_size = max(renditions_paths) * IMG_DECODE_SCALE
+
+        # JPEG is decoded right at 1/2, 1/4 or 1/8 scale (DCT scaling), the full image is never in memory
+        if img.format == "JPEG":
+            img.draft("RGB", (decode_size, decode_size))
+
+        # the modes like CMYK or palette can't be reduced or saved to PNG
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+        # the other formats are reduced by an integer factor (fast box averaging) before the resizing
+        factor = min(img.width // decode_size, img.height // decode_size)
+        if factor > 1:
+            img = img.reduce(factor)
+
+        save_renditions(img, renditions_paths, thumb_format)
+
+
+# returns False if the file has no audio stream (nothing is created)
+def create_audio_thumbnail(filepath, renditions_paths, thumb_format, timeout):
+    img = create_waveform(filepath, max(renditions_paths), timeout)
+    if img is None:
+        return False
+
+    save_renditions(img, renditions_paths, thumb_format)
+    return True
+
+
+# the audio files without the audio stream (or the broken ones) get the common audio icon
+def get_audio_icon_path():
+    return os.path.join(config.assign_script_dir(), "icons", "audio.png")
+
+
+# the video input which decodes only the keyframes: the seek goes to the keyframe before the seek time
+# and this keyframe is used as is (without decoding all the frames up to the seek time)
+def keyframe_input(filepath, seek_time):
+    return ffmpeg.input(
+        filepath, ss=seek_time, skip_frame="nokey", noaccurate_seek=None
+    )
+
+
+# videos is a list of (filepath, thumbnail path), all of them are handled by one ffmpeg run
+# (the process start takes more time than the keyframe decoding for the short clips)
+# the frame is scaled to fit into the size x size square, timeout is the time limit for every video
+def run_video_thumbnails(videos, seek_time, size, timeout):
+    outputs = [
+        keyframe_input(filepath, seek_time)
+        .video.filter("scale", size, size, force_original_aspect_ratio="decrease")
+        .output(thumb_filepath, vframes=1)
+        for filepath, thumb_filepath in videos
+    ]
+    run_ffmpeg(ffmpeg.merge_outputs(*outputs), timeout * len(videos))
+
+
+# returns {filepath: error message} of the failed videos
+def create_video_thumbnails(videos, size, timeout, seek_time=VIDEO_SEEK_TIME):
+    try:
+        run_video_thumbnails(videos, seek_time, size, timeout)
+    except (ffmpeg.Error, FfmpegTimeoutError) as e:
+        if len(videos) == 1:
+            return {videos[0][0]: get_error_message(e)}
+        # one broken (or hung) file fails the whole run, so the files are handled separately to find it
+        errors = {}
+        for video in videos:
+            errors.update(create_video_thumbnails([video], size, timeout, seek_time))
+        return errors
+
+    # the clips shorter than the seek time have no frame there, so their seek time is clamped to the clip start
+    short_videos = [video for video in videos if not os.path.exists(video[1])]
+    if short_videos and seek_time != 0:
+        return create_video_thumbnails(short_videos, size, timeout, 0)
+    return {}
+
+
+# the last line of the ffmpeg output is its error, the other errors are shown as is
+def get_error_message(error):
+    if isinstance(error, ffmpeg.Error) and error.stderr:
+        lines = error.stderr.decode("utf-8", "replace").strip().splitlines()
+        if lines:
+            return lines[-1]
+    return str(error) or type(error).__name__
+
+
+# the results of the files which failed before their thumbnails were started (like the files which can't be read)
+def create_failed_results(jobs, error):
+    return [
+        (filepath, file_type, FAILED_PREVIEWPATH, None, None, None, None, error)
+        for filepath, file_type, _ in jobs
+    ]
+
+
+# the job for a worker process: (filepath, file type, thumbnails folder)
+# the jobs list is handled at once, so the videos are handled by one ffmpeg run
+# returns the list of
+# (filepath, file type, thumbnail path, file size, file mtime, file fingerprint, thumbnails data, error message)
+# the thumbnails data ({rendition path: data}) is returned only for the pack storage (the pack is written by one thread),
+# otherwise it's None
+# every file is handled separately: a broken file gets FAILED_PREVIEWPATH and the error message, the other files of the batch
+# are not affected (the error message is None for them)
+def create_thumbnails_batch(jobs):
+    is_pack_storage = config.get_thumb_storage() == config.PACK_STORAGE
+    levels = config.get_thumb_levels()
+    timeout = config.get_ffmpeg_timeout()
+    thumb_format = ThumbFormat.from_config()
+
+    results = []
+    # {thumbnail path: error message} of the failed thumbnails (the files with the same content fail together)
+    errors = {}
+    # {filepath: error message} of the files which can't be read
+    file_errors = {}
+    # {thumbnail path: {size: (rendition path, temporary rendition path)}} of the thumbnails created in this batch
+    created_thumbnails = {}
+    # (filepath, temporary path of the extracted frame)
+    videos = []
+    # {video filepath: thumbnail path}
+    videos_thumbnails = {}
+    # (thumbnail path, temporary path of the extracted frame, {size: temporary rendition path}) of the videos
+    videos_renditions = []
+
+    for filepath, file_type, save_path in jobs:
+        # stat before the decoding, so if the file is changed meanwhile, the next scan will see it as modified
+        try:
+            stat = os.stat(filepath)
+            fingerprint = get_file_fingerprint(filepath, stat.st_size)
+            content_key = get_content_key(filepath, file_type, stat)
+        except OSError as e:
+            file_errors[filepath] = get_error_message(e)
+            results.append((filepath, file_type, FAILED_PREVIEWPATH, None, None, None))
+            continue
+
+        thumb_name = get_thumbnail_name(file_type, content_key, levels, thumb_format)
+        if is_pack_storage:
+            thumb_filepath = get_pack_path(thumb_name)
+            is_created = pack_contains(save_path, thumb_name)
+        else:
+            thumb_filepath = os.path.join(save_path, thumb_name)
+            is_created = os.path.exists(thumb_filepath)
+
+        results.append(
+            (filepath, file_type, thumb_filepath, stat.st_size, stat.st_mtime, fingerprint)
+        )
+
+        # the thumbnail is already created for the same file content, no need to decode the file
+        if is_created or thumb_filepath in created_thumbnails:
+            continue
+
+        # the same files can be handled by different workers at the same time,
+        # so the thumbnails are written to the temporary files and then renamed (the rename is atomic)
+        renditions = {
+            size: (
+                rendition_path,
+                os.path.join(save_path, f"{os.path.basename(rendition_path)}.{os.getpid()}.tmp"),
+            )
+            for size, rendition_path in get_renditions_paths(thumb_filepath, levels).items()
+        }
+        created_thumbnails[thumb_filepath] = renditions
+        temp_paths = {size: temp_path for size, (_, temp_path) in renditions.items()}
+
+        # this branch is needed for handling type definition (like if the file is an image, then use Image, if a video, then use ffmpeg and so on)
+        # any error of the decoders is the error of this file only
+        try:
+            if file_type == IMAGE_FILE:
+                create_image_thumbnail(filepath, temp_paths, thumb_format)
+
+            elif file_type == VIDEO_FILE:
+                frame_filepath = os.path.join(save_path, f"{thumb_name}.{os.getpid()}.frame.png")
+                videos.append((filepath, frame_filepath))
+                videos_renditions.append((thumb_filepath, frame_filepath, temp_paths))
+                videos_thumbnails[filepath] = thumb_filepath
+
+            elif file_type == AUDIO_FILE:
+                if not create_audio_thumbnail(filepath, temp_paths, thumb_format, timeout):
+                    del created_thumbnails[thumb_filepath]
+                    results[-1] = (
+                        filepath, file_type, get_audio_icon_path(), stat.st_size, stat.st_mtime, fingerprint
+                    )
+        except Exception as e:
+            errors[thumb_filepath] = get_error_message(e)
+
+    if videos:
+        for filepath, error in create_video_thumbnails(videos, levels[-1], timeout).items():
+            errors[videos_thumbnails[filepath]] = error
+
+        # all the renditions are made from the extracted frame, so the video is decoded only once
+        for thumb_filepath, frame_filepath, temp_paths in videos_renditions:
+            # ffmpeg doesn't fail for the files without a video stream, it just creates nothing
+            if not os.path.exists(frame_filepath):
+                errors.setdefault(thumb_filepath, "В файле нет видеопотока")
+                continue
+            # the failed ffmpeg run can leave the frame
+            if thumb_filepath in errors:
+                os.remove(frame_filepath)
+                continue
+            try:
+                create_video_renditions(frame_filepath, temp_paths, thumb_format)
+            except Exception as e:
+                errors[thumb_filepath] = get_error_message(e)
+
+    # the renditions of the failed thumbnails can be partially written
+    for thumb_filepath in errors:
+        for _, temp_path in created_thumbnails.pop(thumb_filepath, {}).values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    thumbnails_data = {}
+    for thumb_filepath, renditions in created_thumbnails.items():
+        for rendition_path, temp_path in renditions.values():
+            if is_pack_storage:
+                with open(temp_path, "rb") as f:
+                    thumbnails_data.setdefault(thumb_filepath, {})[rendition_path] = f.read()
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, rendition_path)
+
+    batch_results = []
+    for filepath, file_type, thumb_filepath, size, mtime, fingerprint in results:
+        error = file_errors.get(filepath) or errors.get(thumb_filepath)
+        if error is not None:
+            batch_results.append(
+                (filepath, file_type, FAILED_PREVIEWPATH, size, mtime, fingerprint, None, error)
+            )
+        else:
+            batch_results.append(
+                (filepath, file_type, thumb_filepath, size, mtime, fingerprint, thumbnails_data.get(thumb_filepath), None)
+            )
+    return batch_results
@@ -0,0 +1,93 @@
+import os
+import ffmpeg
+import config
+
+from .metadata import parse_duration
+from .pack import is_pack_path, get_pack_key
+from .timeout import FfmpegTimeoutError, run_ffmpeg, run_ffmpeg_command
+
+# the storyboard is a strip of N evenly spaced video frames in one JPEG, the preview window shows
+# the frame under the mouse cursor, so the scrubbing doesn't decode the video
+
+# the frame width in the strip (the preview window width)
+STORYBOARD_FRAME_WIDTH = 256
+
+
+# the storyboards are saved next to the thumbnails, so they are skipped by the files scan
+def get_storyboards_folder():
+    return os.path.join(config.get_thumb_folder_path(), "thumbnails", "storyboards")
+
+
+# the storyboard is named after the video thumbnail (see get_content_key), so it's deleted with the thumbnail
+# and a changed video gets a new one
+def get_storyboard_path(previewpath, frames):
+    thumb_name = get_pack_key(previewpath) if is_pack_path(previewpath) else os.path.basename(previewpath)
+    root = os.path.splitext(thumb_name)[0]
+    return os.path.join(get_storyboards_folder(), f"{root}.{frames}.jpg")
+
+
+# returns the paths of the storyboards of the thumbnails (for all the frames numbers), the folder is listed once
+def get_thumbnails_storyboards(previewpaths):
+    folder = get_storyboards_folder()
+    if not os.path.isdir(folder):
+        return []
+
+    roots = {
+        os.path.splitext(
+            get_pack_key(previewpath) if is_pack_path(previewpath) else os.path.basename(previewpath)
+        )[0]
+        for previewpath in previewpaths
+    }
+    # the storyboard name is <thumbnail name root>.<frames>.jpg
+    return [
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.rsplit(".", 2)[0] in roots
+    ]
+
+
+# ffmpeg prints the container duration with the input info (only ffmpeg.exe is shipped with the program, without ffprobe)
+# returns None if the duration is unknown (like for some streams)
+def get_video_duration(filepath, timeout):
+    process = run_ffmpeg_command(["-hide_banner", "-i", filepath], timeout)
+    return parse_duration(process.stderr.decode("utf-8", "replace"))
+
+
+# all the frames are extracted in one ffmpeg pass: only the keyframes are decoded, the fps filter picks
+# the keyframes at the evenly spaced times and the tile filter joins them into one image
+# tpad clones the last keyframe up to the video end, otherwise the tiles after the last picked keyframe stay black
+# (the long GOP videos have fewer keyframes than the strip frames, their neighbouring tiles can repeat a keyframe,
+# the whole video isn't decoded for them, so the storyboard costs about one thumbnail)
+# (eof_action=pass keeps the last frame for the last tile)
+def create_storyboard(filepath, storyboard_filepath, frames):
+    timeout = config.get_ffmpeg_timeout()
+    duration = get_video_duration(filepath, timeout)
+    if not duration:
+        return False
+
+    os.makedirs(os.path.dirname(storyboard_filepath), exist_ok=True)
+
+    # the strip is written to the temporary file, so the preview never loads a partially written one
+    temp_filepath = f"{storyboard_filepath}.{os.getpid()}.jpg"
+    try:
+        run_ffmpeg(
+            ffmpeg.input(filepath, skip_frame="nokey")
+            .video.filter("tpad", stop_mode="clone", stop_duration=duration)
+            .filter("fps", fps=frames / duration, eof_action="pass")
+            .filter("scale", STORYBOARD_FRAME_WIDTH, -2)
+            .filter("tile", f"{frames}x1")
+            .output(temp_filepath, vframes=1),
+            timeout,
+        )
+    except FfmpegTimeoutError:
+        # the killed ffmpeg can leave a partially written strip
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    # ffmpeg doesn't fail for the files without a video stream, it just creates nothing
+    if not os.path.exists(temp_filepath):
+        return False
+
+    os.replace(temp_filepath, storyboard_filepath)
+    return True
@@ -0,0 +1,64 @@
+import subprocess, threading
+import ffmpeg
+import config
+
+# a broken file can make ffmpeg hang forever, so every ffmpeg run of the thumbnails is killed after the timeout
+# this module is imported by the worker processes, so it must not import Qt
+
+
+class FfmpegTimeoutError(Exception):
+    pass
+
+
+# kills the process if it's still running after the timeout (the blocked reads of its pipes return then)
+class ProcessTimeout:
+    def __init__(self, process, timeout):
+        self.process = process
+        self.timeout = timeout
+        self.timer = threading.Timer(timeout, self.kill)
+        self.is_expired = False
+
+    def kill(self):
+        self.is_expired = True
+        self.process.kill()
+
+    def __enter__(self):
+        self.timer.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.cancel()
+
+    def check(self):
+        if self.is_expired:
+            raise FfmpegTimeoutError(f"ffmpeg не завершил работу за {self.timeout} с")
+
+
+# runs the ffmpeg-python stream like stream.run(), but kills ffmpeg after the timeout
+# the ffmpeg error messages are kept in ffmpeg.Error.stderr
+def run_ffmpeg(stream, timeout):
+    process = (
+        stream.global_args("-loglevel", "error", "-nostdin")
+        .overwrite_output()
+        .run_async(cmd=config.get_ffmpeg_path(), pipe_stderr=True)
+    )
+    with ProcessTimeout(process, timeout) as process_timeout:
+        _, stderr = process.communicate()
+    process_timeout.check()
+
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr)
+
+
+# the subprocess.run of ffmpeg itself (like for the input info), killed after the timeout
+def run_ffmpeg_command(args, timeout):
+    try:
+        return subprocess.run(
+            [config.get_ffmpeg_path(), *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise FfmpegTimeoutError(f"ffmpeg не завершил работу за {timeout} с")
@@ -0,0 +1,125 @@
+import os
+import ffmpeg
+import config
+import numpy as np
+
+from PIL import Image
+
+from .timeout import ProcessTimeout
+
+# the audio thumbnail is the waveform: the min/max peaks of every image column
+# this module is imported by the worker processes, so it must not import Qt
+
+# the audio is decoded to the mono 16-bit PCM at this rate (the waveform doesn't need more,
+# and ffmpeg pipes 16 KB per second instead of 176 KB for the CD audio)
+WAVEFORM_SAMPLE_RATE = 8000
+
+# the samples are picked without the low-pass filter: the filtering takes most of the ffmpeg time
+# for the long tracks and it would remove the high frequencies peaks from the waveform
+RESAMPLE_FILTER = "aresample={}:filter_size=1:phase_shift=0:linear_interp=0"
+
+# the WAV demuxer reads 4 KB packets by default, the bigger ones cut the decoding time of the long files by a quarter
+WAV_PACKET_SIZE = 1024 * 1024
+
+# the peaks are first reduced for the blocks of this many samples (the track duration isn't known
+# while the audio is streamed), so a one-hour track keeps only ~450 000 blocks peaks in memory
+BLOCK_SAMPLES = 64
+
+# the PCM is read from the ffmpeg pipe by the chunks of this many samples (a multiple of BLOCK_SAMPLES)
+CHUNK_SAMPLES = BLOCK_SAMPLES * 4096
+
+WAVEFORM_COLOR = (74, 144, 226, 255)
+
+
+# streams the PCM from ffmpeg and returns the (block mins, block maxs) arrays, or None if there are no samples
+# ffmpeg is killed if the decoding takes more than timeout seconds
+def read_blocks_peaks(filepath, timeout):
+    # max_size is the WAV demuxer option, the other demuxers fail with it
+    input_options = {}
+    if os.path.splitext(filepath)[1].lower() == ".wav":
+        input_options["max_size"] = WAV_PACKET_SIZE
+
+    process = (
+        ffmpeg.input(filepath, **input_options)
+        .output(
+            "pipe:",
+            format="s16le",
+            acodec="pcm_s16le",
+            ac=1,
+            af=RESAMPLE_FILTER.format(WAVEFORM_SAMPLE_RATE),
+        )
+        .global_args("-loglevel", "quiet", "-nostdin")
+        .run_async(cmd=config.get_ffmpeg_path(), pipe_stdout=True)
+    )
+
+    mins = []
+    maxs = []
+    tail = np.empty(0, dtype=np.int16)
+    with ProcessTimeout(process, timeout) as process_timeout:
+        try:
+            while True:
+                data = process.stdout.read(CHUNK_SAMPLES * 2)
+                if not data:
+                    break
+
+                # the last chunk is shorter, its incomplete block is reduced after the loop
+                samples = np.concatenate((tail, np.frombuffer(data, dtype=np.int16)))
+                full_length = len(samples) // BLOCK_SAMPLES * BLOCK_SAMPLES
+                blocks = samples[:full_length].reshape(-1, BLOCK_SAMPLES)
+                tail = samples[full_length:]
+
+                mins.append(blocks.min(axis=1))
+                maxs.append(blocks.max(axis=1))
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    # the killed ffmpeg closes the pipe like at the end of the file, so its partial waveform is not used
+    process_timeout.check()
+
+    if len(tail):
+        mins.append(tail.min(keepdims=True))
+        maxs.append(tail.max(keepdims=True))
+
+    if not mins:
+        return None
+
+    return np.concatenate(mins), np.concatenate(maxs)
+
+
+# reduces the blocks peaks to the width columns peaks
+def get_columns_peaks(mins, maxs, width):
+    if len(mins) >= width:
+        starts = np.arange(width) * len(mins) // width
+        return np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+
+    # the short sounds have less blocks than columns, so the blocks are stretched
+    indexes = np.arange(width) * len(mins) // width
+    return mins[indexes], maxs[indexes]
+
+
+# draws the waveform (width x height / 2) with the transparent background
+def draw_waveform(mins, maxs, size):
+    width = size
+    height = size // 2
+    middle = (height - 1) / 2
+
+    column_mins, column_maxs = get_columns_peaks(mins, maxs, width)
+    # the sample values are -32768..32767, the positive ones are drawn up
+    tops = np.floor(middle - column_maxs.astype(np.float32) / 32768 * middle)
+    bottoms = np.ceil(middle - column_mins.astype(np.float32) / 32768 * middle)
+
+    rows = np.arange(height, dtype=np.float32)[:, None]
+    mask = (rows >= tops) & (rows <= bottoms)
+
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[mask] = WAVEFORM_COLOR
+    return Image.fromarray(pixels, "RGBA")
+
+
+# returns the size x size / 2 waveform image, or None if the file has no audio
+def create_waveform(filepath, size, timeout):
+    peaks = read_blocks_peaks(filepath, timeout)
+    if peaks is None:
+        return None
+    return draw_waveform(*peaks, size)
@@ -4,5 +4,7 @@ from .file_drag_list import FileDragList
 from .error_window import ErrorWindow
 from .tags_setting_windows import TagsSettingsWindow, ItemTagsSettingsWindow
 from .tags_list import TagsList
+from .thumbnail_loader import ThumbnailLoader
+from .storyboard_view import StoryboardView
 from .preview_window import PreviewWindow
 from .main_window import MainWindow
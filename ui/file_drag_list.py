@@ -1,14 +1,29 @@
 from pathlib import Path
 
 from PySide6 import QtWidgets
-from PySide6.QtCore import Qt, QMimeData, QUrl
+from PySide6.QtCore import Qt, QMimeData, QUrl, QTimer, Signal, Slot
 from PySide6.QtGui import QDrag
 
+# the viewport changes are collected for this delay (ms), so the scrolling doesn't emit a signal for every pixel
+VISIBLE_ROWS_DELAY = 100
+
 class FileDragList(QtWidgets.QListWidget):
+    # the first and the last row of the items in the viewport (the items are in the grid, so the rows are a range)
+    visible_rows_changed = Signal(int, int)
+
     def __init__(self, db):
         super().__init__()
         self.db = db
 
+        self.visible_rows_timer = QTimer(self)
+        self.visible_rows_timer.setSingleShot(True)
+        self.visible_rows_timer.setInterval(VISIBLE_ROWS_DELAY)
+        self.visible_rows_timer.timeout.connect(self.emit_visible_rows)
+
+        # the list resizing is handled in resizeEvent, the list owner schedules the check after the list is refilled
+        # (the scroll range is changed for every added item, so rangeChanged isn't used)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_visible_rows)
+
     def startDrag(self, supportedActions):
         item = self.currentItem()
         if not item:
@@ -23,4 +38,41 @@ class FileDragList(QtWidgets.QListWidget):
         mime_data.setUrls([QUrl.fromLocalFile(file_path)])
         drag.setMimeData(mime_data)
 
-        drag.exec(Qt.CopyAction)
\ No newline at end of file
+        drag.exec(Qt.CopyAction)
+
+    # the rows are calculated from the grid (the items rects are the text rects, they are smaller than the grid cells),
+    # the icon mode list is scrolled by pixels and is filled row by row
+    # returns None if the list is empty
+    def get_visible_rows(self):
+        count = self.count()
+        if count == 0:
+            return None
+
+        grid = self.gridSize()
+        if not grid.isValid():
+            return 0, count - 1
+
+        cell_width = grid.width() + self.spacing()
+        cell_height = grid.height() + self.spacing()
+        columns = max(self.viewport().width() // cell_width, 1)
+
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height() - 1
+        first = top // cell_height * columns
+        last = (bottom // cell_height + 1) * columns - 1
+
+        return min(first, count - 1), min(last, count - 1)
+
+    @Slot()
+    def schedule_visible_rows(self):
+        self.visible_rows_timer.start()
+
+    @Slot()
+    def emit_visible_rows(self):
+        rows = self.get_visible_rows()
+        if rows is not None:
+            self.visible_rows_changed.emit(*rows)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_visible_rows()
@@ -15,11 +15,29 @@ class FoldersListWindow(QtWidgets.QTreeWidget):
         self.setFixedWidth(200)
         self.itemClicked.connect(self.on_item_clicked)
 
+    # the tree is rebuilt after the rescans, the expanded and the selected folders stay so
     def display_folder_list(self, folder):
+        items = self.get_tree_items()
+        expanded_paths = {item.data(0, Qt.UserRole) for item in items if item.isExpanded()}
+        selected_paths = {item.data(0, Qt.UserRole) for item in items if item.isSelected()}
+
         self.clear()
         root_item = self.populate_tree(folder)
         self.addTopLevelItem(root_item)
 
+        for item in self.get_tree_items():
+            item.setExpanded(item.data(0, Qt.UserRole) in expanded_paths)
+            item.setSelected(item.data(0, Qt.UserRole) in selected_paths)
+
+    def get_tree_items(self):
+        items = []
+        children = [self.topLevelItem(i) for i in range(self.topLevelItemCount())]
+        while children:
+            item = children.pop()
+            items.append(item)
+            children += [item.child(i) for i in range(item.childCount())]
+        return items
+
     def populate_tree(self, folder):
         tree_item = QTreeWidgetItem()
         tree_item.setText(0, os.path.basename(folder))
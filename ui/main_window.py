@@ -4,12 +4,13 @@ import config
 from dotenv import load_dotenv
 
 from fhandler import FileHandler, FileScanner
+from fwatcher import FileWatcher
 from db.database import DatabaseHandler
+from thumbs.render import PENDING_PREVIEWPATH
 
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtWidgets import QListView, QProgressBar
 from PySide6.QtCore import QSize
-from PySide6.QtGui import QIcon
 from PySide6.QtCore import Qt
 
 from ui import (
@@ -20,10 +21,14 @@ from ui import (
     TagsSettingsWindow,
     TagsList,
     PreviewWindow,
+    ThumbnailLoader,
 )
 
 load_dotenv()
 
+# the number of the failed files listed in the errors label tooltip
+MAX_TOOLTIP_ERRORS = 20
+
 
 class MainWindow(QtWidgets.QWidget):
     def __init__(self):
@@ -34,23 +39,40 @@ class MainWindow(QtWidgets.QWidget):
 
         # create the database object
         self.db = DatabaseHandler(self.error_window)
-        self.db.connect_to_database()
 
         # apply DB migrations
         self.db.apply_migrations()
 
+        # create the thumbnails loader for the files list (the thumbnails can be separate files or packed)
+        self.thumbnail_loader = ThumbnailLoader()
+
         # create the progress bar
         self.progress_bar = QProgressBar()
 
+        # create the label with the number of the files which thumbnails failed (the files are listed in the tooltip)
+        self.errors_label = QtWidgets.QLabel()
+
         # create the file handler
         self.fhandler = FileHandler(self.db)
         self.fhandler.progress.connect(self.on_progress)
         self.fhandler.finished.connect(self.on_finished)
-        self.fhandler.thumb_created.connect(self.on_thumb_created)
+        self.fhandler.thumbs_created.connect(self.on_thumbs_created)
+        self.fhandler.metadata_probed.connect(self.on_metadata_probed)
 
         # create the file scanner
         self.fscanner = FileScanner(self.db, self.fhandler)
 
+        # create the file system watcher for the live rescans
+        self.fwatcher = FileWatcher()
+        # True if the changes are detected while the previous ones are still processed
+        self.is_rescan_pending = False
+        # True while the changes found by the watcher are processed (the GUI is not disabled for them)
+        self.is_watcher_scan = False
+        # {file id: list item} of the shown files which thumbnails are not created yet (the on-demand mode)
+        self.pending_items = {}
+        # the keyword of the shown files list (see display_files_list), it's shown again after the rescans
+        self.files_list_keyword = "program_launch"
+
         # IoC for the dependent classes which use tags list, db and error window
         self.tags_list = TagsList(self, self.db)
         self.preview_window = PreviewWindow(
@@ -60,6 +82,8 @@ class MainWindow(QtWidgets.QWidget):
 
         # create the main folders list window
         self.folder_list_window = FoldersListWindow(self)
+        # the selected folder files are shown with the files of all its subfolders
+        self.subfolders_checkbox = QtWidgets.QCheckBox("Показывать файлы подпапок")
 
         # create the tags settings window
         self.tags_settings_window = TagsSettingsWindow(
@@ -98,15 +122,21 @@ class MainWindow(QtWidgets.QWidget):
         self.list_layout.addWidget(self.list)
         self.list_layout.addSpacing(10)
         self.list_layout.addWidget(self.progress_bar)
+        self.list_layout.addWidget(self.errors_label, 0, QtCore.Qt.AlignHCenter)
         # hide tags button, window and searchbar
         self.tags_button.hide()
         self.tags_list.hide()
         self.searchbar.hide()
         self.progress_bar.hide()
+        self.errors_label.hide()
 
         # create the Hbox for files list and file preview widgets and put it into the main Vbox
+        self.folders_layout = QtWidgets.QVBoxLayout()
+        self.folders_layout.addWidget(self.folder_list_window)
+        self.folders_layout.addWidget(self.subfolders_checkbox)
+
         self.files_layout = QtWidgets.QHBoxLayout()
-        self.files_layout.addWidget(self.folder_list_window)
+        self.files_layout.addLayout(self.folders_layout)
         self.files_layout.addLayout(self.list_layout)
         self.files_layout.addWidget(self.preview_window)
 
@@ -118,6 +148,12 @@ class MainWindow(QtWidgets.QWidget):
         # connecting to the item click
         self.list.itemClicked.connect(self.on_current_item_selected)
 
+        # the thumbnails of the visible files are created first (the on-demand mode)
+        self.list.visible_rows_changed.connect(self.on_visible_rows_changed)
+
+        # the selected folder files are shown again with or without the subfolders files
+        self.subfolders_checkbox.toggled.connect(self.on_subfolders_toggled)
+
         # connecting to the tags button click
         self.tags_button.clicked.connect(self.on_tags_button_clicked)
 
@@ -126,6 +162,12 @@ class MainWindow(QtWidgets.QWidget):
 
         # connect to file scanner signal which emits when the new files are found
         self.fscanner.files_scanned.connect(self.on_files_scanned)
+        self.fscanner.files_deleted.connect(self.on_files_deleted)
+        self.fscanner.scan_finished.connect(self.fwatcher.watch_folders)
+        self.fscanner.scan_finished.connect(self.on_scan_finished)
+
+        # connect to the file watcher signal which emits when the files in the folder are changed
+        self.fwatcher.changes_detected.connect(self.on_changes_detected)
 
         # if the folder is already chosen on program launch, hide the folder and show the tags button and window
         if self.is_folder_chosen:
@@ -142,6 +184,9 @@ class MainWindow(QtWidgets.QWidget):
             self.display_files_list(folder, "program_launch")
             self.folder_list_window.display_folder_list(folder)
 
+            self.fwatcher.start()
+
+        self.update_errors_label()
 
     def get_current_item(self):
         current_item = self.list.currentItem()
@@ -165,9 +210,10 @@ class MainWindow(QtWidgets.QWidget):
         preview_icon = self.list.currentItem().icon()
         preview_filename = self.list.currentItem().text()
         preview_filepath = self.db.get_filepath_by_id(file_id)
+        preview_previewpath = self.db.get_previewpath_by_id(file_id)
 
         self.preview_window.apply_preview_data(
-            file_id, preview_icon, preview_filename, preview_filepath
+            file_id, preview_icon, preview_filename, preview_filepath, preview_previewpath
         )
 
     # choose folder button click event
@@ -203,19 +249,87 @@ class MainWindow(QtWidgets.QWidget):
             )
 
     # create the separate thread for thumbnail creation
-    def create_thumbnail_creation_thread(self, files_list):
+    def create_thumbnail_creation_thread(self, files_list, block_gui=True):
+        self.db.add_thumbnail_jobs(files_list)
+
+        if config.get_thumb_mode() == config.ON_DEMAND_MODE:
+            self.queue_thumbnails(files_list)
+            return
+
         self.fhandler.create_thumbnail_creation_thread(files_list)
 
         self.progress_bar.show()
 
         # disable the program GUI
-        self.setEnabled(False)
+        if block_gui:
+            self.setEnabled(False)
+
+    # the on-demand mode: the files are shown right away with the placeholder icons, the GUI isn't disabled,
+    # and the thumbnails are created in the files list viewport order
+    def queue_thumbnails(self, files_list):
+        self.fhandler.save_pending_files(files_list)
+        # all the scanned files are in the DB now
+        self.fscanner.save_folders_index()
+
+        self.refresh_files_list(config.get_files_folder_path())
+        self.show_repository_controls()
+
+        self.fhandler.queue_thumbnails(files_list)
+        self.progress_bar.show()
 
-    @QtCore.Slot(str, str, str, list)
-    def on_thumb_created(self, filename, filepath, thumb_filepath, tags):
-        self.db.save_to_database(filename, filepath, thumb_filepath)
-        self.db.save_current_item_tags(filepath, tags)
-        self.db.save_changes()
+        self.fhandler.create_metadata_thread()
+
+    @QtCore.Slot(int, int)
+    def on_visible_rows_changed(self, first_row, last_row):
+        if not self.pending_items:
+            return
+
+        # the rows around the viewport (a page up and down) are the next ones to be scrolled to
+        page = last_row - first_row + 1
+        nearby_rows = list(range(max(first_row - page, 0), first_row)) + list(
+            range(last_row + 1, min(last_row + 1 + page, self.list.count()))
+        )
+
+        visible_ids = self.get_pending_ids(range(first_row, last_row + 1))
+        nearby_ids = self.get_pending_ids(nearby_rows)
+        if not visible_ids and not nearby_ids:
+            return
+
+        filepaths = self.db.get_filepaths_by_ids(visible_ids + nearby_ids)
+        self.fhandler.thumb_queue.prioritize(
+            [filepaths[file_id] for file_id in visible_ids if file_id in filepaths],
+            [filepaths[file_id] for file_id in nearby_ids if file_id in filepaths],
+        )
+
+    # returns the ids of the files in the list rows which thumbnails are not created yet
+    def get_pending_ids(self, rows):
+        ids = []
+        for row in rows:
+            file_id = self.list.item(row).data(Qt.UserRole)
+            if file_id in self.pending_items:
+                ids.append(file_id)
+        return ids
+
+    # results is a list of (filename, filepath, thumbnail path, tags, size, mtime, fingerprint, error),
+    # the batch is saved in one transaction
+    @QtCore.Slot(list)
+    def on_thumbs_created(self, results):
+        self.db.save_thumbnails(results)
+
+        if any(result[7] for result in results):
+            self.update_errors_label()
+
+        # the placeholder icons are replaced in place, so the list isn't redrawn and keeps the scroll position
+        if self.pending_items:
+            ids = self.db.get_ids_by_filepaths([result[1] for result in results])
+            for _, filepath, thumb_filepath, *_ in results:
+                item = self.pending_items.pop(ids.get(filepath), None)
+                if item is not None:
+                    item.setIcon(self.thumbnail_loader.get_icon(thumb_filepath))
+
+    @QtCore.Slot(list)
+    def on_metadata_probed(self, files_metadata):
+        self.db.save_files_metadata(files_metadata)
 
     @QtCore.Slot(int, int)
     def on_progress(self, counter, total):
@@ -224,12 +338,49 @@ class MainWindow(QtWidgets.QWidget):
 
     @QtCore.Slot(str)
     def on_finished(self, folder):
-        self.display_files_list(folder, "program_launch")
-        # folder here is passed since the display_files_list method signature needs an argument for the file list source, but in this case the folder is never used in the method
-        self.folder_list_window.display_folder_list(folder)
+        # all the scanned files are in the DB now
+        self.fscanner.save_folders_index()
+        self.fscanner.delete_stale_thumbnails()
+        self.is_watcher_scan = False
+
+        # in the on-demand mode the files are already shown and their icons are updated as the thumbnails are created
+        if config.get_thumb_mode() != config.ON_DEMAND_MODE:
+            self.refresh_files_list(folder)
+            self.show_repository_controls()
         self.progress_bar.hide()
 
+        # enable the program GUI
+        self.setEnabled(True)
+
+        # the metadata of the new and changed files is read after their thumbnails
+        self.fhandler.create_metadata_thread()
 
+        # start watching the folder after the first files import
+        if not self.fwatcher.poll_timer.isActive():
+            self.fwatcher.start()
+
+        if self.is_rescan_pending:
+            self.on_changes_detected()
+
+    # the failed files are kept in the DB, so the label shows the errors of the previous sessions too
+    def update_errors_label(self):
+        errors = self.db.get_thumbnail_errors()
+        if not errors:
+            self.errors_label.hide()
+            return
+
+        self.errors_label.setText(f"Не удалось создать превью: {len(errors)}")
+        tooltip_lines = [
+            f"{os.path.basename(filepath)}: {error}"
+            for filepath, error in errors[:MAX_TOOLTIP_ERRORS]
+        ]
+        if len(errors) > MAX_TOOLTIP_ERRORS:
+            tooltip_lines.append(f"и ещё {len(errors) - MAX_TOOLTIP_ERRORS}")
+        self.errors_label.setToolTip("\n".join(tooltip_lines))
+        self.errors_label.show()
+
+    # hide the folder button and show the tags controls after the first files import
+    def show_repository_controls(self):
         if not config.DEBUG:
             self.button.hide()
             self.tags_button.show()
@@ -237,45 +388,124 @@ class MainWindow(QtWidgets.QWidget):
             self.searchbar.show()
             self.tags_list.update_tags_list()
 
+    @QtCore.Slot(set)
+    # create a thumbnail creation thread for the new files found on next program launches or by the file watcher
+    def on_files_scanned(self, files_list):
+        self.create_thumbnail_creation_thread(
+            files_list, block_gui=not self.is_watcher_scan
+        )
 
+    @QtCore.Slot()
+    def on_files_deleted(self):
+        self.refresh_files_list(os.getenv("FOLDER_PATH"))
+        # the jobs of the deleted files are deleted with them
+        self.update_errors_label()
+
+    @QtCore.Slot(list)
+    def on_scan_finished(self, folders):
+        # the new files are still processed, the pending rescan is started when they are finished
+        if self.is_processing_changes():
+            return
 
-        # enable the program GUI
-        self.setEnabled(True)
+        # the changed files (or the files saved before the metadata stage) get their metadata
+        self.fhandler.create_metadata_thread()
 
-    @QtCore.Slot(set)
-    # create a thumbnail creation thread for the new files found on next program launches
-    def on_files_scanned(self, files_list):
-        self.create_thumbnail_creation_thread(files_list)
+        self.is_watcher_scan = False
+        if self.is_rescan_pending:
+            self.on_changes_detected()
+
+    # start the rescan in a separate thread, if the previous changes are still processed, rescan after them
+    @QtCore.Slot()
+    def on_changes_detected(self):
+        if self.is_processing_changes():
+            self.is_rescan_pending = True
+            return
+
+        self.is_rescan_pending = False
+        self.is_watcher_scan = True
+        self.fscanner.create_scan_thread()
+
+    # the changes are processed until the new files are saved to the DB: in the on-demand mode they are saved
+    # right away (the running thumbnails creation takes the newly queued files), otherwise with their thumbnails
+    def is_processing_changes(self):
+        if self.fscanner.is_scanning():
+            return True
+        return (
+            config.get_thumb_mode() != config.ON_DEMAND_MODE
+            and self.fhandler.is_creating_thumbnails()
+        )
+
+    # the scans (the background ones too) redraw the folders tree and the files list, the list shows the same view
+    # again: the selected folder or the last search, with the same current file and scroll position
+    def refresh_files_list(self, folder):
+        self.folder_list_window.display_folder_list(folder)
+
+        current_item = self.list.currentItem()
+        current_id = current_item.data(Qt.UserRole) if current_item else None
+        scroll_position = self.list.verticalScrollBar().value()
+
+        selected_folders = self.folder_list_window.selectedItems()
+        if self.files_list_keyword == "folder_tree" and selected_folders:
+            self.display_files_list(selected_folders[0].data(0, Qt.UserRole), "folder_tree")
+        elif self.files_list_keyword == "searchbar_clicked":
+            self.searchbar.repeat_search()
+        else:
+            # the deleted folder isn't in the tree anymore, all the files are shown then
+            self.display_files_list(folder, "program_launch")
+
+        if current_id is not None:
+            for row in range(self.list.count()):
+                if self.list.item(row).data(Qt.UserRole) == current_id:
+                    self.list.setCurrentRow(row)
+                    break
+        self.list.doItemsLayout()
+        self.list.verticalScrollBar().setValue(scroll_position)
 
     # DONE add file id assigning through Qt setData (to avoid errors when there are files with the same names in different folders)
     def display_files_list(self, files_list_source, keyword: str):
         # define the files list source depending on where this method is called from
+        # (the rows are (id, filename, previewpath), they are read by one query or by the id list chunks)
         match keyword:
             case "program_launch" | "searchbar_canceled":
-                id_list = self.db.get_all_files_ids()
+                files_rows = self.db.get_all_files_rows()
             case "searchbar_clicked":
                 # the method from Searchbar passes an id list (either by tags, by descriptions or both)
-                id_list = files_list_source
+                files_rows = self.db.get_files_rows(files_list_source)
             case "folder_tree":
                 # the method from folder tree passes the selected folder (full path)
-                id_list = self.db.get_ids_by_filepath(files_list_source)
+                files_rows = self.db.get_files_rows(
+                    self.db.get_ids_by_filepath(
+                        files_list_source, self.subfolders_checkbox.isChecked()
+                    )
+                )
             case _:
-                id_list = []
+                files_rows = []
 
+        self.files_list_keyword = keyword
         self.list.clear()
+        self.pending_items = {}
 
-        for file_id in id_list:
-            icon_path = self.db.get_previewpath_by_id(file_id)
-            filename = self.db.get_filename_by_id(file_id)
-
+        for file_id, filename, icon_path in files_rows:
             item = QtWidgets.QListWidgetItem(filename)
-            item.setIcon(QIcon(str(icon_path)))
+            item.setIcon(self.thumbnail_loader.get_icon(icon_path))
 
             # assign the file id to the list item for using by other components (like the preview window)
             item.setData(Qt.UserRole, file_id)
 
             self.list.addItem(item)
 
+            if icon_path == PENDING_PREVIEWPATH:
+                self.pending_items[file_id] = item
+
+        # the viewport is checked after the list is refilled
+        if self.pending_items:
+            self.list.schedule_visible_rows()
+
+    def on_subfolders_toggled(self):
+        selected_items = self.folder_list_window.selectedItems()
+        if selected_items:
+            self.folder_list_window.on_item_clicked(selected_items[0])
+
     # clear the folder list selection when the searchbar actions are made
     @QtCore.Slot()
     def on_searchbar_clicked(self):
@@ -4,6 +4,13 @@ from ui import (
 
 # (if the import would be inside ui>init.py)
 from .file_description_dialog import FileDescriptionDialog
+from .storyboard_view import StoryboardView
+
+import os, config
+
+from fhandler import get_file_type
+from thumbs.render import VIDEO_FILE, PENDING_PREVIEWPATH, FAILED_PREVIEWPATH
+from thumbs.storyboard import get_storyboard_path
 
 from PySide6 import QtCore, QtWidgets
 
@@ -27,8 +34,8 @@ class PreviewWindow(QtWidgets.QWidget):
         self.tags_settings_button = QtWidgets.QPushButton("Изменить теги")
         self.item_description_button = QtWidgets.QPushButton("Изменить описание")
 
-        # create placeholder for the preview
-        self.image_preview = QtWidgets.QLabel()
+        # create placeholder for the preview (the videos storyboards are shown on the mouse hover)
+        self.image_preview = StoryboardView()
         self.image_preview.setFixedSize(256, 256)
         self.image_preview.setAlignment(QtCore.Qt.AlignCenter)
 
@@ -73,9 +80,27 @@ class PreviewWindow(QtWidgets.QWidget):
             self.on_item_description_button_clicked
         )
 
-    def apply_preview_data(self, file_id, icon, filename, filepath):
+        # the storyboard is created in the background on the first video selection
+        self.storyboard_filepath = None
+        self.main_window.fhandler.storyboard_created.connect(self.on_storyboard_created)
 
-        pixmap = icon.pixmap(256, 256)
+    def apply_preview_data(self, file_id, icon, filename, filepath, previewpath):
+
+        # the bigger rendition is loaded only for the selected file, the files list uses the small one
+        pixmap = self.main_window.thumbnail_loader.get_rendition_pixmap(
+            previewpath, self.image_preview.width()
+        )
+        if pixmap.isNull():
+            pixmap = icon.pixmap(256, 256)
+        elif (
+            pixmap.width() > self.image_preview.width()
+            or pixmap.height() > self.image_preview.height()
+        ):
+            pixmap = pixmap.scaled(
+                self.image_preview.size(),
+                QtCore.Qt.KeepAspectRatio,
+                QtCore.Qt.SmoothTransformation,
+            )
 
         # update the tags list for the current selected item
         self.update_item_tags_list(file_id)
@@ -84,7 +109,28 @@ class PreviewWindow(QtWidgets.QWidget):
         self.table_filename.setText(filename)
         self.table_filepath.setText(filepath)
 
-        self.image_preview.setPixmap(pixmap)
+        self.image_preview.set_preview(pixmap)
+        self.load_storyboard(filepath, previewpath)
+
+    def load_storyboard(self, filepath, previewpath):
+        self.storyboard_filepath = None
+        # the storyboard is named after the thumbnail, so it waits for the thumbnail in the on-demand mode
+        # (and the failed videos have no storyboard)
+        if get_file_type(filepath) != VIDEO_FILE or previewpath in (
+            PENDING_PREVIEWPATH,
+            FAILED_PREVIEWPATH,
+        ):
+            return
+
+        frames = config.get_storyboard_frames()
+        storyboard_path = get_storyboard_path(previewpath, frames)
+        if os.path.exists(storyboard_path):
+            self.image_preview.set_storyboard(storyboard_path, frames)
+        else:
+            self.storyboard_filepath = filepath
+            self.main_window.fhandler.create_storyboard_thread(
+                filepath, storyboard_path, frames
+            )
 
     def update_item_tags_list(self, file_id):
         tags_list = [tag for tag in self.db.get_current_item_tags(file_id)]
@@ -118,6 +164,15 @@ class PreviewWindow(QtWidgets.QWidget):
                 self.dialog.description_updated.connect(self.on_description_updated)
                 self.dialog.exec()
 
+    @QtCore.Slot(str, str)
+    def on_storyboard_created(self, filepath, storyboard_path):
+        # another file could be selected while the storyboard was created
+        if filepath == self.storyboard_filepath:
+            self.storyboard_filepath = None
+            self.image_preview.set_storyboard(
+                storyboard_path, config.get_storyboard_frames()
+            )
+
     @QtCore.Slot()
     def on_description_updated(self, description):
         self.update_item_description(description)
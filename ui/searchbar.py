@@ -13,6 +13,8 @@ class SearchBar(QtWidgets.QWidget):
         self.db = db
         self.tags_list_ui = tags_list_ui
         self.main_window = main_window
+        # the (query, tags, tags mode) of the last search, it's made again after the files changes
+        self.last_search = None
 
         # create the search bar
         self.searchbar = QtWidgets.QLineEdit(self)
@@ -44,30 +46,36 @@ class SearchBar(QtWidgets.QWidget):
 
     @QtCore.Slot()
     def on_search_query_input(self):
-        query = self.searchbar.text()
-        tags = self.tags_list_ui.get_selected_tags()
+        self.last_search = (
+            self.searchbar.text(),
+            self.tags_list_ui.get_selected_tags(),
+            self.tags_list_ui.get_tags_mode(),
+        )
+        self.main_window.display_files_list(self.get_search_ids(*self.last_search), "searchbar_clicked")
 
-        if tags and query.strip():
+        self.clicked.emit()
+
+    # the search isn't taken from the searchbar again, it can be edited but not submitted yet
+    def repeat_search(self):
+        self.main_window.display_files_list(self.get_search_ids(*self.last_search), "searchbar_clicked")
 
-            ids_by_tags = self.db.get_ids_by_tags(tags)
-            ids_by_description = self.db.get_ids_by_text(query)
-            all_ids = [file for file in ids_by_tags if file in ids_by_description]
+    def get_search_ids(self, query, tags, tags_mode):
+        # the text search results are filtered by the tags bitsets, so they keep the relevance order
+        if tags and query.strip():
+            all_ids = self.db.filter_ids_by_tags(self.db.get_ids_by_text(query), tags, tags_mode)
         elif tags:
-            all_ids = self.db.get_ids_by_tags(tags)
+            all_ids = self.db.get_ids_by_tags(tags, tags_mode)
         elif query.strip():
             all_ids = self.db.get_ids_by_text(query)
         else:
             all_ids = self.db.get_all_files_ids()
-
-        self.main_window.display_files_list(all_ids, "searchbar_clicked")
-
-        self.clicked.emit()
+        return all_ids
 
     @QtCore.Slot()
     def on_cancel_button_clicked(self):
         self.searchbar.clear()
         self.tags_list_ui.deselect_all_tags()
-        all_files = self.db.get_all_filenames()
-        self.main_window.display_files_list(all_files, "searchbar_canceled")
+        # all the files rows are read by display_files_list itself, so no list is passed
+        self.main_window.display_files_list(None, "searchbar_canceled")
 
         self.clicked.emit()
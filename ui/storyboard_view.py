@@ -0,0 +1,54 @@
+from PySide6 import QtWidgets
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPixmap
+
+
+# the preview image which shows the video storyboard frames when the mouse is moved over it
+# (the frame under the cursor: the left edge is the clip start, the right edge is the clip end)
+# the strip is cut into the frames once, so the scrubbing only switches the shown pixmap
+class StoryboardView(QtWidgets.QLabel):
+    def __init__(self):
+        super().__init__()
+
+        self.preview_pixmap = QPixmap()
+        self.frames = []
+        self.current_frame = None
+
+        # the mouse move events are needed without the pressed button
+        self.setMouseTracking(True)
+
+    def set_preview(self, pixmap):
+        self.preview_pixmap = pixmap
+        self.frames = []
+        self.current_frame = None
+        self.setPixmap(pixmap)
+
+    # the storyboard is the strip of the frames number frames of the same width
+    def set_storyboard(self, storyboard_path, frames):
+        strip = QPixmap(storyboard_path)
+        if strip.isNull():
+            return
+
+        frame_width = strip.width() // frames
+        self.frames = [
+            strip.copy(index * frame_width, 0, frame_width, strip.height()).scaled(
+                self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+            )
+            for index in range(frames)
+        ]
+
+    def mouseMoveEvent(self, event):
+        if self.frames:
+            x = min(max(event.position().x(), 0), self.width() - 1)
+            frame = int(x * len(self.frames) / self.width())
+            if frame != self.current_frame:
+                self.current_frame = frame
+                self.setPixmap(self.frames[frame])
+        super().mouseMoveEvent(event)
+
+    # the thumbnail is shown again when the mouse leaves the preview
+    def leaveEvent(self, event):
+        if self.current_frame is not None:
+            self.current_frame = None
+            self.setPixmap(self.preview_pixmap)
+        super().leaveEvent(event)
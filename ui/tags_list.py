@@ -1,5 +1,7 @@
 from PySide6 import QtCore, QtWidgets, QtGui
 
+from db.tag_index import ALL_TAGS, ANY_TAGS, NO_TAGS
+
 
 # TODO add "select all" and "deselect all" buttons
 class TagsList(QtWidgets.QWidget):
@@ -12,8 +14,15 @@ class TagsList(QtWidgets.QWidget):
         # create the main tags layout
         self.tags_layout = QtWidgets.QVBoxLayout(self)
 
+        # the selected tags are combined by the mode: the files with all of them, with any of them or without them
+        self.tags_mode_box = QtWidgets.QComboBox()
+        self.tags_mode_box.addItem("Все выбранные теги", ALL_TAGS)
+        self.tags_mode_box.addItem("Любой из выбранных тегов", ANY_TAGS)
+        self.tags_mode_box.addItem("Без выбранных тегов", NO_TAGS)
+
         self.tags_widget = QtWidgets.QListWidget()
 
+        self.tags_layout.addWidget(self.tags_mode_box)
         self.tags_layout.addWidget(self.tags_widget)
 
         self.changed_items = []
@@ -47,6 +56,9 @@ class TagsList(QtWidgets.QWidget):
 
         return selected_tags
 
+    def get_tags_mode(self):
+        return self.tags_mode_box.currentData()
+
     def deselect_all_tags(self):
         for i in range(self.tags_widget.count()):
             item = self.tags_widget.item(i)
@@ -0,0 +1,130 @@
+import os, config
+
+from thumbs.pack import ThumbnailPackReader, is_pack_path, get_pack_key
+from thumbs.render import get_renditions_paths, PENDING_PREVIEWPATH, FAILED_PREVIEWPATH
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QIcon, QIconEngine, QPixmap, QPainter, QColor, QPen
+
+
+# the icon of a thumbnail, the thumbnail is read (from the file or the pack) and decoded only when it's painted
+# (like QIcon with the file path does), so showing a big files list doesn't decode all the thumbnails at once
+# QIcon with the file path isn't used: it loads the JPEG thumbnails scaled to the requested size without keeping
+# the aspect ratio
+class ThumbnailIconEngine(QIconEngine):
+    def __init__(self, loader, previewpath):
+        super().__init__()
+
+        self.loader = loader
+        self.previewpath = previewpath
+        self.loaded_pixmap = None
+
+    def get_pixmap(self):
+        if self.loaded_pixmap is None:
+            self.loaded_pixmap = self.loader.load_pixmap(self.previewpath)
+        return self.loaded_pixmap
+
+    def pixmap(self, size, mode, state):
+        pixmap = self.get_pixmap()
+        if pixmap.isNull() or (
+            pixmap.width() <= size.width() and pixmap.height() <= size.height()
+        ):
+            return pixmap
+        return pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def paint(self, painter, rect, mode, state):
+        pixmap = self.pixmap(rect.size(), mode, state)
+        if pixmap.isNull():
+            return
+
+        # center the pixmap in the rect like the file icons are painted
+        x = rect.x() + (rect.width() - pixmap.width()) // 2
+        y = rect.y() + (rect.height() - pixmap.height()) // 2
+        painter.drawPixmap(x, y, pixmap)
+
+    def actualSize(self, size, mode, state):
+        pixmap = self.get_pixmap()
+        if pixmap.isNull():
+            return size
+        return pixmap.size().scaled(size, Qt.KeepAspectRatio).boundedTo(pixmap.size())
+
+    def clone(self):
+        return ThumbnailIconEngine(self.loader, self.previewpath)
+
+
+# creates the icons for the preview paths of both storages (separate files and the pack)
+class ThumbnailLoader:
+    def __init__(self):
+        self.pack_reader = None
+        self.placeholder_icon = None
+        self.failed_icon = None
+
+    def get_pack_reader(self):
+        if self.pack_reader is None:
+            self.pack_reader = ThumbnailPackReader(
+                os.path.join(config.get_thumb_folder_path(), "thumbnails")
+            )
+        return self.pack_reader
+
+    # the icon of the files which thumbnails are not created yet (the on-demand mode), shared by all of them
+    def get_placeholder_icon(self):
+        if self.placeholder_icon is None:
+            pixmap = QPixmap(128, 128)
+            pixmap.fill(Qt.transparent)
+
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QColor(190, 190, 190))
+            painter.setBrush(QColor(225, 225, 225))
+            painter.drawRoundedRect(8, 24, 112, 80, 8, 8)
+            painter.end()
+
+            self.placeholder_icon = QIcon(pixmap)
+        return self.placeholder_icon
+
+    # the icon of the files which thumbnails failed (broken or unsupported files), the placeholder with a cross
+    def get_failed_icon(self):
+        if self.failed_icon is None:
+            pixmap = self.get_placeholder_icon().pixmap(128, 128)
+
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(QColor(200, 70, 70), 6, Qt.SolidLine, Qt.RoundCap))
+            painter.drawLine(48, 48, 80, 80)
+            painter.drawLine(80, 48, 48, 80)
+            painter.end()
+
+            self.failed_icon = QIcon(pixmap)
+        return self.failed_icon
+
+    def get_icon(self, previewpath):
+        if previewpath == PENDING_PREVIEWPATH:
+            return self.get_placeholder_icon()
+        if previewpath == FAILED_PREVIEWPATH:
+            return self.get_failed_icon()
+        return QIcon(ThumbnailIconEngine(self, str(previewpath)))
+
+    def load_pixmap(self, previewpath):
+        pixmap = QPixmap()
+        if is_pack_path(previewpath):
+            data = self.get_pack_reader().read(get_pack_key(previewpath))
+            if data is not None:
+                pixmap.loadFromData(data)
+        else:
+            pixmap.load(str(previewpath))
+        return pixmap
+
+    # load the smallest rendition which is not smaller than the size (or the biggest one),
+    # returns a null pixmap if there are no renditions for the thumbnail (like for the shared icons)
+    def get_rendition_pixmap(self, previewpath, size):
+        if previewpath in (PENDING_PREVIEWPATH, FAILED_PREVIEWPATH):
+            return QPixmap()
+
+        levels = config.get_thumb_levels()
+        renditions = get_renditions_paths(previewpath, levels)
+
+        rendition_size = next((level for level in levels if level >= size), levels[-1])
+        if rendition_size == levels[0]:
+            return QPixmap()
+
+        return self.load_pixmap(renditions[rendition_size])